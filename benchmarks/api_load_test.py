@@ -0,0 +1,152 @@
+"""Load-test the kiosk API with concurrent check-ins.
+
+Starts gym_api.py on a temporary database seeded with members (or targets
+an already running instance with --url) and keeps a number of keep-alive
+connections busy posting /checkin, like turnstiles during the morning rush.
+Reports check-ins per second, latency percentiles and how many commits the
+server's batching needed.
+
+    python benchmarks/api_load_test.py --clients 50 --seconds 10
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gym_core import connect_database, init_schema
+
+
+def seed_database(path, members):
+    """Create the schema and a set of active members to check in"""
+    conn = connect_database(path)
+    init_schema(conn)
+    conn.executemany("""
+        INSERT INTO members (name, phone, membership_type, start_date, end_date,
+                             amount_paid, payment_method, status)
+        VALUES (?, ?, 'Monthly', date('now'), date('now', '+1 month'), 3000, 'Cash', 'Active')
+    """, [("Member {}".format(i), "07{:08d}".format(i)) for i in range(members)])
+    conn.commit()
+    conn.close()
+
+
+async def request(reader, writer, method, path, payload=None):
+    """Send one request on a keep-alive connection and return (status, body)"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write("{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 "Content-Length: {}\r\n\r\n".format(method, path, len(body)).encode() + body)
+    await writer.drain()
+    
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, deadline, members, paid_share, latencies, errors):
+    """Check random members in until the deadline"""
+    reader, writer = await asyncio.open_connection(host, port)
+    while time.monotonic() < deadline:
+        paid = random.random() < paid_share
+        payload = {'member': "07{:08d}".format(random.randrange(members)),
+                   'amount': 200 if paid else None, 'method': 'Cash' if paid else 'None'}
+        started = time.monotonic()
+        status, _ = await request(reader, writer, 'POST', '/checkin', payload)
+        latencies.append(time.monotonic() - started)
+        if status != 200:
+            errors.append(status)
+    writer.close()
+
+
+async def health(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    _, body = await request(reader, writer, 'GET', '/health')
+    writer.close()
+    return body
+
+
+async def run_load(host, port, clients, seconds, members, paid_share):
+    latencies, errors = [], []
+    before = await health(host, port)
+    deadline = time.monotonic() + seconds
+    started = time.monotonic()
+    await asyncio.gather(*(client(host, port, deadline, members, paid_share, latencies, errors)
+                           for _ in range(clients)))
+    elapsed = time.monotonic() - started
+    after = await health(host, port)
+    return latencies, errors, elapsed, after['batches'] - before['batches']
+
+
+async def wait_for_server(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await health(host, port)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='API to test (default: start one on a temporary database)')
+    parser.add_argument('--clients', type=int, default=50, help='concurrent keep-alive connections')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--members', type=int, default=5000)
+    parser.add_argument('--paid-share', type=float, default=0.3, help='fraction of paid check-ins')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = '127.0.0.1', args.port
+        path = os.path.join(tempfile.mkdtemp(), 'gym_management.db')
+        seed_database(path, args.members)
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'gym_api.py'),
+                                   '--db', path, '--host', host, '--port', str(port)],
+                                  stdout=subprocess.DEVNULL)
+    
+    try:
+        asyncio.run(wait_for_server(host, port))
+        latencies, errors, elapsed, batches = asyncio.run(
+            run_load(host, port, args.clients, args.seconds, args.members, args.paid_share))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    
+    latencies.sort()
+    print("Clients:        {}".format(args.clients))
+    print("Check-ins:      {} ({:.0f}/s)".format(len(latencies), len(latencies) / elapsed))
+    print("Errors:         {}".format(len(errors)))
+    print("Commits:        {} ({:.1f} check-ins each)".format(batches, len(latencies) / max(batches, 1)))
+    print("Latency p50:    {:.1f} ms".format(percentile(latencies, 0.50) * 1000))
+    print("Latency p95:    {:.1f} ms".format(percentile(latencies, 0.95) * 1000))
+    print("Latency p99:    {:.1f} ms".format(percentile(latencies, 0.99) * 1000))
+
+
+if __name__ == "__main__":
+    main()
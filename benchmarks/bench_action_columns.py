@@ -0,0 +1,131 @@
+"""Measure action-column cost: per-row button widgets versus a painting delegate.
+
+Fills a QTableWidget shaped like the visits and alerts tables with N rows,
+then reloads it a few times, the way a refresh after saving used to. In
+"widgets" mode every row gets a QWidget, a QHBoxLayout and a QPushButton
+with a lambda connected to clicked, the way the tables were filled before.
+In "delegate" mode every row gets one plain item holding the row id, and
+ButtonColumnDelegate paints the button. Reports fill time, reload time and
+the growth in resident memory.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_action_columns.py --rows 10000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (QApplication, QTableWidget, QTableWidgetItem, QWidget,
+                             QHBoxLayout, QPushButton)
+
+from gym import ButtonColumnDelegate
+
+
+def resident_kib():
+    """Current resident set size in KiB (Linux)"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def make_table():
+    table = QTableWidget()
+    table.setColumnCount(7)
+    table.setHorizontalHeaderLabels(["ID", "Member", "Visit Date", "Payment", "Payment Method",
+                                     "Notes", "Actions"])
+    table.resize(1200, 700)
+    table.show()
+    return table
+
+
+def fill_widgets(table, rows, clicked):
+    """The old way: a widget, layout and button per row"""
+    table.setRowCount(len(rows))
+    for row, values in enumerate(rows):
+        for col, value in enumerate(values):
+            table.setItem(row, col, QTableWidgetItem(value))
+        
+        actions_widget = QWidget()
+        actions_layout = QHBoxLayout(actions_widget)
+        actions_layout.setContentsMargins(5, 2, 5, 2)
+        
+        delete_btn = QPushButton("🗑️")
+        delete_btn.setToolTip("Delete Visit")
+        delete_btn.setMaximumSize(30, 25)
+        delete_btn.clicked.connect(lambda checked, v_id=row: clicked(v_id))
+        
+        actions_layout.addWidget(delete_btn)
+        actions_layout.addStretch()
+        table.setCellWidget(row, 6, actions_widget)
+
+
+def fill_delegate(table, rows, clicked):
+    """The new way: an id-carrying item per row, buttons painted by the delegate"""
+    table.setRowCount(len(rows))
+    for row, values in enumerate(rows):
+        for col, value in enumerate(values):
+            table.setItem(row, col, QTableWidgetItem(value))
+        
+        actions_item = QTableWidgetItem()
+        actions_item.setFlags(Qt.ItemIsEnabled)
+        actions_item.setData(Qt.UserRole, row)
+        table.setItem(row, 6, actions_item)
+
+
+def run(app, mode, rows, reloads):
+    table = make_table()
+    clicked = []
+    if mode == 'delegate':
+        delegate = ButtonColumnDelegate([("delete", "🗑️", "Delete Visit")], table)
+        delegate.clicked.connect(lambda action, row_id: clicked.append(row_id))
+        table.setItemDelegateForColumn(6, delegate)
+        fill = fill_delegate
+    else:
+        fill = fill_widgets
+    
+    app.processEvents()
+    memory_before = resident_kib()
+    
+    started = time.perf_counter()
+    fill(table, rows, clicked.append)
+    app.processEvents()
+    fill_time = time.perf_counter() - started
+    memory_after = resident_kib()
+    
+    started = time.perf_counter()
+    for _ in range(reloads):
+        table.setRowCount(0)
+        fill(table, rows, clicked.append)
+        app.processEvents()
+    reload_time = (time.perf_counter() - started) / max(reloads, 1)
+    
+    table.close()
+    table.deleteLater()
+    app.processEvents()
+    return fill_time, reload_time, memory_after - memory_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--reloads', type=int, default=3)
+    args = parser.parse_args()
+    
+    app = QApplication(sys.argv)
+    rows = [(str(i), "Member {}".format(i % 500), "2024-01-01 06:{:02d} AM".format(i % 60),
+             "KSh 200", "Cash", "") for i in range(args.rows)]
+    
+    print("{:<10} {:>8} {:>12} {:>12} {:>12}".format("mode", "rows", "fill (ms)", "reload (ms)",
+                                                     "memory (MiB)"))
+    # Delegate first so the widget run's leftovers cannot inflate its memory figure
+    for mode in ('delegate', 'widgets'):
+        fill_time, reload_time, memory = run(app, mode, rows, args.reloads)
+        print("{:<10} {:>8} {:>12.0f} {:>12.0f} {:>12.1f}".format(
+            mode, args.rows, fill_time * 1000, reload_time * 1000, memory / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Compare committing every check-in with VisitWriteQueue's group commit.
+
+Several producer threads record visits as fast as they can, like front-desk
+terminals during a rush. In "per-row" mode each one calls check_in(), which
+commits each visit on its own, through a shared writer connection. In
+"group" mode they submit to one VisitWriteQueue and wait for their own
+visit to be committed before recording the next, as the kiosk API does. In
+"write-behind" mode they submit without waiting, as the GUI does, and the
+time includes a final flush().
+
+    python benchmarks/bench_group_commit.py --visits 5000 --producers 8
+    python benchmarks/bench_group_commit.py --synchronous FULL
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gym_core import VisitWriteQueue, connect_database, init_schema, check_in
+
+
+def seed_database(path, members):
+    """Create the schema and a set of active members to check in"""
+    conn = connect_database(path)
+    init_schema(conn)
+    conn.executemany("""
+        INSERT INTO members (name, phone, membership_type, start_date, end_date,
+                             amount_paid, payment_method, status)
+        VALUES (?, ?, 'Monthly', date('now'), date('now', '+1 month'), 3000, 'Cash', 'Active')
+    """, [("Member {}".format(i), "07{:08d}".format(i)) for i in range(members)])
+    conn.commit()
+    conn.close()
+
+
+def random_visit(members):
+    paid = random.random() < 0.3
+    return random.randint(1, members), 200 if paid else None, "Cash" if paid else "None", ""
+
+
+def run_producers(producers, visits, work):
+    """Split visits across producer threads running work(count); return elapsed seconds"""
+    threads = [threading.Thread(target=work, args=(visits // producers,)) for _ in range(producers)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.monotonic() - started
+
+
+def bench_per_row(path, args):
+    conn = connect_database(path, check_same_thread=False)
+    conn.execute("PRAGMA synchronous = {}".format(args.synchronous))
+    lock = threading.Lock()
+    
+    def work(count):
+        for _ in range(count):
+            visit = random_visit(args.members)
+            with lock:
+                check_in(conn, *visit)
+    
+    elapsed = run_producers(args.producers, args.visits, work)
+    conn.close()
+    return elapsed, args.visits
+
+
+def bench_queue(path, args, wait):
+    visit_queue = VisitWriteQueue(path, max_rows=args.max_rows, max_delay=args.max_delay_ms / 1000)
+    visit_queue.conn.execute("PRAGMA synchronous = {}".format(args.synchronous))
+    
+    def work(count):
+        for _ in range(count):
+            future = visit_queue.submit(*random_visit(args.members))
+            if wait:
+                future.result()
+    
+    elapsed = run_producers(args.producers, args.visits, work)
+    started = time.monotonic()
+    visit_queue.flush()
+    elapsed += time.monotonic() - started
+    visit_queue.close()
+    return elapsed, visit_queue.batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--visits', type=int, default=5000)
+    parser.add_argument('--producers', type=int, default=8)
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--max-rows', type=int, default=500)
+    parser.add_argument('--max-delay-ms', type=float, default=0.0)
+    parser.add_argument('--synchronous', default='NORMAL', choices=['OFF', 'NORMAL', 'FULL'],
+                        help='PRAGMA synchronous for the writer; FULL fsyncs every commit')
+    args = parser.parse_args()
+    
+    print("{:<14} {:>8} {:>10} {:>9}".format("mode", "visits", "visits/s", "commits"))
+    for mode, bench in (("per-row", bench_per_row),
+                        ("group", lambda path, args: bench_queue(path, args, wait=True)),
+                        ("write-behind", lambda path, args: bench_queue(path, args, wait=False))):
+        path = os.path.join(tempfile.mkdtemp(), 'gym_management.db')
+        seed_database(path, args.members)
+        elapsed, commits = bench(path, args)
+        
+        conn = connect_database(path, readonly=True)
+        stored = conn.execute("SELECT COUNT(*) FROM visits").fetchone()[0]
+        conn.close()
+        print("{:<14} {:>8} {:>10.0f} {:>9}".format(mode, stored, stored / elapsed, commits))
+
+
+if __name__ == "__main__":
+    main()
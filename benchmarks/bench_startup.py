@@ -0,0 +1,132 @@
+"""Measure how long the main window takes to first paint as the database grows.
+
+Each size gets a synthetic database built with benchmark.build_database,
+then every measurement starts a fresh Python process, so imports, the
+SQLite page cache and Qt start cold in-process (the OS file cache stays
+warm). The child process reports:
+
+    imports      importing PyQt5 and gym
+    constructed  GymManagementSystem() returned
+    first paint  the dashboard has painted after show()
+    loaded       the startup load steps and the query worker have finished
+    all tabs     every tab and report sub-tab has been opened and filled,
+                 which is roughly what startup used to cost
+
+Times are medians over --repeat runs, in milliseconds from process start.
+
+    python benchmarks/bench_startup.py --sizes 1000 50000 200000
+    python benchmarks/bench_startup.py --sizes 500000 --data-dir /tmp/gym-data
+"""
+import time
+
+STARTED = time.perf_counter()
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+MILESTONES = ['imports', 'constructed', 'first paint', 'loaded', 'all tabs']
+
+
+def measure(path):
+    """Open the window on path and return the milestone times in seconds from process start"""
+    from PyQt5.QtCore import QObject, QEvent
+    from PyQt5.QtWidgets import QApplication
+    import gym
+    
+    times = {'imports': time.perf_counter() - STARTED}
+    app = QApplication(sys.argv[:1])
+    
+    window = gym.GymManagementSystem(path)
+    times['constructed'] = time.perf_counter() - STARTED
+    
+    class PaintWatcher(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint and 'first paint' not in times:
+                times['first paint'] = time.perf_counter() - STARTED
+            return False
+    
+    watcher = PaintWatcher()
+    window.tab_widget.currentWidget().installEventFilter(watcher)
+    window.show()
+    
+    def settle():
+        """Process events until startup loading and the query worker are idle"""
+        while window.pending_load_steps or window.query_worker.callbacks:
+            app.processEvents()
+            time.sleep(0.0005)
+        app.processEvents()
+    
+    while 'first paint' not in times:
+        app.processEvents()
+    settle()
+    times['loaded'] = time.perf_counter() - STARTED
+    
+    # The report sub-tabs only exist once the Reports tab has been built
+    for index in range(window.tab_widget.count()):
+        window.tab_widget.setCurrentIndex(index)
+        settle()
+    for index in range(window.reports_tabs.count()):
+        window.reports_tabs.setCurrentIndex(index)
+        settle()
+    times['all tabs'] = time.perf_counter() - STARTED
+    
+    window.close()
+    return times
+
+
+def run_child(path):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', path],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 50000, 200000],
+                        help='member counts to generate')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--visits-per-member', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', help='keep generated databases here and reuse them')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.measure:
+        print(json.dumps(measure(args.measure)))
+        return
+    
+    from benchmark import build_database
+    
+    data_dir = args.data_dir or tempfile.mkdtemp()
+    os.makedirs(data_dir, exist_ok=True)
+    print("{:>9} {:>8}".format("members", "db (MB)") + "".join(
+        " {:>12}".format(milestone) for milestone in MILESTONES))
+    for size in args.sizes:
+        path = os.path.join(data_dir, 'gym_{}_{}y_{}v_{}.db'.format(
+            size, args.years, args.visits_per_member, args.seed))
+        if not os.path.exists(path):
+            build_database(path, size, args.years, args.visits_per_member, args.seed)
+        
+        runs = [run_child(path) for _ in range(args.repeat)]
+        print("{:>9,} {:>8.0f}".format(size, os.path.getsize(path) / 2 ** 20) + "".join(
+            " {:>12.0f}".format(statistics.median(run[milestone] for run in runs) * 1000)
+            for milestone in MILESTONES), flush=True)
+        
+        if not args.data_dir:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Time the GUI's hot paths against synthetic gym databases of several sizes.
+
+For each size a temporary gym_management.db is created with the real
+schema and filled through gym_core.import_records, the same bulk path as
+File > Import. Members registered over the last few years with years of
+visits between their registration and today. Then a GymManagementSystem
+window is opened offscreen on it, and each hot path is run a few times.
+Paths that hand their query to the QueryWorker are timed until the worker
+has delivered the result.
+
+Results are written as JSON; pass an earlier file to --compare to see
+the change per path, e.g. between two commits:
+
+    python benchmarks/benchmark.py --sizes 1000 50000 --output before.json
+    python benchmarks/benchmark.py --sizes 1000 50000 --output after.json --compare before.json
+    python benchmarks/benchmark.py --sizes 500000 --data-dir /tmp/gym-data   # keep the databases
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from gym_core import (
+    MEMBERSHIP_TYPES, PAYMENT_METHODS, connect_database, init_schema, import_records,
+    membership_end_date, search_members
+)
+
+FIRST_NAMES = ["Amina", "Brian", "Cynthia", "David", "Esther", "Felix", "Grace", "Hassan",
+               "Irene", "James", "Kevin", "Lucy", "Mercy", "Nelson", "Otieno", "Purity",
+               "Quincy", "Rose", "Samuel", "Tabitha", "Wanjiru", "Yusuf", "Zawadi"]
+LAST_NAMES = ["Achieng", "Baraka", "Chebet", "Kamau", "Kariuki", "Mutua", "Njoroge",
+              "Ochieng", "Odhiambo", "Wambui", "Wanjala", "Kiprop", "Mwangi", "Nyambura"]
+
+
+def generate_members(count, years, rng):
+    """Yield (line, record) member records registered over the last `years` years"""
+    today = date.today()
+    span = years * 365
+    for i in range(1, count + 1):
+        registered = datetime.combine(today, datetime.min.time()) - timedelta(
+            days=rng.randrange(span), seconds=rng.randrange(6 * 3600, 21 * 3600))
+        membership_type = rng.choice(MEMBERSHIP_TYPES[:4])
+        # Most members renew; the start date is their latest renewal
+        start = registered.date()
+        end = membership_end_date(start, membership_type)
+        while end < today and rng.random() < 0.8:
+            start = end
+            end = membership_end_date(start, membership_type)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield i, {
+            'name': "{} {} {}".format(first, last, i),
+            'phone': "07{:08d}".format(i),
+            'email': "{}.{}{}@example.com".format(first, last, i).lower(),
+            'address': "",
+            'membership_type': membership_type,
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'amount_paid': rng.choice([1500, 3000, 8000, 15000, 28000]),
+            'payment_method': rng.choice(PAYMENT_METHODS),
+            'status': 'Active' if rng.random() < 0.9 else 'Inactive',
+            'registration_date': registered.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+
+def generate_visits(conn, visits_per_member, rng):
+    """Yield (line, record) visits spread between each member's registration and now"""
+    now = datetime.now()
+    line = 0
+    # Read up front: the import drops the members indexes while it runs
+    members = conn.execute("SELECT id, registration_date FROM members").fetchall()
+    for member_id, registered in members:
+        registered = datetime.fromisoformat(registered)
+        seconds = max(int((now - registered).total_seconds()), 1)
+        for _ in range(rng.randint(0, visits_per_member * 2)):
+            line += 1
+            paid = rng.random() < 0.25
+            yield line, {
+                'member_id': member_id,
+                'payment_amount': 200 if paid else None,
+                'payment_method': rng.choice(PAYMENT_METHODS) if paid else 'None',
+                'notes': "",
+                'visit_date': (registered + timedelta(seconds=rng.randrange(seconds))).strftime(
+                    '%Y-%m-%d %H:%M:%S'),
+            }
+
+
+def build_database(path, members, years, visits_per_member, seed):
+    """Create and fill a database; return how long it took"""
+    started = time.monotonic()
+    rng = random.Random(seed)
+    conn = connect_database(path)
+    init_schema(conn)
+    # A private database, so both imports may hold the write lock throughout
+    import_records(conn, 'members', generate_members(members, years, rng), exclusive=True)
+    import_records(conn, 'visits', generate_visits(conn, visits_per_member, rng), exclusive=True)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return time.monotonic() - started
+
+
+def table_counts(path):
+    conn = connect_database(path, readonly=True)
+    counts = {table: conn.execute("SELECT COUNT(*) FROM {}".format(table)).fetchone()[0]
+              for table in ('members', 'visits', 'payments')}
+    conn.close()
+    return counts
+
+
+class Runner:
+    """Opens the main window on a database and times its hot paths"""
+    
+    def __init__(self, app, path, repeat):
+        import gym
+        self.app = app
+        self.repeat = repeat
+        self.timings = {}
+        
+        started = time.perf_counter()
+        self.window = gym.GymManagementSystem(path)
+        self.wait_for_worker()
+        self.record('startup', [time.perf_counter() - started])
+        
+        # Tabs are built on first view; open each so every hot path has its widgets
+        started = time.perf_counter()
+        for tabs in ('tab_widget', 'reports_tabs'):
+            tabs = getattr(self.window, tabs)
+            for index in range(tabs.count()):
+                tabs.setCurrentIndex(index)
+                self.wait_for_worker()
+        self.record('open every tab', [time.perf_counter() - started])
+    
+    def wait_for_worker(self, timeout=600):
+        """Process events until the startup load and the QueryWorker's pending results are done"""
+        deadline = time.monotonic() + timeout
+        while ((self.window.pending_load_steps or self.window.query_worker.callbacks)
+               and time.monotonic() < deadline):
+            self.app.processEvents()
+            time.sleep(0.0005)
+        self.app.processEvents()
+    
+    def record(self, name, samples):
+        self.timings[name] = {
+            'median_ms': round(statistics.median(samples) * 1000, 3),
+            'min_ms': round(min(samples) * 1000, 3),
+            'max_ms': round(max(samples) * 1000, 3),
+            'runs': len(samples),
+        }
+    
+    def time(self, name, action, arguments=(None,), setup=None):
+        """Run action(argument) repeat times for each argument and record the samples"""
+        samples = []
+        for _ in range(self.repeat):
+            for argument in arguments:
+                if setup:
+                    setup()
+                started = time.perf_counter()
+                action(argument)
+                self.wait_for_worker()
+                samples.append(time.perf_counter() - started)
+        self.record(name, samples)
+    
+    def run(self, rng):
+        w = self.window
+        conn = w.read_conn
+        member_count = conn.execute("SELECT MAX(id) FROM members").fetchone()[0] or 1
+        member_ids = [rng.randint(1, member_count) for _ in range(5)]
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM members WHERE id IN ({})".format(",".join("?" * len(member_ids))),
+            member_ids)]
+        prefixes = [name[:3] for name in names] + ["07{:04d}".format(rng.randrange(10000))]
+        
+        self.time('load_members', lambda _: w.load_members())
+        self.time('load_visits', lambda _: w.load_visits())
+        self.time('update_dashboard_stats', lambda _: w.update_dashboard_stats(),
+                  setup=w.metrics.invalidate)
+        self.time('expiry_index.load', lambda _: w.expiry_index.load(conn))
+        self.time('update_expiry_alerts', lambda _: w.update_expiry_alerts())
+        
+        def payment_report(days):
+            w.date_from.blockSignals(True)
+            w.date_from.setDate(w.date_to.date().addDays(-days))
+            w.date_from.blockSignals(False)
+            w.generate_payment_report()
+        self.time('generate_payment_report', payment_report, arguments=(1, 30, 365))
+        
+        def individual_report(member_id):
+            w.report_member_combo.set_member(member_id)
+            w.generate_individual_report()
+        self.time('generate_individual_report', individual_report, arguments=member_ids,
+                  setup=w.report_cache.clear)
+        
+        self.time('update_analytics_report', lambda _: w.update_analytics_report())
+        
+        self.time('search_members', w.search_members, arguments=names + ["a", "07"])
+        w.search_members("")
+        self.time('search_members (picker)', lambda prefix: search_members(conn, prefix),
+                  arguments=prefixes)
+        self.time('refresh_all', lambda _: w.refresh_all())
+        return self.timings
+    
+    def close(self):
+        self.window.close()
+        self.app.processEvents()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    for size, dataset in results['datasets'].items():
+        counts = dataset['counts']
+        print("\n{:,} members, {:,} visits, {:,} payments ({:.0f} MB)".format(
+            counts['members'], counts['visits'], counts['payments'], dataset['db_mb']))
+        old = (baseline or {}).get('datasets', {}).get(size, {}).get('timings', {})
+        header = "{:<28} {:>12}".format("path", "median (ms)")
+        if old:
+            header += " {:>12} {:>8}".format("before (ms)", "change")
+        print(header)
+        for name, timing in dataset['timings'].items():
+            line = "{:<28} {:>12.2f}".format(name, timing['median_ms'])
+            if name in old:
+                before = old[name]['median_ms']
+                line += " {:>12.2f} {:>+7.0f}%".format(
+                    before, (timing['median_ms'] - before) / before * 100 if before else 0)
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 50000],
+                        help='member counts to generate, e.g. 1000 50000 500000')
+    parser.add_argument('--years', type=int, default=3, help='years of registrations and visits')
+    parser.add_argument('--visits-per-member', type=int, default=20, help='average visits per member')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', help='keep generated databases here and reuse them')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+    
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    app = QApplication(sys.argv)
+    # A modal box would stall the run; report it instead
+    QMessageBox.warning = staticmethod(lambda parent, title, text, *rest: print("warning:", text))
+    
+    results = {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'settings': {'years': args.years, 'visits_per_member': args.visits_per_member,
+                     'repeat': args.repeat, 'seed': args.seed},
+        'datasets': {},
+    }
+    
+    data_dir = args.data_dir or tempfile.mkdtemp()
+    os.makedirs(data_dir, exist_ok=True)
+    for size in args.sizes:
+        path = os.path.join(data_dir, 'gym_{}_{}y_{}v_{}.db'.format(
+            size, args.years, args.visits_per_member, args.seed))
+        generate_seconds = None
+        if not os.path.exists(path):
+            print("Generating {:,} members...".format(size), flush=True)
+            generate_seconds = round(build_database(path, size, args.years,
+                                                    args.visits_per_member, args.seed), 1)
+        
+        print("Timing {:,} members...".format(size), flush=True)
+        runner = Runner(app, path, args.repeat)
+        timings = runner.run(random.Random(args.seed))
+        runner.close()
+        
+        results['datasets'][str(size)] = {
+            'counts': table_counts(path),
+            'db_mb': round(os.path.getsize(path) / 2 ** 20, 1),
+            'generate_s': generate_seconds,
+            'timings': timings,
+        }
+        if not args.data_dir:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print("\nWrote {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
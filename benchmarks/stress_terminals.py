@@ -0,0 +1,109 @@
+"""Simulate several front-desk terminals sharing one gym database.
+
+Each terminal is a separate process with its own writer and reader
+connections from connect_database(). It records visits exactly like
+GymManagementSystem.record_visit (one INSERT and commit per visit) and reads
+the dashboard metrics in between, as the GUI would after each check-in.
+
+    python benchmarks/stress_terminals.py --terminals 4 --seconds 10
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gym_core import connect_database, init_schema, DashboardMetrics
+
+
+def seed_database(path, members):
+    """Create the schema and a set of active members to check in"""
+    conn = connect_database(path)
+    init_schema(conn)
+    conn.executemany("""
+        INSERT INTO members (name, phone, membership_type, start_date, end_date,
+                             amount_paid, payment_method, status)
+        VALUES (?, ?, 'Monthly', date('now'), date('now', '+1 month'), 3000, 'Cash', 'Active')
+    """, [("Member {}".format(i), "07{:08d}".format(i)) for i in range(members)])
+    conn.commit()
+    conn.close()
+
+
+def run_terminal(path, seconds, members, read_every, results):
+    """Record visits until the deadline and report counts back to the parent"""
+    writer = connect_database(path)
+    reader = connect_database(path, readonly=True)
+    metrics = DashboardMetrics(reader)
+    
+    visits = reads = lock_errors = 0
+    worst_commit = 0.0
+    deadline = time.monotonic() + seconds
+    
+    while time.monotonic() < deadline:
+        try:
+            started = time.monotonic()
+            writer.execute("""
+                INSERT INTO visits (member_id, payment_amount, payment_method, notes)
+                VALUES (?, ?, ?, 'stress test')
+            """, (random.randint(1, members), random.choice([0, 0, 200]), 'Cash'))
+            writer.commit()
+            worst_commit = max(worst_commit, time.monotonic() - started)
+            visits += 1
+            
+            if visits % read_every == 0:
+                metrics.compute()
+                reads += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            writer.rollback()
+            lock_errors += 1
+    
+    writer.close()
+    reader.close()
+    results.put((visits, reads, lock_errors, worst_commit))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terminals', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--members', type=int, default=5000)
+    parser.add_argument('--read-every', type=int, default=5,
+                        help='compute dashboard metrics after every N visits')
+    parser.add_argument('--db', help='database file (default: a temporary file)')
+    args = parser.parse_args()
+    
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'gym_management.db')
+    seed_database(path, args.members)
+    
+    results = multiprocessing.Queue()
+    terminals = [
+        multiprocessing.Process(target=run_terminal,
+                                args=(path, args.seconds, args.members, args.read_every, results))
+        for _ in range(args.terminals)
+    ]
+    started = time.monotonic()
+    for terminal in terminals:
+        terminal.start()
+    totals = [results.get() for _ in terminals]
+    for terminal in terminals:
+        terminal.join()
+    elapsed = time.monotonic() - started
+    
+    visits = sum(t[0] for t in totals)
+    print("Database:        {}".format(path))
+    print("Terminals:       {}".format(args.terminals))
+    print("Visits recorded: {} ({:.0f}/s)".format(visits, visits / elapsed))
+    print("Metric reads:    {}".format(sum(t[1] for t in totals)))
+    print("Lock errors:     {}".format(sum(t[2] for t in totals)))
+    print("Slowest commit:  {:.1f} ms".format(max(t[3] for t in totals) * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,109 @@
+import io
+import os
 import sys
-import sqlite3
-from datetime import datetime, timedelta
+import queue
+import pstats
+import cProfile
+import argparse
+import bisect
+import itertools
+import threading
+import importlib.util
+from datetime import date, datetime, timedelta
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-import json
+from collections import namedtuple, OrderedDict, deque
+
+from gym_core import (
+    DB_PATH, MEMBERSHIP_TYPES, PAYMENT_METHODS, MEMBER_STATUSES, PAYMENT_TYPE_LABELS,
+    day_range, connect_database, init_schema, rebuild_daily_stats, validate_member,
+    import_records, export_records, DashboardMetrics, save_member_record,
+    delete_member_record, VisitWriteQueue, delete_visit_record, renew_member,
+    membership_end_date, renewal_end_date, ExpiryAlertIndex, date_ordinal, member_report,
+    search_members, instrumentation, rebuild_member_stats, engagement_condition,
+    member_engagement, AT_RISK_DAYS, INACTIVE_DAYS, AttendanceCache, attendance_summary,
+    attendance_calendar, payment_history_page, payment_totals, revenue_by_method,
+    recent_activity, member_page, visited_since
+)
+
+# A single write published by a mutation: kind is 'member', 'visit' or
+# 'payment', action is 'insert', 'update' or 'delete'
+DataChange = namedtuple('DataChange', ['kind', 'action', 'row_id', 'member_id'])
+
 
 class GymManagementSystem(QMainWindow):
-    def __init__(self):
+    # Emitted from the visit writer thread with (member_id, future) once a check-in is committed
+    visit_written = pyqtSignal(int, object)
+    
+    # Visits shown per page of the individual report's timeline
+    REPORT_PAGE_SIZE = 20
+    
+    # Most members listed on the At-Risk Members tab
+    ENGAGEMENT_LIMIT = 500
+    
+    # Changes that may move members on the At-Risk list reload it at most this often
+    ENGAGEMENT_REFRESH_MS = 2000
+    
+    # Members listed as least likely to renew on the Analytics tab
+    RENEWAL_LIMIT = 50
+    
+    def __init__(self, db_path=DB_PATH):
         super().__init__()
+        self.db_path = db_path
+        self.pending_changes = []
+        self.refresh_scheduled = False
         self.init_database()
+        self.metrics = DashboardMetrics(self.read_conn)
+        
+        # Reads that may be slow run here so the GUI thread never blocks on them
+        self.query_worker = QueryWorker(self.db_path, self)
+        self.query_worker.start()
+        
+        # Check-ins are committed in groups so a queue at the front desk costs one commit
+        self.visit_queue = VisitWriteQueue(self.db_path)
+        self.visit_written.connect(self.on_visit_written)
+        
+        # Expiry alerts are served from an index that rolls over at midnight
+        self.expiry_index = ExpiryAlertIndex()
+        self.rollover_timer = QTimer(self)
+        self.rollover_timer.setSingleShot(True)
+        self.rollover_timer.timeout.connect(self.roll_over_day)
+        self.schedule_rollover()
+        
+        # Rendered individual reports, one entry per (member id, timeline page)
+        self.report_cache = ReportCache()
+        self.report_member_id = None
+        self.report_offset = 0
+        
+        # Visit days of recently reported members, for their attendance calendars
+        self.attendance = AttendanceCache()
+        
+        # The At-Risk list is reloaded behind a timer, and only while it is on screen
+        self.engagement_member_ids = set()
+        self.engagement_stale = False
+        self.engagement_timer = QTimer(self)
+        self.engagement_timer.setSingleShot(True)
+        self.engagement_timer.setInterval(self.ENGAGEMENT_REFRESH_MS)
+        self.engagement_timer.timeout.connect(self.refresh_stale_engagement)
+        
+        # Active members for the member pickers, read only once a picker needs them
+        self.member_list = MemberListModel(self.read_conn, self)
+        
+        # Only the dashboard is built now; data loads once the window has painted
+        self.lazy_tabs = {}
+        self.pending_load_steps = deque()
         self.init_ui()
-        self.load_data()
+        QTimer.singleShot(0, self.load_progressively)
         
     def init_database(self):
-        """Initialize SQLite database with all required tables"""
-        self.conn = sqlite3.connect('gym_management.db')
-        cursor = self.conn.cursor()
-        
-        # Members table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS members (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone TEXT,
-                email TEXT,
-                address TEXT,
-                membership_type TEXT,
-                start_date DATE,
-                end_date DATE,
-                amount_paid REAL,
-                payment_method TEXT DEFAULT 'Cash',
-                status TEXT DEFAULT 'Active',
-                registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Visits table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS visits (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                member_id INTEGER,
-                visit_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                payment_amount REAL DEFAULT 0,
-                payment_method TEXT DEFAULT 'None',
-                notes TEXT,
-                FOREIGN KEY (member_id) REFERENCES members (id)
-            )
-        ''')
-        
-        # Payments table for detailed tracking
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS payments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                member_id INTEGER,
-                amount REAL NOT NULL,
-                payment_method TEXT NOT NULL,
-                payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                payment_type TEXT DEFAULT 'Membership',
-                notes TEXT,
-                FOREIGN KEY (member_id) REFERENCES members (id)
-            )
-        ''')
+        """Open the writer and reader connections and initialize all tables"""
+        # Timed so the performance panel can start recording at any point
+        self.conn = connect_database(self.db_path, timed=True)
+        self.search_index_available = init_schema(self.conn)
         
-        self.conn.commit()
+        # Reads go through their own connection so they never queue behind writes
+        self.read_conn = connect_database(self.db_path, readonly=True, timed=True)
     
     def init_ui(self):
         """Initialize the main user interface"""
@@ -76,6 +116,9 @@ class GymManagementSystem(QMainWindow):
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
         
+        # Menu bar
+        self.create_menu_bar()
+        
         # Create header
         header = self.create_header()
         layout.addWidget(header)
@@ -97,16 +140,79 @@ class GymManagementSystem(QMainWindow):
             }
         """)
         
-        # Add tabs
+        # Add tabs; all but the dashboard are built the first time they are shown
+        self.tab_widget.currentChanged.connect(
+            lambda index: self.ensure_tab_built(self.tab_widget, index))
+        self.tab_widget.currentChanged.connect(lambda index: self.refresh_stale_engagement())
         self.create_dashboard_tab()
-        self.create_members_tab()
-        self.create_visits_tab()
-        self.create_reports_tab()
+        self.add_lazy_tab(self.tab_widget, "👥 Members", self.create_members_tab, self.load_members)
+        self.add_lazy_tab(self.tab_widget, "📝 Visits", self.create_visits_tab, self.load_visits)
+        self.add_lazy_tab(self.tab_widget, "📊 Reports", self.create_reports_tab)
         
         layout.addWidget(self.tab_widget)
         
         # Status bar
         self.statusBar().showMessage("Gym Management System Ready")
+        
+        # Hidden performance panel for diagnosing slowness at the front desk
+        self.performance_dock = PerformanceDock(self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.performance_dock)
+        self.performance_dock.hide()
+        performance_action = QAction("Performance Panel", self)
+        performance_action.setShortcut(QKeySequence("Ctrl+Shift+D"))
+        performance_action.triggered.connect(
+            lambda: self.performance_dock.setVisible(not self.performance_dock.isVisible()))
+        self.addAction(performance_action)
+    
+    def add_lazy_tab(self, tabs, title, build, load=None):
+        """Add an empty tab whose contents are built by build() and filled by load() when first shown"""
+        page = QWidget()
+        page_layout = QVBoxLayout(page)
+        page_layout.setContentsMargins(0, 0, 0, 0)
+        self.lazy_tabs[page] = (build, load)
+        tabs.addTab(page, title)
+    
+    def ensure_tab_built(self, tabs, index):
+        """Build and load a lazy tab the first time it is activated"""
+        page = tabs.widget(index)
+        if page not in self.lazy_tabs:
+            return
+        build, load = self.lazy_tabs.pop(page)
+        with instrumentation.stage("build tab: {}".format(tabs.tabText(index))):
+            page.layout().addWidget(build())
+            if load:
+                load()
+    
+    def create_menu_bar(self):
+        """Create the main window menu bar"""
+        file_menu = self.menuBar().addMenu("&File")
+        
+        self.import_actions = []
+        for kind, label in (('members', "📥 Import Members..."), ('visits', "📥 Import Visits...")):
+            import_action = QAction(label, self)
+            import_action.triggered.connect(lambda checked, kind=kind: self.import_file(kind))
+            file_menu.addAction(import_action)
+            self.import_actions.append(import_action)
+        
+        file_menu.addSeparator()
+        self.export_actions = []
+        for kind, label in (('members', "📤 Export Members..."), ('visits', "📤 Export Visits..."),
+                            ('payments', "📤 Export Payment Report...")):
+            export_action = QAction(label, self)
+            export_action.triggered.connect(lambda checked, kind=kind: self.export_file(kind))
+            file_menu.addAction(export_action)
+            self.export_actions.append(export_action)
+        
+        view_menu = self.menuBar().addMenu("&View")
+        
+        refresh_action = QAction("🔄 Refresh All", self)
+        refresh_action.setShortcut(QKeySequence.Refresh)
+        refresh_action.triggered.connect(lambda: self.refresh_all())
+        view_menu.addAction(refresh_action)
+        
+        rebuild_action = QAction("🧮 Rebuild Statistics", self)
+        rebuild_action.triggered.connect(self.rebuild_statistics)
+        view_menu.addAction(rebuild_action)
     
     def create_header(self):
         """Create application header with logo and title"""
@@ -219,10 +325,16 @@ class GymManagementSystem(QMainWindow):
         
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("🔍 Search members by name, phone, or email...")
-        self.search_input.textChanged.connect(self.search_members)
+        
+        # Debounce keystrokes so only the text the user settles on is queried
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(lambda: self.search_members(self.search_input.text()))
+        self.search_input.textChanged.connect(lambda text: self.search_timer.start())
         
         filter_combo = QComboBox()
-        filter_combo.addItems(["All Members", "Active", "Expired", "Expiring Soon"])
+        filter_combo.addItems(["All Members", "Active", "Expired", "Expiring Soon", "At Risk", "Inactive"])
         filter_combo.currentTextChanged.connect(self.filter_members)
         
         add_member_btn = QPushButton("➕ Add New Member")
@@ -235,21 +347,27 @@ class GymManagementSystem(QMainWindow):
         
         layout.addLayout(search_layout)
         
-        # Members table
-        self.members_table = QTableWidget()
-        self.members_table.setColumnCount(9)
-        self.members_table.setHorizontalHeaderLabels([
-            "ID", "Name", "Phone", "Email", "Membership", 
-            "Start Date", "End Date", "Status", "Actions"
-        ])
+        # Members table, paged in from the database as it scrolls
+        self.members_model = MembersTableModel(self.read_conn, self)
+        self.members_table = QTableView()
+        self.members_table.setModel(self.members_model)
+        
+        # Edit and delete buttons are painted by a delegate, not per-row widgets
+        self.member_actions_delegate = ButtonColumnDelegate([
+            ("edit", "✏️", "Edit Member"),
+            ("delete", "🗑️", "Delete Member")
+        ], self.members_table)
+        self.member_actions_delegate.clicked.connect(self.on_member_action)
+        self.members_table.setItemDelegateForColumn(8, self.member_actions_delegate)
+        self.members_table.verticalHeader().setDefaultSectionSize(33)
         
         # Style the table
         self.members_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 gridline-color: #d0d0d0;
                 background-color: white;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 8px;
             }
             QHeaderView::section {
@@ -267,7 +385,7 @@ class GymManagementSystem(QMainWindow):
         
         layout.addWidget(self.members_table)
         
-        self.tab_widget.addTab(members_widget, "👥 Members")
+        return members_widget
     
     def create_visits_tab(self):
         """Create visits tracking tab"""
@@ -279,8 +397,7 @@ class GymManagementSystem(QMainWindow):
         record_layout = QHBoxLayout(record_group)
         
         # Member selection
-        self.visit_member_combo = QComboBox()
-        self.visit_member_combo.setEditable(True)
+        self.visit_member_combo = MemberPicker(self.member_list, self.read_conn)
         self.visit_member_combo.setPlaceholderText("Select or search member...")
         
         # Payment amount
@@ -289,7 +406,7 @@ class GymManagementSystem(QMainWindow):
         
         # Payment method
         self.visit_payment_method = QComboBox()
-        self.visit_payment_method.addItems(["None", "Cash", "M-Pesa", "Bank Transfer", "Card"])
+        self.visit_payment_method.addItems(["None"] + PAYMENT_METHODS)
         
         # Notes
         self.visit_notes_input = QLineEdit()
@@ -335,35 +452,56 @@ class GymManagementSystem(QMainWindow):
         self.visits_table.horizontalHeader().setStretchLastSection(True)
         self.visits_table.setAlternatingRowColors(True)
         
+        self.visit_actions_delegate = ButtonColumnDelegate([
+            ("delete", "🗑️", "Delete Visit")
+        ], self.visits_table)
+        self.visit_actions_delegate.clicked.connect(lambda action, visit_id: self.delete_visit(visit_id))
+        self.visits_table.setItemDelegateForColumn(6, self.visit_actions_delegate)
+        
         layout.addWidget(self.visits_table)
         
-        self.tab_widget.addTab(visits_widget, "📝 Visits")
+        return visits_widget
     
     def create_reports_tab(self):
         """Create comprehensive reports tab with analytics"""
         reports_widget = QWidget()
         layout = QVBoxLayout(reports_widget)
         
-        # Create reports sub-tabs
-        reports_tabs = QTabWidget()
+        # Create reports sub-tabs, each built when first shown
+        self.reports_tabs = QTabWidget()
+        self.reports_tabs.currentChanged.connect(
+            lambda index: self.ensure_tab_built(self.reports_tabs, index))
+        self.reports_tabs.currentChanged.connect(lambda index: self.refresh_stale_engagement())
         
         # Dashboard Report
-        self.create_dashboard_report_tab(reports_tabs)
+        self.add_lazy_tab(self.reports_tabs, "📊 Dashboard", self.create_dashboard_report_tab,
+                          lambda: self.update_dashboard())
         
         # Expiry Alerts
-        self.create_expiry_alerts_tab(reports_tabs)
+        self.add_lazy_tab(self.reports_tabs, "🚨 Expiry Alerts", self.create_expiry_alerts_tab,
+                          self.load_expiry_alerts)
         
         # Payment Reports
-        self.create_payment_reports_tab(reports_tabs)
+        self.add_lazy_tab(self.reports_tabs, "💳 Payment Reports", self.create_payment_reports_tab,
+                          lambda: self.update_payment_summary())
         
         # Individual Reports
-        self.create_individual_reports_tab(reports_tabs)
+        self.add_lazy_tab(self.reports_tabs, "👤 Individual Reports", self.create_individual_reports_tab,
+                          lambda: self.generate_individual_report())
+        
+        # At-Risk Members
+        self.add_lazy_tab(self.reports_tabs, "📉 At-Risk Members", self.create_engagement_tab,
+                          lambda: self.update_engagement_report())
         
-        layout.addWidget(reports_tabs)
+        # Retention, attendance and renewal analytics
+        self.add_lazy_tab(self.reports_tabs, "📈 Analytics", self.create_analytics_tab,
+                          lambda: self.update_analytics_report())
         
-        self.tab_widget.addTab(reports_widget, "📊 Reports")
+        layout.addWidget(self.reports_tabs)
+        
+        return reports_widget
     
-    def create_dashboard_report_tab(self, parent_tabs):
+    def create_dashboard_report_tab(self):
         """Create dashboard report with key statistics"""
         dashboard_report = QWidget()
         layout = QVBoxLayout(dashboard_report)
@@ -417,9 +555,9 @@ class GymManagementSystem(QMainWindow):
         
         layout.addStretch()
         
-        parent_tabs.addTab(dashboard_report, "📊 Dashboard")
+        return dashboard_report
     
-    def create_expiry_alerts_tab(self, parent_tabs):
+    def create_expiry_alerts_tab(self):
         """Create expiry alerts tab"""
         expiry_widget = QWidget()
         layout = QVBoxLayout(expiry_widget)
@@ -465,11 +603,19 @@ class GymManagementSystem(QMainWindow):
             }
         """)
         
+        self.alert_actions_delegate = ButtonColumnDelegate([
+            ("renew", "🔄 Renew", "Renew Membership")
+        ], self.alerts_table)
+        self.alert_actions_delegate.clicked.connect(
+            lambda action, member_id: self.renew_membership(member_id))
+        self.alerts_table.setItemDelegateForColumn(6, self.alert_actions_delegate)
+        self.alerts_table.verticalHeader().setDefaultSectionSize(33)
+        
         layout.addWidget(self.alerts_table)
         
-        parent_tabs.addTab(expiry_widget, "🚨 Expiry Alerts")
+        return expiry_widget
     
-    def create_payment_reports_tab(self, parent_tabs):
+    def create_payment_reports_tab(self):
         """Create payment analysis tab"""
         payment_widget = QWidget()
         layout = QVBoxLayout(payment_widget)
@@ -513,29 +659,41 @@ class GymManagementSystem(QMainWindow):
         
         filter_btn = QPushButton("📊 Generate Report")
         filter_btn.setStyleSheet(self.get_button_style("#3498db"))
-        filter_btn.clicked.connect(self.generate_payment_report)
+        filter_btn.clicked.connect(lambda: self.generate_payment_report())
+        
+        # Changing the range re-runs the report, cancelling one still in flight
+        self.date_from.dateChanged.connect(lambda day: self.generate_payment_report())
+        self.date_to.dateChanged.connect(lambda day: self.generate_payment_report())
+        
+        self.payment_report_status = QLabel("")
+        self.payment_report_status.setStyleSheet("color: #7f8c8d;")
+        
+        self.payment_report_total = QLabel("")
+        self.payment_report_total.setStyleSheet("font-weight: bold; color: #27ae60;")
         
         filter_layout.addWidget(self.date_from)
         filter_layout.addWidget(QLabel("to"))
         filter_layout.addWidget(self.date_to)
         filter_layout.addWidget(filter_btn)
+        filter_layout.addWidget(self.payment_report_status)
+        filter_layout.addWidget(self.payment_report_total)
         filter_layout.addStretch()
         
         history_layout.addLayout(filter_layout)
         
-        # Payment history table
-        self.payment_history_table = QTableWidget()
-        self.payment_history_table.setColumnCount(6)
-        self.payment_history_table.setHorizontalHeaderLabels([
-            "Date", "Member", "Amount", "Method", "Type", "Notes"
-        ])
+        # Payment history table, paged in on the query worker as it scrolls
+        self.payment_history_model = PaymentHistoryModel(self.query_worker, self)
+        self.payment_history_model.failed.connect(self.on_payment_report_failed)
+        self.payment_history_table = QTableView()
+        self.payment_history_table.setModel(self.payment_history_model)
+        self.payment_history_table.horizontalHeader().setStretchLastSection(True)
         
         history_layout.addWidget(self.payment_history_table)
         layout.addWidget(history_group)
         
-        parent_tabs.addTab(payment_widget, "💳 Payment Reports")
+        return payment_widget
     
-    def create_individual_reports_tab(self, parent_tabs):
+    def create_individual_reports_tab(self):
         """Create individual member reports tab"""
         individual_widget = QWidget()
         layout = QVBoxLayout(individual_widget)
@@ -544,13 +702,25 @@ class GymManagementSystem(QMainWindow):
         selection_layout = QHBoxLayout()
         selection_layout.addWidget(QLabel("Select Member:"))
         
-        self.report_member_combo = QComboBox()
-        self.report_member_combo.setEditable(True)
-        self.report_member_combo.currentTextChanged.connect(self.generate_individual_report)
+        self.report_member_combo = MemberPicker(self.member_list, self.read_conn)
+        self.report_member_combo.setPlaceholderText("Select or search member...")
+        self.report_member_combo.currentIndexChanged.connect(lambda index: self.generate_individual_report())
         
         selection_layout.addWidget(self.report_member_combo, 2)
         selection_layout.addStretch()
         
+        # Visit timeline paging
+        self.report_newer_btn = QPushButton("◀ Newer Visits")
+        self.report_newer_btn.setStyleSheet(self.get_button_style("#3498db"))
+        self.report_newer_btn.clicked.connect(lambda: self.page_individual_report(-1))
+        self.report_page_label = QLabel("")
+        self.report_older_btn = QPushButton("Older Visits ▶")
+        self.report_older_btn.setStyleSheet(self.get_button_style("#3498db"))
+        self.report_older_btn.clicked.connect(lambda: self.page_individual_report(1))
+        selection_layout.addWidget(self.report_newer_btn)
+        selection_layout.addWidget(self.report_page_label)
+        selection_layout.addWidget(self.report_older_btn)
+        
         layout.addLayout(selection_layout)
         
         # Member report display
@@ -568,7 +738,173 @@ class GymManagementSystem(QMainWindow):
         
         layout.addWidget(self.member_report_text)
         
-        parent_tabs.addTab(individual_widget, "👤 Individual Reports")
+        return individual_widget
+    
+    def create_engagement_tab(self):
+        """Create the tab listing current members who have stopped visiting"""
+        engagement_widget = QWidget()
+        layout = QVBoxLayout(engagement_widget)
+        
+        # Level and sort selection
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Show:"))
+        
+        self.engagement_level_combo = QComboBox()
+        self.engagement_level_combo.addItem("At risk and inactive", None)
+        self.engagement_level_combo.addItem(
+            "At risk ({}-{} days since last visit)".format(AT_RISK_DAYS, INACTIVE_DAYS - 1), 'AT RISK')
+        self.engagement_level_combo.addItem(
+            "Inactive ({}+ days or never visited)".format(INACTIVE_DAYS), 'INACTIVE')
+        self.engagement_level_combo.currentIndexChanged.connect(
+            lambda index: self.update_engagement_report())
+        
+        self.engagement_order_combo = QComboBox()
+        for label, order in (("Longest absent first", 'absent'), ("Highest lifetime paid first", 'paid'),
+                             ("Most visits first", 'visits')):
+            self.engagement_order_combo.addItem(label, order)
+        self.engagement_order_combo.currentIndexChanged.connect(
+            lambda index: self.update_engagement_report())
+        
+        self.engagement_status = QLabel("")
+        self.engagement_status.setStyleSheet("color: #7f8c8d;")
+        
+        filter_layout.addWidget(self.engagement_level_combo)
+        filter_layout.addWidget(QLabel("Sort:"))
+        filter_layout.addWidget(self.engagement_order_combo)
+        filter_layout.addWidget(self.engagement_status)
+        filter_layout.addStretch()
+        
+        layout.addLayout(filter_layout)
+        
+        # Members table
+        self.engagement_table = QTableWidget()
+        self.engagement_table.setColumnCount(11)
+        self.engagement_table.setHorizontalHeaderLabels([
+            "Level", "Member", "Phone", "Membership Ends", "Last Visit", "Days Absent",
+            "Visits", "Last 30 Days", "Last 90 Days", "Avg Gap (days)", "Lifetime Paid"
+        ])
+        
+        self.engagement_table.setStyleSheet("""
+            QTableWidget {
+                gridline-color: #d0d0d0;
+                background-color: white;
+            }
+            QHeaderView::section {
+                background-color: #34495e;
+                color: white;
+                padding: 10px;
+                font-weight: bold;
+                border: none;
+            }
+        """)
+        self.engagement_table.horizontalHeader().setStretchLastSection(True)
+        self.engagement_table.setAlternatingRowColors(True)
+        
+        layout.addWidget(self.engagement_table)
+        
+        return engagement_widget
+    
+    def create_analytics_tab(self):
+        """Create the tab with cohort retention, the attendance heatmap and the renewal outlook"""
+        analytics_widget = QWidget()
+        layout = QVBoxLayout(analytics_widget)
+        
+        # Period and refresh
+        controls_layout = QHBoxLayout()
+        controls_layout.addWidget(QLabel("Attendance over:"))
+        
+        self.analytics_period_combo = QComboBox()
+        for label, days in (("Last 4 weeks", 28), ("Last 12 weeks", 84), ("Last year", 364),
+                            ("All time", None)):
+            self.analytics_period_combo.addItem(label, days)
+        self.analytics_period_combo.setCurrentIndex(1)
+        self.analytics_period_combo.currentIndexChanged.connect(
+            lambda index: self.show_attendance_heatmap())
+        
+        refresh_btn = QPushButton("🔄 Refresh")
+        refresh_btn.setStyleSheet(self.get_button_style("#3498db"))
+        refresh_btn.clicked.connect(lambda: self.update_analytics_report())
+        
+        self.analytics_status = QLabel("")
+        self.analytics_status.setStyleSheet("color: #7f8c8d;")
+        
+        controls_layout.addWidget(self.analytics_period_combo)
+        controls_layout.addWidget(refresh_btn)
+        controls_layout.addWidget(self.analytics_status)
+        controls_layout.addStretch()
+        
+        layout.addLayout(controls_layout)
+        
+        # The three reports stack up taller than the window, so they scroll
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        content = QWidget()
+        content_layout = QVBoxLayout(content)
+        
+        # Cohort retention
+        cohort_group = QGroupBox("👥 Cohort Retention (members who joined each month and visited N months later)")
+        cohort_layout = QVBoxLayout(cohort_group)
+        
+        self.cohort_summary = QLabel("")
+        self.cohort_summary.setStyleSheet("font-weight: bold; color: #2c3e50;")
+        
+        self.cohort_table = QTableWidget()
+        self.cohort_table.setMinimumHeight(420)
+        self.cohort_table.verticalHeader().setVisible(False)
+        
+        cohort_layout.addWidget(self.cohort_summary)
+        cohort_layout.addWidget(self.cohort_table)
+        content_layout.addWidget(cohort_group)
+        
+        # Attendance heatmap
+        heatmap_group = QGroupBox("🕒 Attendance by Weekday and Hour (average visits per week)")
+        heatmap_layout = QVBoxLayout(heatmap_group)
+        
+        self.heatmap_table = QTableWidget(7, 24)
+        self.heatmap_table.setMinimumHeight(260)
+        self.heatmap_table.setHorizontalHeaderLabels(["{:02d}".format(hour) for hour in range(24)])
+        self.heatmap_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.heatmap_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        
+        heatmap_layout.addWidget(self.heatmap_table)
+        content_layout.addWidget(heatmap_group)
+        
+        # Renewal outlook
+        renewal_group = QGroupBox("🔁 Renewal Outlook")
+        renewal_layout = QVBoxLayout(renewal_group)
+        
+        self.renewal_summary = QLabel("")
+        self.renewal_summary.setWordWrap(True)
+        self.renewal_summary.setStyleSheet("font-weight: bold; color: #2c3e50;")
+        
+        self.renewal_rates_table = QTableWidget()
+        self.renewal_rates_table.setColumnCount(5)
+        self.renewal_rates_table.setHorizontalHeaderLabels([
+            "Visits in Last 30 Days", "Renewed", "Lapsed", "Renewal Rate", "Ending Soon"
+        ])
+        self.renewal_rates_table.setMinimumHeight(230)
+        self.renewal_rates_table.verticalHeader().setVisible(False)
+        self.renewal_rates_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        
+        self.renewal_members_table = QTableWidget()
+        self.renewal_members_table.setColumnCount(5)
+        self.renewal_members_table.setHorizontalHeaderLabels([
+            "Member", "Phone", "Membership Ends", "Visits (30 days)", "Renewal Likelihood"
+        ])
+        self.renewal_members_table.setMinimumHeight(300)
+        self.renewal_members_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.renewal_members_table.setAlternatingRowColors(True)
+        
+        renewal_layout.addWidget(self.renewal_summary)
+        renewal_layout.addWidget(self.renewal_rates_table)
+        renewal_layout.addWidget(QLabel("Least likely to renew:"))
+        renewal_layout.addWidget(self.renewal_members_table)
+        content_layout.addWidget(renewal_group)
+        
+        scroll.setWidget(content)
+        layout.addWidget(scroll)
+        
+        return analytics_widget
     
     def create_metric_card(self, title, value, color):
         """Create a metric card widget"""
@@ -651,75 +987,322 @@ class GymManagementSystem(QMainWindow):
             }}
         """
     
+    def load_steps(self):
+        """Loaders for the dashboard and the tabs, in the order they should fill in"""
+        # Loaders of tabs that have not been built yet return straight away
+        return [
+            lambda: self.update_dashboard(),
+            lambda: self.load_recent_activity(),
+            lambda: self.reload_member_pickers(),
+            lambda: self.load_members(),
+            lambda: self.load_visits(),
+            self.load_expiry_alerts,
+            lambda: self.update_payment_summary(),
+            lambda: self.update_engagement_report(),
+            lambda: self.update_analytics_report(),
+        ]
+    
+    @instrumentation.timed
     def load_data(self):
         """Load all data and refresh UI"""
-        self.load_members()
-        self.load_visits()
-        self.update_dashboard()
-        self.update_member_combos()
+        for step in self.load_steps():
+            step()
+    
+    def load_progressively(self):
+        """Run the startup load one step per event loop pass so the window paints in between"""
+        if not self.pending_load_steps:
+            self.pending_load_steps.extend(self.load_steps())
+            self.statusBar().showMessage("Loading...")
+        
+        self.pending_load_steps.popleft()()
+        if self.pending_load_steps:
+            QTimer.singleShot(0, self.load_progressively)
+        elif self.statusBar().currentMessage() == "Loading...":
+            self.statusBar().clearMessage()
+    
+    def load_expiry_alerts(self):
+        """Read the expiry index and show it, once the Expiry Alerts tab exists"""
+        if not hasattr(self, 'alerts_table'):
+            return
+        with instrumentation.stage('expiry_index.load'):
+            self.expiry_index.load(self.read_conn)
         self.update_expiry_alerts()
+    
+    def schedule_rollover(self):
+        """Arm the timer for just after the coming midnight"""
+        now = QDateTime.currentDateTime()
+        midnight = QDateTime(now.date().addDays(1), QTime(0, 0))
+        self.rollover_timer.start(now.msecsTo(midnight) + 1000)
+    
+    @instrumentation.timed
+    def roll_over_day(self):
+        """Move date-dependent views to the new day: expiry alerts, colours and today's KPIs"""
+        if hasattr(self, 'alerts_table'):
+            self.expiry_index.rollover(self.read_conn)
+            self.update_expiry_alerts()
+        if hasattr(self, 'members_model'):
+            self.members_model.refresh_expiry_colors()
+        self.metrics.invalidate()
+        self.update_dashboard()
         self.update_payment_summary()
+        self.update_engagement_report()
+        self.update_analytics_report()
+        self.report_cache.clear()
+        self.generate_individual_report()
+        self.schedule_rollover()
+    
+    @instrumentation.timed
+    def refresh_all(self):
+        """Discard pending changes and fully reload every view"""
+        self.pending_changes = []
+        self.metrics.invalidate()
+        self.attendance.clear()
+        self.report_cache.clear()
+        self.load_data()
+        self.statusBar().showMessage("All data reloaded", 3000)
+    
+    def rebuild_statistics(self):
+        """Recompute the daily and per-member statistics, e.g. after editing the database by hand"""
+        rebuild_daily_stats(self.conn)
+        rebuild_member_stats(self.conn)
+        self.report_cache.clear()
+        self.refresh_all()
+        self.statusBar().showMessage("Daily statistics rebuilt", 3000)
+    
+    def import_file(self, kind):
+        """Ask for a CSV/JSON file and import its members or visits in the background"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import {}".format(kind.title()), "",
+            "Data files (*.csv *.json *.jsonl *.ndjson);;All files (*)"
+        )
+        if not path:
+            return
+        
+        def run(progress):
+            conn = connect_database(self.db_path)
+            try:
+                return import_records(conn, kind, path, progress=progress)
+            finally:
+                conn.close()
+        
+        for action in self.import_actions:
+            action.setEnabled(False)
+        self.import_task = BackgroundTask(run, self)
+        self.import_task.progressed.connect(
+            lambda count: self.statusBar().showMessage("Importing {}: {:,} rows...".format(kind, count)))
+        self.import_task.succeeded.connect(self.on_import_finished)
+        self.import_task.failed.connect(self.on_import_failed)
+        self.import_task.start()
+    
+    def on_import_finished(self, result):
+        """Reload everything after an import and summarise what was stored"""
+        for action in self.import_actions:
+            action.setEnabled(True)
+        self.refresh_all()
+        self.statusBar().showMessage("Imported {:,} {} in {:.1f}s".format(
+            result.imported, result.kind, result.seconds), 5000)
+        
+        if result.rejected:
+            details = "\n".join("Row {}: {}".format(line, message) for line, message in result.errors)
+            QMessageBox.warning(self, "Import",
+                                "Imported {:,} {}, skipped {:,} invalid rows:\n\n{}".format(
+                                    result.imported, result.kind, result.rejected, details))
+    
+    def on_import_failed(self, message):
+        """Report an import that was rolled back"""
+        for action in self.import_actions:
+            action.setEnabled(True)
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Error", "Import failed: {}!".format(message))
+    
+    def export_file(self, kind):
+        """Ask for a destination and export a dataset to it in the background.
+        
+        The payment report uses the date range selected on the Reports tab.
+        """
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export {}".format(kind.title()), "{}.csv".format(kind),
+            "CSV (*.csv);;JSON Lines (*.jsonl);;Excel (*.xlsx);;Parquet (*.parquet)"
+        )
+        if not path:
+            return
+        
+        date_from = date_to = None
+        if kind == 'payments':
+            # Until the Payment Reports tab is opened its range is the default last 30 days
+            range_to = self.date_to.date() if hasattr(self, 'date_to') else QDate.currentDate()
+            range_from = self.date_from.date() if hasattr(self, 'date_from') else range_to.addDays(-30)
+            date_from = range_from.toString('yyyy-MM-dd')
+            date_to = range_to.toString('yyyy-MM-dd')
+        
+        def run(progress):
+            conn = connect_database(self.db_path, readonly=True)
+            try:
+                return kind, path, export_records(conn, kind, path, date_from, date_to, progress=progress)
+            finally:
+                conn.close()
+        
+        for action in self.export_actions:
+            action.setEnabled(False)
+        self.export_task = BackgroundTask(run, self)
+        self.export_task.progressed.connect(
+            lambda count: self.statusBar().showMessage("Exporting {}: {:,} rows...".format(kind, count)))
+        self.export_task.succeeded.connect(self.on_export_finished)
+        self.export_task.failed.connect(self.on_export_failed)
+        self.export_task.start()
+    
+    def on_export_finished(self, result):
+        """Report where the export was written"""
+        kind, path, count = result
+        for action in self.export_actions:
+            action.setEnabled(True)
+        self.statusBar().showMessage("Exported {:,} {} to {}".format(count, kind, path), 5000)
+    
+    def on_export_failed(self, message):
+        """Report an export that could not be written"""
+        for action in self.export_actions:
+            action.setEnabled(True)
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Error", "Export failed: {}!".format(message))
+    
+    def closeEvent(self, event):
+        """Commit queued check-ins and stop the query worker before the window goes away"""
+        self.visit_queue.close()
+        self.query_worker.stop()
+        super().closeEvent(event)
+    
+    def publish_change(self, kind, action, row_id, member_id=None):
+        """Record a data change and schedule an incremental refresh"""
+        self.pending_changes.append(DataChange(kind, action, row_id, member_id))
+        self.metrics.invalidate()
+        
+        # Coalesce every change made in this event loop pass into one refresh
+        if not self.refresh_scheduled:
+            self.refresh_scheduled = True
+            QTimer.singleShot(0, self.apply_pending_changes)
+    
+    @instrumentation.timed
+    def apply_pending_changes(self):
+        """Patch only the rows, combo entries and cards touched by pending changes"""
+        self.refresh_scheduled = False
+        changes, self.pending_changes = self.pending_changes, []
+        if not changes:
+            return
+        
+        member_changes = [c for c in changes if c.kind == 'member']
+        visit_changes = [c for c in changes if c.kind == 'visit']
+        payment_changes = [c for c in changes if c.kind == 'payment']
+        
+        for change in member_changes:
+            self.patch_member_row(change)
+            self.patch_member_list(change)
+            if not hasattr(self, 'alerts_table'):
+                continue  # The index is read when the Expiry Alerts tab is built
+            if change.action == 'delete':
+                self.expiry_index.discard(change.row_id)
+            else:
+                self.expiry_index.refresh_member(self.read_conn, change.row_id)
+        
+        for change in visit_changes:
+            self.patch_visit_row(change)
+        
+        if member_changes:
+            self.update_expiry_alerts()
+        
+        # Deleting a member also deletes their payments, which only the member change announces
+        if visit_changes or payment_changes or any(c.action == 'delete' for c in member_changes):
+            self.update_payment_summary()
+        
+        # Most check-ins leave the At-Risk list as it is; reload it only when one may not
+        if self.engagement_changed_by(changes):
+            self.engagement_stale = True
+            if not self.engagement_timer.isActive():
+                self.engagement_timer.start()
+        
+        # Every change kind feeds some KPI; the cards and stats share one snapshot
+        self.update_dashboard()
         self.load_recent_activity()
+        
+        # Drop cached reports of touched members and regenerate the open one if needed
+        touched = {c.member_id for c in changes} | {c.row_id for c in member_changes}
+        for member_id in touched:
+            self.report_cache.invalidate(member_id)
+        if hasattr(self, 'report_member_combo') and (
+                self.report_member_id in touched
+                or self.report_member_combo.currentData() != self.report_member_id):
+            self.generate_individual_report()
     
+    @instrumentation.timed
     def load_members(self):
-        """Load members into table"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT id, name, phone, email, membership_type, 
-                   start_date, end_date, status
-            FROM members ORDER BY registration_date DESC
-        """)
+        """Load the first page of members into table"""
+        if not hasattr(self, 'members_model'):
+            return
+        self.members_model.reload()
+    
+    def on_member_action(self, action, member_id):
+        """Dispatch a click on a members table action button"""
+        if action == "edit":
+            self.edit_member(member_id)
+        elif action == "delete":
+            self.delete_member(member_id)
+    
+    def find_table_row(self, table, row_id):
+        """Return the row index whose ID column holds row_id, or -1"""
+        row_id = str(row_id)
+        for row in range(table.rowCount()):
+            item = table.item(row, 0)
+            if item and item.text() == row_id:
+                return row
+        return -1
+    
+    def patch_member_row(self, change):
+        """Insert, refresh or remove a single members table row"""
+        if change.action == 'delete':
+            if hasattr(self, 'members_model'):
+                self.members_model.remove_member(change.row_id)
+            self.remove_member_visit_rows(change.row_id)
+            return
         
-        members = cursor.fetchall()
-        self.members_table.setRowCount(len(members))
+        if hasattr(self, 'members_model'):
+            self.members_model.patch_member(change.row_id)
         
-        for row, member in enumerate(members):
-            for col, value in enumerate(member):
-                if col == 6:  # end_date column
-                    # Check if membership is expired or expiring soon
-                    if value:
-                        end_date = datetime.strptime(value, '%Y-%m-%d')
-                        days_left = (end_date - datetime.now()).days
-                        
-                        item = QTableWidgetItem(value)
-                        if days_left < 0:
-                            item.setBackground(QColor("#ffebee"))  # Light red for expired
-                        elif days_left <= 7:
-                            item.setBackground(QColor("#fff3e0"))  # Light orange for expiring soon
-                        
-                        self.members_table.setItem(row, col, item)
-                    else:
-                        self.members_table.setItem(row, col, QTableWidgetItem(""))
-                else:
-                    self.members_table.setItem(row, col, QTableWidgetItem(str(value) if value else ""))
-            
-            # Add action buttons
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            actions_layout.setContentsMargins(5, 2, 5, 2)
-            
-            edit_btn = QPushButton("✏️")
-            edit_btn.setToolTip("Edit Member")
-            edit_btn.setMaximumSize(30, 25)
-            edit_btn.clicked.connect(lambda checked, m_id=member[0]: self.edit_member(m_id))
-            
-            delete_btn = QPushButton("🗑️")
-            delete_btn.setToolTip("Delete Member")
-            delete_btn.setMaximumSize(30, 25)
-            delete_btn.clicked.connect(lambda checked, m_id=member[0]: self.delete_member(m_id))
-            
-            actions_layout.addWidget(edit_btn)
-            actions_layout.addWidget(delete_btn)
-            actions_layout.addStretch()
-            
-            self.members_table.setCellWidget(row, 8, actions_widget)
+        # Keep the member name shown in the visits table in sync
+        if not hasattr(self, 'visits_table'):
+            return
+        cursor = self.read_conn.cursor()
+        cursor.execute("SELECT name FROM members WHERE id = ?", (change.row_id,))
+        member = cursor.fetchone()
+        if not member:
+            return
+        for visit_row in range(self.visits_table.rowCount()):
+            id_item = self.visits_table.item(visit_row, 0)
+            if id_item and id_item.data(Qt.UserRole) == change.row_id:
+                self.visits_table.item(visit_row, 1).setText(member[0])
+    
+    def patch_member_list(self, change):
+        """Add, rename or drop a member in the shared member picker list"""
+        member = None
+        if change.action != 'delete':
+            cursor = self.read_conn.cursor()
+            cursor.execute("SELECT name FROM members WHERE id = ? AND status = 'Active'",
+                          (change.row_id,))
+            member = cursor.fetchone()
+        
+        if member:
+            self.member_list.upsert(change.row_id, member[0])
+        else:
+            self.member_list.remove(change.row_id)
     
+    @instrumentation.timed
     def load_visits(self):
         """Load visits into table"""
-        cursor = self.conn.cursor()
+        if not hasattr(self, 'visits_table'):
+            return
+        
+        cursor = self.read_conn.cursor()
         cursor.execute("""
             SELECT v.id, m.name, v.visit_date, v.payment_amount, 
-                   v.payment_method, v.notes
+                   v.payment_method, v.notes, v.member_id
             FROM visits v
             JOIN members m ON v.member_id = m.id
             ORDER BY v.visit_date DESC
@@ -730,214 +1313,167 @@ class GymManagementSystem(QMainWindow):
         self.visits_table.setRowCount(len(visits))
         
         for row, visit in enumerate(visits):
-            for col, value in enumerate(visit):
-                if col == 2:  # visit_date
-                    # Format datetime
-                    try:
-                        dt = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
-                        formatted_date = dt.strftime('%Y-%m-%d %I:%M %p')
-                        self.visits_table.setItem(row, col, QTableWidgetItem(formatted_date))
-                    except:
-                        self.visits_table.setItem(row, col, QTableWidgetItem(str(value)))
-                elif col == 3:  # payment_amount
-                    try:
-                        amount_val = float(value) if value else 0
-                        amount_text = "KSh {:.0f}".format(amount_val) if amount_val > 0 else "No Payment"
-                    except (ValueError, TypeError):
-                        amount_text = "No Payment"
-                    self.visits_table.setItem(row, col, QTableWidgetItem(amount_text))
-                else:
-                    self.visits_table.setItem(row, col, QTableWidgetItem(str(value) if value else ""))
-            
-            # Add action buttons
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            actions_layout.setContentsMargins(5, 2, 5, 2)
-            
-            delete_btn = QPushButton("🗑️")
-            delete_btn.setToolTip("Delete Visit")
-            delete_btn.setMaximumSize(30, 25)
-            delete_btn.clicked.connect(lambda checked, v_id=visit[0]: self.delete_visit(v_id))
-            
-            actions_layout.addWidget(delete_btn)
-            actions_layout.addStretch()
-            
-            self.visits_table.setCellWidget(row, 6, actions_widget)
+            self.fill_visit_row(row, visit)
     
-    def update_dashboard(self):
-        """Update dashboard metrics"""
-        cursor = self.conn.cursor()
-        
-        # Total members
-        cursor.execute("SELECT COUNT(*) FROM members")
-        total_members = cursor.fetchone()[0]
-        self.total_members_card.findChild(QLabel, "value_label").setText(str(total_members))
-        
-        # Active members
-        cursor.execute("SELECT COUNT(*) FROM members WHERE status = 'Active'")
-        active_members = cursor.fetchone()[0]
-        self.active_members_card.findChild(QLabel, "value_label").setText(str(active_members))
+    def fill_visit_row(self, row, visit):
+        """Populate one visits table row, including its action buttons"""
+        for col, value in enumerate(visit[:6]):
+            if col == 2:  # visit_date
+                # Format datetime
+                try:
+                    dt = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+                    formatted_date = dt.strftime('%Y-%m-%d %I:%M %p')
+                    self.visits_table.setItem(row, col, QTableWidgetItem(formatted_date))
+                except:
+                    self.visits_table.setItem(row, col, QTableWidgetItem(str(value)))
+            elif col == 3:  # payment_amount
+                try:
+                    amount_val = float(value) if value else 0
+                    amount_text = "KSh {:.0f}".format(amount_val) if amount_val > 0 else "No Payment"
+                except (ValueError, TypeError):
+                    amount_text = "No Payment"
+                self.visits_table.setItem(row, col, QTableWidgetItem(amount_text))
+            else:
+                self.visits_table.setItem(row, col, QTableWidgetItem(str(value) if value else ""))
         
-        # Members expiring this week
-        next_week = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
-        cursor.execute("""
-            SELECT COUNT(*) FROM members 
-            WHERE end_date <= ? AND end_date >= date('now') AND status = 'Active'
-        """, (next_week,))
-        expiring_count = cursor.fetchone()[0]
-        self.expiring_members_card.findChild(QLabel, "value_label").setText(str(expiring_count))
-        
-        # Today's revenue
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute("""
-            SELECT COALESCE(SUM(payment_amount), 0) FROM visits 
-            WHERE date(visit_date) = ?
-        """, (today,))
-        today_revenue = cursor.fetchone()[0] or 0
-        try:
-            today_revenue = float(today_revenue)
-        except (ValueError, TypeError):
-            today_revenue = 0.0
-        self.revenue_card.findChild(QLabel, "value_label").setText("KSh {:,.0f}".format(today_revenue))
+        # Remember the member so member edits and deletes can patch this row
+        self.visits_table.item(row, 0).setData(Qt.UserRole, visit[6])
         
-        # Update dashboard report statistics
-        if hasattr(self, 'stats_labels'):
-            self.update_dashboard_stats()
+        # The delete button is painted by visit_actions_delegate for this visit id
+        actions_item = QTableWidgetItem()
+        actions_item.setFlags(Qt.ItemIsEnabled)
+        actions_item.setData(Qt.UserRole, visit[0])
+        self.visits_table.setItem(row, 6, actions_item)
     
-    def update_dashboard_stats(self):
-        """Update detailed dashboard statistics"""
-        cursor = self.conn.cursor()
-        
-        # Total members
-        cursor.execute("SELECT COUNT(*) FROM members")
-        self.stats_labels['total_members'].setText(str(cursor.fetchone()[0]))
-        
-        # Active members
-        cursor.execute("SELECT COUNT(*) FROM members WHERE status = 'Active'")
-        self.stats_labels['active_members'].setText(str(cursor.fetchone()[0]))
-        
-        # Expired members
-        cursor.execute("""
-            SELECT COUNT(*) FROM members 
-            WHERE end_date < date('now') AND status = 'Active'
-        """)
-        self.stats_labels['expired_members'].setText(str(cursor.fetchone()[0]))
-        
-        # Total revenue
-        cursor.execute("SELECT COALESCE(SUM(amount_paid), 0) FROM members")
-        total_rev = cursor.fetchone()[0] or 0
-        cursor.execute("SELECT COALESCE(SUM(payment_amount), 0) FROM visits")
-        visit_rev = cursor.fetchone()[0] or 0
-        try:
-            total_rev = float(total_rev)
-            visit_rev = float(visit_rev)
-        except (ValueError, TypeError):
-            total_rev = 0.0
-            visit_rev = 0.0
-        self.stats_labels['total_revenue'].setText("KSh {:,.0f}".format(total_rev + visit_rev))
+    def patch_visit_row(self, change):
+        """Insert or remove a single visits table row"""
+        if not hasattr(self, 'visits_table'):
+            return
         
-        # This month revenue
-        cursor.execute("""
-            SELECT COALESCE(SUM(payment_amount), 0) FROM visits 
-            WHERE strftime('%Y-%m', visit_date) = strftime('%Y-%m', 'now')
-        """)
-        month_rev = cursor.fetchone()[0] or 0
-        try:
-            month_rev = float(month_rev)
-        except (ValueError, TypeError):
-            month_rev = 0.0
-        self.stats_labels['month_revenue'].setText("KSh {:,.0f}".format(month_rev))
+        row = self.find_table_row(self.visits_table, change.row_id)
         
-        # Today's visits
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute("SELECT COUNT(*) FROM visits WHERE date(visit_date) = ?", (today,))
-        self.stats_labels['today_visits'].setText(str(cursor.fetchone()[0]))
+        if change.action == 'delete':
+            if row >= 0:
+                self.visits_table.removeRow(row)
+            return
         
-        # Average daily visits (last 30 days)
+        cursor = self.read_conn.cursor()
         cursor.execute("""
-            SELECT COUNT(*) FROM visits 
-            WHERE visit_date >= date('now', '-30 days')
-        """)
-        total_visits = cursor.fetchone()[0]
-        avg_visits = total_visits / 30
-        self.stats_labels['avg_visits'].setText("{:.1f}".format(avg_visits))
-        
-        # Member retention rate (simplified calculation)
-        cursor.execute("SELECT COUNT(*) FROM members WHERE status = 'Active'")
-        active = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM members")
-        total = cursor.fetchone()[0]
-        retention = (active / total * 100) if total > 0 else 0
-        self.stats_labels['retention_rate'].setText("{:.1f}%".format(retention))
-    
-    def update_member_combos(self):
-        """Update member combo boxes"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name FROM members WHERE status = 'Active' ORDER BY name")
-        members = cursor.fetchall()
+            SELECT v.id, m.name, v.visit_date, v.payment_amount, 
+                   v.payment_method, v.notes, v.member_id
+            FROM visits v
+            JOIN members m ON v.member_id = m.id
+            WHERE v.id = ?
+        """, (change.row_id,))
+        visit = cursor.fetchone()
+        if not visit:
+            return
         
-        # Clear and populate combo boxes
-        self.visit_member_combo.clear()
-        self.report_member_combo.clear()
+        if row < 0:
+            # New visits are the most recent, so they go on top of the LIMIT 100 window
+            row = 0
+            self.visits_table.insertRow(row)
+            if self.visits_table.rowCount() > 100:
+                self.visits_table.removeRow(self.visits_table.rowCount() - 1)
+        self.fill_visit_row(row, visit)
+    
+    def remove_member_visit_rows(self, member_id):
+        """Remove the visits table rows belonging to a deleted member"""
+        if not hasattr(self, 'visits_table'):
+            return
+        for row in reversed(range(self.visits_table.rowCount())):
+            id_item = self.visits_table.item(row, 0)
+            if id_item and id_item.data(Qt.UserRole) == member_id:
+                self.visits_table.removeRow(row)
+    
+    @instrumentation.timed
+    def update_dashboard(self):
+        """Update dashboard metrics"""
+        metrics = self.metrics.fresh()
+        if metrics is not None:
+            self.show_dashboard_metrics(metrics)
+            return
         
-        for member_id, name in members:
-            self.visit_member_combo.addItem(name, member_id)
-            self.report_member_combo.addItem(name, member_id)
+        # Recompute off the GUI thread; a newer request supersedes this one
+        self.statusBar().showMessage("Updating dashboard...")
+        self.query_worker.submit('dashboard', self.metrics.compute,
+                                 callback=self.on_dashboard_metrics)
+    
+    def on_dashboard_metrics(self, metrics):
+        """Cache and display metrics computed by the query worker"""
+        self.metrics.store(metrics)
+        self.show_dashboard_metrics(metrics)
+        self.statusBar().clearMessage()
+    
+    def show_dashboard_metrics(self, metrics):
+        """Render a metrics snapshot into the cards and report statistics"""
+        self.total_members_card.findChild(QLabel, "value_label").setText(str(metrics['total_members']))
+        self.active_members_card.findChild(QLabel, "value_label").setText(str(metrics['active_members']))
+        self.expiring_members_card.findChild(QLabel, "value_label").setText(str(metrics['expiring_members']))
+        self.revenue_card.findChild(QLabel, "value_label").setText("KSh {:,.0f}".format(metrics['today_revenue']))
+        
+        # Update dashboard report statistics from the same snapshot
+        if hasattr(self, 'stats_labels'):
+            self.update_dashboard_stats(metrics)
     
+    @instrumentation.timed
+    def update_dashboard_stats(self, metrics=None):
+        """Update detailed dashboard statistics"""
+        if metrics is None:
+            metrics = self.metrics.snapshot()
+        
+        self.stats_labels['total_members'].setText(str(metrics['total_members']))
+        self.stats_labels['active_members'].setText(str(metrics['active_members']))
+        self.stats_labels['expired_members'].setText(str(metrics['expired_members']))
+        self.stats_labels['total_revenue'].setText("KSh {:,.0f}".format(metrics['total_revenue']))
+        self.stats_labels['month_revenue'].setText("KSh {:,.0f}".format(metrics['month_revenue']))
+        self.stats_labels['today_visits'].setText(str(metrics['today_visits']))
+        self.stats_labels['avg_visits'].setText("{:.1f}".format(metrics['avg_visits']))
+        self.stats_labels['retention_rate'].setText("{:.1f}%".format(metrics['retention_rate']))
+    
+    @instrumentation.timed
+    def reload_member_pickers(self):
+        """Drop the member picker list, keeping each picker's selection"""
+        # Pickers exist once the Visits and Individual Reports tabs have been built
+        pickers = [getattr(self, name) for name in ('visit_member_combo', 'report_member_combo')
+                   if hasattr(self, name)]
+        selected = [picker.currentData() for picker in pickers]
+        
+        # The report is generated once at the end rather than on every index change
+        report_picker = getattr(self, 'report_member_combo', None)
+        if report_picker:
+            report_picker.blockSignals(True)
+        self.member_list.reset()
+        for picker, member_id in zip(pickers, selected):
+            if member_id is not None:
+                picker.set_member(member_id)
+        if report_picker:
+            report_picker.blockSignals(False)
+        self.generate_individual_report()
+    
+    @instrumentation.timed
     def update_expiry_alerts(self):
         """Update expiry alerts display"""
-        cursor = self.conn.cursor()
-        
-        # Get members expiring or expired
-        cursor.execute("""
-            SELECT id, name, phone, email, end_date, status
-            FROM members 
-            WHERE end_date <= date('now', '+7 days') AND status = 'Active'
-            ORDER BY end_date
-        """)
-        
-        alerts = cursor.fetchall()
-        
-        # Count by status
-        expired_count = 0
-        urgent_count = 0
-        warning_count = 0
-        
-        for alert in alerts:
-            end_date = datetime.strptime(alert[4], '%Y-%m-%d')
-            days_left = (end_date - datetime.now()).days
-            
-            if days_left < 0:
-                expired_count += 1
-            elif days_left <= 3:
-                urgent_count += 1
-            else:
-                warning_count += 1
+        # Counts and rows come straight from the bucketed index
+        counts = self.expiry_index.counts()
         
         # Update summary labels
         if hasattr(self, 'expired_label'):
-            self.expired_label.setText("EXPIRED: {}".format(expired_count))
-            self.urgent_label.setText("URGENT (1-3 days): {}".format(urgent_count))
-            self.warning_label.setText("WARNING (4-7 days): {}".format(warning_count))
+            self.expired_label.setText("EXPIRED: {}".format(counts['EXPIRED']))
+            self.urgent_label.setText("URGENT (1-3 days): {}".format(counts['URGENT']))
+            self.warning_label.setText("WARNING (4-7 days): {}".format(counts['WARNING']))
         
         # Update alerts table
         if hasattr(self, 'alerts_table'):
+            alerts = self.expiry_index.alerts()
             self.alerts_table.setRowCount(len(alerts))
             
             for row, alert in enumerate(alerts):
-                end_date = datetime.strptime(alert[4], '%Y-%m-%d')
-                days_left = (end_date - datetime.now()).days
+                days_left = alert.days_left
                 
                 # Status with color coding
-                if days_left < 0:
-                    status_text = "EXPIRED"
-                    status_color = "#e74c3c"
-                elif days_left <= 3:
-                    status_text = "URGENT"
-                    status_color = "#f39c12"
-                else:
-                    status_text = "WARNING"
-                    status_color = "#f1c40f"
+                status_text = alert.level
+                status_color = {"EXPIRED": "#e74c3c", "URGENT": "#f39c12"}.get(alert.level, "#f1c40f")
                 
                 status_item = QTableWidgetItem(status_text)
                 status_item.setBackground(QColor(status_color))
@@ -950,62 +1486,31 @@ class GymManagementSystem(QMainWindow):
                 self.alerts_table.setItem(row, 4, QTableWidgetItem(alert[4]))  # end_date
                 self.alerts_table.setItem(row, 5, QTableWidgetItem(str(days_left)))
                 
-                # Action buttons
-                actions_widget = QWidget()
-                actions_layout = QHBoxLayout(actions_widget)
-                actions_layout.setContentsMargins(5, 2, 5, 2)
-                
-                renew_btn = QPushButton("🔄 Renew")
-                renew_btn.setStyleSheet(self.get_button_style("#27ae60"))
-                renew_btn.setMaximumHeight(25)
-                renew_btn.clicked.connect(lambda checked, m_id=alert[0]: self.renew_membership(m_id))
-                
-                actions_layout.addWidget(renew_btn)
-                actions_layout.addStretch()
-                
-                self.alerts_table.setCellWidget(row, 6, actions_widget)
+                # The renew button is painted by alert_actions_delegate for this member id
+                actions_item = QTableWidgetItem()
+                actions_item.setFlags(Qt.ItemIsEnabled)
+                actions_item.setData(Qt.UserRole, alert[0])
+                self.alerts_table.setItem(row, 6, actions_item)
     
+    @instrumentation.timed
     def update_payment_summary(self):
         """Update daily payment summary"""
         if not hasattr(self, 'payment_method_labels'):
             return
             
-        cursor = self.conn.cursor()
-        today = datetime.now().strftime('%Y-%m-%d')
+        totals = revenue_by_method(self.read_conn)
         
         for method in ["Cash", "M-Pesa", "Bank Transfer", "Card"]:
-            cursor.execute("""
-                SELECT COALESCE(SUM(payment_amount), 0) FROM visits 
-                WHERE date(visit_date) = ? AND payment_method = ?
-            """, (today, method))
-            
-            amount = cursor.fetchone()[0] or 0
-            try:
-                amount = float(amount)
-            except (ValueError, TypeError):
-                amount = 0.0
+            amount = DashboardMetrics.as_float(totals.get(method))
             self.payment_method_labels[method].setText("KSh {:,.0f}".format(amount))
     
+    @instrumentation.timed
     def load_recent_activity(self):
         """Load recent activity into dashboard"""
         if not hasattr(self, 'activity_list'):
             return
             
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT 'Visit' as type, m.name, v.visit_date, v.payment_amount, v.payment_method
-            FROM visits v
-            JOIN members m ON v.member_id = m.id
-            WHERE date(v.visit_date) = date('now')
-            UNION ALL
-            SELECT 'Registration' as type, name, registration_date, amount_paid, payment_method
-            FROM members
-            WHERE date(registration_date) = date('now')
-            ORDER BY 3 DESC
-            LIMIT 10
-        """)
-        
-        activities = cursor.fetchall()
+        activities = recent_activity(self.read_conn)
         self.activity_list.clear()
         
         for activity in activities:
@@ -1021,6 +1526,9 @@ class GymManagementSystem(QMainWindow):
                     text = "🏃 {} visited - Paid KSh {} via {}".format(name, amount_val, method)
                 else:
                     text = "🏃 {} visited".format(name)
+            elif activity_type == "Renewal":
+                text = "🔄 {} renewed - Paid KSh {} via {}".format(
+                    name, DashboardMetrics.as_float(amount), method)
             else:
                 try:
                     amount_val = float(amount) if amount else 0
@@ -1037,45 +1545,247 @@ class GymManagementSystem(QMainWindow):
             
             self.activity_list.addItem(text)
     
+    def engagement_changed_by(self, changes):
+        """Whether any of the changes could alter the At-Risk list or its counts"""
+        if not hasattr(self, 'engagement_table'):
+            return False
+        
+        at_risk_since = (date.today() - timedelta(days=AT_RISK_DAYS - 1)).isoformat()
+        for change in changes:
+            if change.kind == 'member' or change.member_id in self.engagement_member_ids:
+                return True
+            if change.kind != 'visit':
+                continue  # Payments only show in the rows of listed members
+            if change.action == 'delete':
+                return True  # Its member may have no recent visit left
+            
+            # A check-in moves its member off the list only if they had not been in lately
+            if not visited_since(self.read_conn, change.member_id, at_risk_since, change.row_id):
+                return True
+        return False
+    
+    def refresh_stale_engagement(self):
+        """Reload the At-Risk list if changes made it stale and it is on screen"""
+        if not self.engagement_stale or not hasattr(self, 'engagement_table'):
+            return
+        if self.engagement_table.isVisible():
+            self.update_engagement_report()
+    
+    @instrumentation.timed
+    def update_engagement_report(self):
+        """List at-risk and inactive members on the query worker"""
+        if not hasattr(self, 'engagement_table'):
+            return
+        
+        self.engagement_stale = False
+        level = self.engagement_level_combo.currentData()
+        order = self.engagement_order_combo.currentData()
+        self.engagement_status.setText("⏳ Loading members...")
+        self.query_worker.submit(
+            'engagement', lambda conn: member_engagement(conn, level, order, self.ENGAGEMENT_LIMIT),
+            callback=self.show_engagement_report, error_callback=self.on_engagement_report_failed)
+    
+    def show_engagement_report(self, result):
+        """Fill the At-Risk Members table from a member_engagement() result"""
+        total, members = result
+        self.engagement_member_ids = {member.member_id for member in members}
+        self.engagement_status.setText("Showing {:,} of {:,} members".format(len(members), total))
+        self.engagement_table.setRowCount(len(members))
+        
+        for row, member in enumerate(members):
+            level_item = QTableWidgetItem(member.level)
+            level_item.setBackground(QColor("#f39c12" if member.level == 'AT RISK' else "#e74c3c"))
+            level_item.setForeground(QColor("white"))
+            
+            values = [
+                member.name,
+                member.phone or "",
+                member.end_date or "",
+                member.last_visit or "Never",
+                str(member.days_absent) if member.days_absent is not None else "",
+                str(member.visit_count),
+                str(member.visits_30d),
+                str(member.visits_90d),
+                "{:.1f}".format(member.average_gap) if member.average_gap is not None else "",
+                "KSh {:,.0f}".format(member.lifetime_paid),
+            ]
+            self.engagement_table.setItem(row, 0, level_item)
+            for col, value in enumerate(values, 1):
+                self.engagement_table.setItem(row, col, QTableWidgetItem(value))
+    
+    def on_engagement_report_failed(self, message):
+        """Show why the at-risk members could not be listed"""
+        self.engagement_status.setText("⚠️ Report failed: {}".format(message))
+    
+    @instrumentation.timed
+    def update_analytics_report(self):
+        """Load the visits history into arrays and analyse it on the query worker"""
+        if not hasattr(self, 'cohort_table'):
+            return
+        
+        # Checked without importing it, so opening the tab does not stall on NumPy
+        if importlib.util.find_spec('numpy') is None:
+            self.analytics_status.setText("⚠️ Analytics need numpy (pip install numpy)")
+            return
+        
+        def analyse(conn):
+            # Imported here so startup does not pay for loading NumPy
+            import gym_analytics
+            history = gym_analytics.load_history(conn)
+            outlook = gym_analytics.renewal_outlook(history)
+            return {
+                'history': history,
+                'retention': gym_analytics.cohort_retention(history),
+                'outlook': outlook,
+                'renewals': gym_analytics.least_likely_renewals(conn, outlook, self.RENEWAL_LIMIT),
+                'computed_at': datetime.now(),
+            }
+        
+        self.analytics_status.setText("⏳ Analysing visits...")
+        self.query_worker.submit('analytics', analyse, callback=self.show_analytics_report,
+                                 error_callback=self.on_analytics_report_failed)
+    
+    def show_analytics_report(self, report):
+        """Fill the Analytics tab from the worker's result"""
+        import gym_analytics
+        self.analytics_history = report['history']
+        self.analytics_status.setText("Analysed {:,} visits at {}".format(
+            report['history'].visit_member.size, report['computed_at'].strftime('%I:%M %p')))
+        
+        # Cohort retention, shaded from white to green by rate
+        retention = report['retention']
+        months = retention.rates.shape[1]
+        self.cohort_table.setColumnCount(months + 2)
+        self.cohort_table.setHorizontalHeaderLabels(
+            ["Joined", "Members"] + ["Month {}".format(month) for month in range(months)])
+        self.cohort_table.setRowCount(len(retention.months))
+        for row, (label, size, rates) in enumerate(zip(retention.months, retention.sizes,
+                                                        retention.rates)):
+            self.cohort_table.setItem(row, 0, QTableWidgetItem(label))
+            self.cohort_table.setItem(row, 1, QTableWidgetItem("{:,}".format(size)))
+            for month, rate in enumerate(rates):
+                if size == 0 or rate != rate:  # NaN: the month has not come yet
+                    item = QTableWidgetItem("")
+                else:
+                    item = QTableWidgetItem("{:.0%}".format(rate))
+                    item.setBackground(self.heat_color(rate))
+                self.cohort_table.setItem(row, month + 2, item)
+        
+        summary = []
+        for month in (1, 3, 6):
+            rate = gym_analytics.weighted_retention(retention, month)
+            if rate is not None:
+                summary.append("{} month{}: {:.0%}".format(month, "" if month == 1 else "s", rate))
+        self.cohort_summary.setText("Still visiting after " + ", ".join(summary) if summary
+                                    else "Not enough history yet")
+        
+        self.show_attendance_heatmap()
+        self.show_renewal_outlook(report['outlook'], report['renewals'])
+    
+    def show_attendance_heatmap(self):
+        """Count visits by weekday and hour over the chosen period from the loaded history"""
+        history = getattr(self, 'analytics_history', None)
+        if history is None:
+            return
+        import gym_analytics
+        heatmap = gym_analytics.attendance_heatmap(history, self.analytics_period_combo.currentData())
+        per_week = heatmap.counts / max(heatmap.weeks, 1)
+        busiest = per_week.max() or 1
+        
+        self.heatmap_table.setVerticalHeaderLabels(gym_analytics.WEEKDAY_NAMES)
+        for weekday in range(7):
+            for hour in range(24):
+                value = per_week[weekday, hour]
+                item = QTableWidgetItem("{:.1f}".format(value) if value else "")
+                item.setBackground(self.heat_color(value / busiest))
+                item.setToolTip("{} {:02d}:00-{:02d}:59 - {:,} visits".format(
+                    gym_analytics.WEEKDAY_NAMES[weekday], hour, hour, heatmap.counts[weekday, hour]))
+                self.heatmap_table.setItem(weekday, hour, item)
+    
+    def show_renewal_outlook(self, outlook, renewals):
+        """Fill the renewal rates and the members least likely to renew"""
+        history_events = int(outlook.renewed.sum() + outlook.lapsed.sum())
+        ending = len(outlook.member_ids)
+        if not history_events:
+            self.renewal_summary.setText(
+                "{:,} memberships end in the next {} days. There are no past renewals or lapses "
+                "to learn renewal rates from yet.".format(ending, outlook.horizon))
+        else:
+            expected = float(outlook.likelihood.sum())
+            self.renewal_summary.setText(
+                "{:,} memberships end in the next {} days; about {:,.0f} of them are expected to "
+                "renew, judging by {:,} past renewals and lapses.".format(
+                    ending, outlook.horizon, expected, history_events))
+        
+        self.renewal_rates_table.setRowCount(len(outlook.labels))
+        for row, values in enumerate(zip(outlook.labels, outlook.renewed, outlook.lapsed,
+                                         outlook.rates, outlook.ending)):
+            label, renewed, lapsed, rate, ending_soon = values
+            cells = [label, "{:,}".format(renewed), "{:,}".format(lapsed),
+                     "{:.0%}".format(rate) if rate == rate else "", "{:,}".format(ending_soon)]
+            for col, value in enumerate(cells):
+                self.renewal_rates_table.setItem(row, col, QTableWidgetItem(value))
+        
+        self.renewal_members_table.setRowCount(len(renewals))
+        for row, (member_id, name, phone, end_date, visits, likelihood) in enumerate(renewals):
+            cells = [name, phone or "", end_date, str(visits),
+                     "{:.0%}".format(likelihood) if likelihood == likelihood else ""]
+            for col, value in enumerate(cells):
+                self.renewal_members_table.setItem(row, col, QTableWidgetItem(value))
+    
+    def on_analytics_report_failed(self, message):
+        """Show why the analytics could not be computed, e.g. NumPy is not installed"""
+        self.analytics_status.setText("⚠️ Analytics failed: {}".format(message))
+    
+    @staticmethod
+    def heat_color(fraction):
+        """Shade from white (0) to the dashboard green (1)"""
+        fraction = min(max(float(fraction), 0.0), 1.0)
+        return QColor(int(255 - (255 - 0x27) * fraction), int(255 - (255 - 0xae) * fraction),
+                      int(255 - (255 - 0x60) * fraction))
+    
+    @instrumentation.timed
     def search_members(self, text):
         """Search members by name, phone, or email"""
-        for row in range(self.members_table.rowCount()):
-            match = False
-            for col in range(4):  # Search in name, phone, email columns
-                item = self.members_table.item(row, col)
-                if item and text.lower() in item.text().lower():
-                    match = True
-                    break
-            
-            self.members_table.setRowHidden(row, not match)
+        text = text.strip()
+        if not text:
+            self.members_model.set_filter('search')
+            return
+        
+        if self.search_index_available and len(text) >= 3:
+            # A quoted trigram phrase matches the text as a case-insensitive substring
+            sql = "id IN (SELECT rowid FROM members_fts WHERE members_fts MATCH ?)"
+            params = ['"{}"'.format(text.replace('"', '""'))]
+        else:
+            # Trigrams need at least three characters, so short input uses LIKE
+            pattern = "%{}%".format(text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_"))
+            sql = """name LIKE ? ESCAPE '\\' OR phone LIKE ? ESCAPE '\\'
+                     OR email LIKE ? ESCAPE '\\'"""
+            params = [pattern] * 3
+        
+        # Typing a member number finds that member directly
+        if text.isdigit():
+            sql += " OR id = ?"
+            params.append(int(text))
+        
+        self.members_model.set_filter('search', sql, params)
     
+    @instrumentation.timed
     def filter_members(self, filter_type):
         """Filter members by status"""
-        cursor = self.conn.cursor()
-        
-        if filter_type == "All Members":
-            query = "SELECT id FROM members"
-            params = ()
-        elif filter_type == "Active":
-            query = "SELECT id FROM members WHERE status = 'Active'"
-            params = ()
+        if filter_type == "Active":
+            self.members_model.set_filter('status', "status = 'Active'")
         elif filter_type == "Expired":
-            query = "SELECT id FROM members WHERE end_date < date('now') AND status = 'Active'"
-            params = ()
+            self.members_model.set_filter('status', "end_date < date('now') AND status = 'Active'")
         elif filter_type == "Expiring Soon":
             next_week = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
-            query = """SELECT id FROM members 
-                      WHERE end_date <= ? AND end_date >= date('now') AND status = 'Active'"""
-            params = (next_week,)
-        
-        cursor.execute(query, params)
-        visible_ids = [str(row[0]) for row in cursor.fetchall()]
-        
-        # Hide/show rows based on filter
-        for row in range(self.members_table.rowCount()):
-            id_item = self.members_table.item(row, 0)
-            if id_item:
-                self.members_table.setRowHidden(row, id_item.text() not in visible_ids)
+            self.members_model.set_filter('status', """end_date <= ? AND end_date >= date('now') 
+                                          AND status = 'Active'""", (next_week,))
+        elif filter_type in ("At Risk", "Inactive"):
+            # Current members who stopped coming, read from member_stats
+            self.members_model.set_filter('status', *engagement_condition(filter_type.upper()))
+        else:
+            self.members_model.set_filter('status')
     
     def quick_add_member(self):
         """Quick add member dialog"""
@@ -1088,14 +1798,12 @@ class GymManagementSystem(QMainWindow):
     def add_member(self):
         """Add new member dialog"""
         dialog = MemberDialog(self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_data()
+        dialog.exec_()
     
     def edit_member(self, member_id):
         """Edit member dialog"""
         dialog = MemberDialog(self, member_id)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_data()
+        dialog.exec_()
     
     def delete_member(self, member_id):
         """Delete member with confirmation"""
@@ -1107,49 +1815,52 @@ class GymManagementSystem(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM visits WHERE member_id = ?", (member_id,))
-            cursor.execute("DELETE FROM members WHERE id = ?", (member_id,))
-            self.conn.commit()
+            delete_member_record(self.conn, member_id)
+            self.attendance.invalidate(member_id)
+            
+            self.publish_change('member', 'delete', member_id)
             
             QMessageBox.information(self, "Success", "Member deleted successfully!")
-            self.load_data()
     
     def record_visit(self):
         """Record a new visit"""
-        if self.visit_member_combo.currentData() is None:
-            QMessageBox.warning(self, "Error", "Please select a member!")
+        member_id = self.visit_member_combo.member_id()
+        try:
+            future = self.visit_queue.submit(
+                member_id,
+                self.visit_payment_input.text(),
+                self.visit_payment_method.currentText(),
+                self.visit_notes_input.text()
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
             return
-        
-        member_id = self.visit_member_combo.currentData()
-        payment_amount = 0
-        payment_method = self.visit_payment_method.currentText()
-        notes = self.visit_notes_input.text()
-        
-        # Parse payment amount
-        if self.visit_payment_input.text():
-            try:
-                payment_amount = float(self.visit_payment_input.text())
-            except ValueError:
-                QMessageBox.warning(self, "Error", "Please enter a valid payment amount!")
-                return
-        
-        # Insert visit record
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO visits (member_id, payment_amount, payment_method, notes)
-            VALUES (?, ?, ?, ?)
-        """, (member_id, payment_amount, payment_method, notes))
-        
-        self.conn.commit()
+        future.add_done_callback(lambda future: self.visit_written.emit(member_id, future))
         
         # Clear inputs
         self.visit_payment_input.clear()
         self.visit_payment_method.setCurrentText("None")
         self.visit_notes_input.clear()
+    
+    def on_visit_written(self, member_id, future):
+        """Publish a check-in once the visit queue has committed it"""
+        try:
+            visit_id, payment_id = future.result()
+        except Exception as e:
+            QMessageBox.warning(self, "Error", "Visit not recorded: {}!".format(e))
+            return
         
-        QMessageBox.information(self, "Success", "Visit recorded successfully!")
-        self.load_data()
+        # Timestamped by SQLite on insert; read back for the member's attendance calendar
+        visit_date = self.read_conn.execute("SELECT visit_date FROM visits WHERE id = ?",
+                                            (visit_id,)).fetchone()
+        if visit_date:
+            self.attendance.record(member_id, visit_date[0])
+        
+        self.publish_change('visit', 'insert', visit_id, member_id)
+        if payment_id:
+            self.publish_change('payment', 'insert', payment_id, member_id)
+        
+        self.statusBar().showMessage("Visit recorded successfully!", 3000)
     
     def delete_visit(self, visit_id):
         """Delete visit record"""
@@ -1161,109 +1872,164 @@ class GymManagementSystem(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM visits WHERE id = ?", (visit_id,))
-            self.conn.commit()
+            deleted = delete_visit_record(self.conn, visit_id)
+            
+            if deleted:
+                member_id, payment_ids, visit_date = deleted
+                self.attendance.discard(member_id, visit_date)
+                self.publish_change('visit', 'delete', visit_id, member_id)
+                for payment_id in payment_ids:
+                    self.publish_change('payment', 'delete', payment_id, member_id)
             
             QMessageBox.information(self, "Success", "Visit deleted successfully!")
-            self.load_data()
     
     def renew_membership(self, member_id):
         """Renew membership dialog"""
         dialog = RenewalDialog(self, member_id)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_data()
+        dialog.exec_()
     
+    @instrumentation.timed
     def generate_payment_report(self):
         """Generate payment report for selected date range"""
         date_from = self.date_from.date().toString('yyyy-MM-dd')
         date_to = self.date_to.date().toString('yyyy-MM-dd')
+        range_start, range_end = day_range(date_from, date_to)
         
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT v.visit_date, m.name, v.payment_amount, v.payment_method, 
-                   'Visit Payment' as type, v.notes
-            FROM visits v
-            JOIN members m ON v.member_id = m.id
-            WHERE date(v.visit_date) BETWEEN ? AND ? AND v.payment_amount > 0
-            UNION ALL
-            SELECT m.registration_date, m.name, m.amount_paid, m.payment_method,
-                   'Membership Fee' as type, 'Registration' as notes
-            FROM members m
-            WHERE date(m.registration_date) BETWEEN ? AND ?
-            ORDER BY 1 DESC
-        """, (date_from, date_to, date_from, date_to))
-        
-        payments = cursor.fetchall()
-        self.payment_history_table.setRowCount(len(payments))
-        
-        for row, payment in enumerate(payments):
-            for col, value in enumerate(payment):
-                if col == 0:  # date formatting
-                    try:
-                        dt = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
-                        formatted_date = dt.strftime('%Y-%m-%d %I:%M %p')
-                        self.payment_history_table.setItem(row, col, QTableWidgetItem(formatted_date))
-                    except:
-                        self.payment_history_table.setItem(row, col, QTableWidgetItem(str(value)))
-                elif col == 2:  # amount formatting
-                    try:
-                        amount_val = float(value) if value else 0
-                        self.payment_history_table.setItem(row, col, QTableWidgetItem("KSh {:,.0f}".format(amount_val)))
-                    except (ValueError, TypeError):
-                        self.payment_history_table.setItem(row, col, QTableWidgetItem("KSh 0"))
-                else:
-                    self.payment_history_table.setItem(row, col, QTableWidgetItem(str(value) if value else ""))
+        # Count and total come from SQL: the payment_date index and the daily rollup
+        self.payment_report_status.setText("⏳ Loading payments...")
+        self.payment_report_total.setText("")
+        self.query_worker.submit('payment_total', lambda conn: payment_totals(conn, date_from, date_to),
+                                 callback=self.show_payment_totals,
+                                 error_callback=self.on_payment_report_failed)
+        
+        # Rows page in as the table scrolls; a newer range supersedes this one
+        self.payment_history_model.load(range_start, range_end)
     
-    def generate_individual_report(self, member_name):
-        """Generate individual member report"""
-        if not member_name:
-            self.member_report_text.clear()
+    def show_payment_totals(self, totals):
+        """Show the payment count and total for the report range"""
+        count, total = totals
+        self.payment_report_status.setText("{:,} payments".format(count))
+        self.payment_report_total.setText("Total: KSh {:,.0f}".format(DashboardMetrics.as_float(total)))
+    
+    def on_payment_report_failed(self, message):
+        """Show why the payment report could not be loaded"""
+        self.payment_report_status.setText("⚠️ Report failed: {}".format(message))
+    
+    @instrumentation.timed
+    def generate_individual_report(self):
+        """Show the individual report for the member picked in the combo box.
+        
+        Rendered reports come from the cache; anything else is built on the
+        query worker, so typing in or scrolling the combo never blocks.
+        """
+        if not hasattr(self, 'report_member_combo'):
             return
         
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM members WHERE name = ?", (member_name,))
-        member = cursor.fetchone()
+        member_id = self.report_member_combo.currentData()
+        if member_id != self.report_member_id:
+            self.report_member_id = member_id
+            self.report_offset = 0
         
-        if not member:
+        if member_id is None:
+            self.member_report_text.clear()
+            self.report_page_label.setText("")
+            self.report_newer_btn.setEnabled(False)
+            self.report_older_btn.setEnabled(False)
             return
         
-        member_id = member[0]
-        
-        # Get visit history
-        cursor.execute("""
-            SELECT visit_date, payment_amount, payment_method, notes
-            FROM visits 
-            WHERE member_id = ?
-            ORDER BY visit_date DESC
-        """, (member_id,))
-        visits = cursor.fetchall()
+        key = (member_id, self.report_offset)
+        cached = self.report_cache.get(key)
+        if cached is not None:
+            self.show_individual_report(key, cached)
+            return
         
-        # Generate report text
-        # Safely convert values to proper types
-        try:
-            initial_payment = float(member[9]) if member[9] is not None else 0.0
-        except (ValueError, TypeError):
-            initial_payment = 0.0
-            
-        try:
-            additional_payments = sum(float(v[1]) if v[1] is not None else 0.0 for v in visits)
-        except (ValueError, TypeError):
-            additional_payments = 0.0
-            
+        offset, generation = self.report_offset, self.report_cache.generation(member_id)
+        self.statusBar().showMessage("Generating member report...")
+        self.query_worker.submit(
+            'member_report',
+            lambda conn: self.render_member_report(member_report(conn, member_id, self.REPORT_PAGE_SIZE, offset),
+                                                   self.attendance.days(conn, member_id)),
+            callback=lambda result: self.on_member_report(key, generation, result),
+            error_callback=self.on_member_report_failed)
+    
+    def on_member_report(self, key, generation, result):
+        """Cache a report rendered by the query worker and show it if still wanted"""
+        self.statusBar().clearMessage()
+        self.report_cache.put(key, result, generation)
+        if key == (self.report_member_id, self.report_offset):
+            self.show_individual_report(key, result)
+    
+    def on_member_report_failed(self, message):
+        """Show why the individual report could not be generated"""
+        self.statusBar().clearMessage()
+        self.member_report_text.setPlainText("⚠️ Report failed: {}".format(message))
+    
+    def show_individual_report(self, key, result):
+        """Display a rendered report and update the timeline paging controls"""
+        text, visit_count = result
+        offset = key[1]
+        self.member_report_text.setPlainText(text)
+        
+        shown = min(offset + self.REPORT_PAGE_SIZE, visit_count)
+        self.report_page_label.setText("Visits {}-{} of {}".format(
+            offset + 1 if visit_count else 0, shown, visit_count))
+        self.report_newer_btn.setEnabled(offset > 0)
+        self.report_older_btn.setEnabled(shown < visit_count)
+    
+    @staticmethod
+    def render_attendance(days):
+        """Draw a year of visits as a weekday-by-week calendar, with streaks and gaps"""
+        first_monday, grid = attendance_calendar(days)
+        weeks = len(grid[0])
+        
+        # Month names over the first week of each month
+        header = [" "] * weeks
+        for week in range(weeks):
+            monday = first_monday + timedelta(weeks=week)
+            if monday.day <= 7:
+                header[week:week + 3] = monday.strftime('%b')
+        
+        text = """
+📅 ATTENDANCE (last {} weeks)
+────────────────────────────────────────────────────────────────
+    {}
+""".format(weeks, "".join(header))
+        shades = {0: "·", 1: "▒"}
+        for weekday, name in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]):
+            text += "{} {}\n".format(name, "".join(
+                " " if count is None else shades.get(count, "█") for count in grid[weekday]))
+        text += "    · no visit   ▒ 1 visit   █ 2 or more\n\n"
+        
+        summary = attendance_summary(days)
+        text += "Current Streak:     {} week{} in a row\n".format(
+            summary.current_streak, "" if summary.current_streak == 1 else "s")
+        text += "Longest Streak:     {} week{}\n".format(
+            summary.longest_streak, "" if summary.longest_streak == 1 else "s")
+        if summary.longest_gap is not None:
+            text += "Longest Gap:        {} days (ended {})\n".format(
+                summary.longest_gap, summary.longest_gap_ended)
+        if summary.days_since_last is not None:
+            text += "Days Since Visit:   {}\n".format(summary.days_since_last)
+        return text
+    
+    def page_individual_report(self, step):
+        """Move the visit timeline one page older (1) or newer (-1)"""
+        self.report_offset = max(0, self.report_offset + step * self.REPORT_PAGE_SIZE)
+        self.generate_individual_report()
+    
+    @staticmethod
+    def render_member_report(report, days=()):
+        """Format a member_report() and the member's visit days as text; runs on the query worker"""
+        initial_payment = report['amount_paid']
+        additional_payments = report['additional_payments']
         total_paid = initial_payment + additional_payments
         
         try:
-            days_since_reg = (datetime.now() - datetime.strptime(member[11], '%Y-%m-%d %H:%M:%S')).days
+            days_since_reg = (datetime.now() - datetime.strptime(report['registration_date'], '%Y-%m-%d %H:%M:%S')).days
         except (ValueError, TypeError):
             days_since_reg = 0
-            
-        try:
-            visits_with_payment = len([v for v in visits if v[1] and float(v[1]) > 0])
-        except (ValueError, TypeError):
-            visits_with_payment = 0
         
-        report = """
+        text = """
 ═══════════════════════════════════════════════════════════════
                         MEMBER PROFILE REPORT
 ═══════════════════════════════════════════════════════════════
@@ -1294,66 +2060,84 @@ Total Paid:         KSh {:,.0f}
 Days Since Registration: {} days
 Total Visits:       {}
 Visits with Payment: {}
+Last Visit:         {}
+Visits (30 days):   {}
+Visits (90 days):   {}
+Avg Days Between Visits: {}
 """.format(
-            member[1],
-            member[2] or 'Not provided',
-            member[3] or 'Not provided', 
-            member[4] or 'Not provided',
-            member[5],
-            member[6],
-            member[7],
-            member[8],
-            member[11],
-            initial_payment, member[10],
+            report['name'],
+            report['phone'] or 'Not provided',
+            report['email'] or 'Not provided',
+            report['address'] or 'Not provided',
+            report['membership_type'],
+            report['start_date'],
+            report['end_date'],
+            report['status'],
+            report['registration_date'],
+            initial_payment, report['payment_method'],
             additional_payments,
             total_paid,
             days_since_reg,
-            len(visits),
-            visits_with_payment
+            report['visit_count'],
+            report['paid_visit_count'],
+            report['last_visit'] or 'Never',
+            report['visits_30d'],
+            report['visits_90d'],
+            "{:.1f}".format(report['average_gap']) if report['average_gap'] is not None else 'N/A'
         )
         
-        if member[7]:  # end_date exists
-            end_date = datetime.strptime(member[7], '%Y-%m-%d')
-            days_left = (end_date - datetime.now()).days
-            if days_left >= 0:
-                report += "Days Until Expiry:  {} days\n".format(days_left)
-            else:
-                report += "Days Overdue:       {} days\n".format(abs(days_left))
+        if report['end_date']:
+            try:
+                end_date = datetime.strptime(report['end_date'], '%Y-%m-%d')
+            except ValueError:
+                end_date = None
+            if end_date:
+                days_left = (end_date - datetime.now()).days
+                if days_left >= 0:
+                    text += "Days Until Expiry:  {} days\n".format(days_left)
+                else:
+                    text += "Days Overdue:       {} days\n".format(abs(days_left))
         
-        report += """
+        text += GymManagementSystem.render_attendance(days)
+        
+        visits, offset, visit_count = report['visits'], report['offset'], report['visit_count']
+        text += """
 📋 VISIT HISTORY ({} total visits)
 ────────────────────────────────────────────────────────────────
-""".format(len(visits))
+""".format(visit_count)
         
         if visits:
-            for i, visit in enumerate(visits[:20], 1):  # Show last 20 visits
+            for i, visit in enumerate(visits, offset + 1):
                 visit_date = visit[0]
                 try:
                     payment_amount = float(visit[1]) if visit[1] else 0
                     payment = "KSh {:,.0f} ({})".format(payment_amount, visit[2]) if payment_amount > 0 else "No payment"
                 except (ValueError, TypeError):
                     payment = "No payment"
-                    
+                
                 notes = " - {}".format(visit[3]) if visit[3] else ""
                 
                 try:
                     dt = datetime.strptime(visit_date, '%Y-%m-%d %H:%M:%S')
                     formatted_date = dt.strftime('%Y-%m-%d %I:%M %p')
-                except:
+                except (ValueError, TypeError):
                     formatted_date = visit_date
                 
-                report += "{:2d}. {} | {}{}\n".format(i, formatted_date, payment, notes)
+                text += "{:2d}. {} | {}{}\n".format(i, formatted_date, payment, notes)
             
-            if len(visits) > 20:
-                report += "\n... and {} more visits\n".format(len(visits) - 20)
+            remaining = visit_count - offset - len(visits)
+            if remaining > 0:
+                text += "\n... and {} older visits\n".format(remaining)
+        elif visit_count:
+            text += "No visits on this page.\n"
         else:
-            report += "No visits recorded yet.\n"
+            text += "No visits recorded yet.\n"
         
-        report += "\n" + "═" * 63 + "\n"
-        report += "Report generated on: {}\n".format(datetime.now().strftime('%Y-%m-%d %I:%M:%S %p'))
-        report += "═" * 63
+        text += "\n" + "═" * 63 + "\n"
+        text += "Report generated on: {}\n".format(datetime.now().strftime('%Y-%m-%d %I:%M:%S %p'))
+        text += "═" * 63
         
-        self.member_report_text.setPlainText(report)
+        return text, visit_count
 
 
 class MemberDialog(QDialog):
@@ -1383,9 +2167,7 @@ class MemberDialog(QDialog):
         self.address_input.setMaximumHeight(80)
         
         self.membership_combo = QComboBox()
-        self.membership_combo.addItems([
-            "Monthly", "Quarterly", "Half-yearly", "Yearly", "Daily"
-        ])
+        self.membership_combo.addItems(MEMBERSHIP_TYPES)
         
         self.start_date = QDateEdit()
         self.start_date.setDate(QDate.currentDate())
@@ -1398,10 +2180,10 @@ class MemberDialog(QDialog):
         self.amount_input = QLineEdit()
         
         self.payment_method_combo = QComboBox()
-        self.payment_method_combo.addItems(["Cash", "M-Pesa", "Bank Transfer", "Card"])
+        self.payment_method_combo.addItems(PAYMENT_METHODS)
         
         self.status_combo = QComboBox()
-        self.status_combo.addItems(["Active", "Inactive"])
+        self.status_combo.addItems(MEMBER_STATUSES)
         
         # Add fields to form
         form_layout.addRow("Name*:", self.name_input)
@@ -1438,26 +2220,12 @@ class MemberDialog(QDialog):
     
     def update_end_date(self, membership_type):
         """Update end date based on membership type"""
-        start_date = self.start_date.date()
-        
-        if membership_type == "Daily":
-            end_date = start_date.addDays(1)
-        elif membership_type == "Monthly":
-            end_date = start_date.addMonths(1)
-        elif membership_type == "Quarterly":
-            end_date = start_date.addMonths(3)
-        elif membership_type == "Half-yearly":
-            end_date = start_date.addMonths(6)
-        elif membership_type == "Yearly":
-            end_date = start_date.addYears(1)
-        else:
-            end_date = start_date.addMonths(1)
-        
-        self.end_date.setDate(end_date)
+        self.end_date.setDate(QDate(membership_end_date(self.start_date.date().toPyDate(),
+                                                        membership_type)))
     
     def load_member_data(self):
         """Load existing member data for editing"""
-        cursor = self.parent.conn.cursor()
+        cursor = self.parent.read_conn.cursor()
         cursor.execute("SELECT * FROM members WHERE id = ?", (self.member_id,))
         member = cursor.fetchone()
         
@@ -1477,66 +2245,42 @@ class MemberDialog(QDialog):
             if member[7]:  # end_date
                 self.end_date.setDate(QDate.fromString(member[7], "yyyy-MM-dd"))
             
-            self.amount_input.setText(str(member[9] or ""))
+            self.amount_input.setText(str(member[8] or ""))
             
-            payment_index = self.payment_method_combo.findText(member[10] or "Cash")
+            payment_index = self.payment_method_combo.findText(member[9] or "Cash")
             if payment_index >= 0:
                 self.payment_method_combo.setCurrentIndex(payment_index)
             
-            status_index = self.status_combo.findText(member[8] or "Active")
+            status_index = self.status_combo.findText(member[10] or "Active")
             if status_index >= 0:
                 self.status_combo.setCurrentIndex(status_index)
     
     def save_member(self):
         """Save member data"""
         # Validation
-        if not self.name_input.text().strip():
-            QMessageBox.warning(self, "Error", "Name is required!")
-            return
-        
-        if not self.amount_input.text().strip():
-            QMessageBox.warning(self, "Error", "Amount paid is required!")
-            return
-        
         try:
-            amount = float(self.amount_input.text())
-        except ValueError:
-            QMessageBox.warning(self, "Error", "Please enter a valid amount!")
+            data = validate_member(
+                self.name_input.text(),
+                self.phone_input.text(),
+                self.email_input.text(),
+                self.address_input.toPlainText(),
+                self.membership_combo.currentText(),
+                self.start_date.date().toString("yyyy-MM-dd"),
+                self.end_date.date().toString("yyyy-MM-dd"),
+                self.amount_input.text(),
+                self.payment_method_combo.currentText(),
+                self.status_combo.currentText()
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
             return
         
-        # Prepare data
-        data = (
-            self.name_input.text().strip(),
-            self.phone_input.text().strip() or None,
-            self.email_input.text().strip() or None,
-            self.address_input.toPlainText().strip() or None,
-            self.membership_combo.currentText(),
-            self.start_date.date().toString("yyyy-MM-dd"),
-            self.end_date.date().toString("yyyy-MM-dd"),
-            amount,
-            self.payment_method_combo.currentText(),
-            self.status_combo.currentText()
-        )
-        
-        cursor = self.parent.conn.cursor()
-        
-        if self.member_id:
-            # Update existing member
-            cursor.execute("""
-                UPDATE members SET name=?, phone=?, email=?, address=?, 
-                membership_type=?, start_date=?, end_date=?, amount_paid=?,
-                payment_method=?, status=?
-                WHERE id=?
-            """, data + (self.member_id,))
-        else:
-            # Insert new member
-            cursor.execute("""
-                INSERT INTO members (name, phone, email, address, membership_type, 
-                start_date, end_date, amount_paid, payment_method, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, data)
+        member_id, action, payment_action, payment_id = save_member_record(
+            self.parent.conn, data, self.member_id)
         
-        self.parent.conn.commit()
+        self.parent.publish_change('member', action, member_id)
+        if payment_action:
+            self.parent.publish_change('payment', payment_action, payment_id, member_id)
         
         QMessageBox.information(self, "Success", 
                               "Member updated successfully!" if self.member_id 
@@ -1577,9 +2321,7 @@ class RenewalDialog(QDialog):
         form_layout = QFormLayout()
         
         self.membership_combo = QComboBox()
-        self.membership_combo.addItems([
-            "Monthly", "Quarterly", "Half-yearly", "Yearly", "Daily"
-        ])
+        self.membership_combo.addItems(MEMBERSHIP_TYPES)
         
         self.new_end_date = QDateEdit()
         self.new_end_date.setDate(QDate.currentDate().addMonths(1))
@@ -1588,7 +2330,7 @@ class RenewalDialog(QDialog):
         self.renewal_amount = QLineEdit()
         
         self.payment_method = QComboBox()
-        self.payment_method.addItems(["Cash", "M-Pesa", "Bank Transfer", "Card"])
+        self.payment_method.addItems(PAYMENT_METHODS)
         
         form_layout.addRow("New Membership Type:", self.membership_combo)
         form_layout.addRow("New End Date:", self.new_end_date)
@@ -1618,7 +2360,7 @@ class RenewalDialog(QDialog):
     
     def load_member_data(self):
         """Load member data for renewal"""
-        cursor = self.parent.conn.cursor()
+        cursor = self.parent.read_conn.cursor()
         cursor.execute("SELECT name, phone, end_date, membership_type FROM members WHERE id = ?", 
                       (self.member_id,))
         member = cursor.fetchone()
@@ -1644,76 +2386,863 @@ Current Membership: {}
     def update_end_date(self, membership_type):
         """Update end date based on membership type"""
         # Start from current end date or today, whichever is later
-        cursor = self.parent.conn.cursor()
+        cursor = self.parent.read_conn.cursor()
         cursor.execute("SELECT end_date FROM members WHERE id = ?", (self.member_id,))
         current_end = cursor.fetchone()[0]
         
-        if current_end:
-            start_date = max(QDate.currentDate(), 
-                           QDate.fromString(current_end, "yyyy-MM-dd"))
-        else:
-            start_date = QDate.currentDate()
-        
-        if membership_type == "Daily":
-            end_date = start_date.addDays(1)
-        elif membership_type == "Monthly":
-            end_date = start_date.addMonths(1)
-        elif membership_type == "Quarterly":
-            end_date = start_date.addMonths(3)
-        elif membership_type == "Half-yearly":
-            end_date = start_date.addMonths(6)
-        elif membership_type == "Yearly":
-            end_date = start_date.addYears(1)
-        else:
-            end_date = start_date.addMonths(1)
-        
-        self.new_end_date.setDate(end_date)
+        self.new_end_date.setDate(QDate(renewal_end_date(current_end, membership_type)))
     
     def renew_membership(self):
         """Process membership renewal"""
-        if not self.renewal_amount.text().strip():
-            QMessageBox.warning(self, "Error", "Renewal amount is required!")
+        try:
+            payment_id = renew_member(
+                self.parent.conn,
+                self.member_id,
+                self.membership_combo.currentText(),
+                self.new_end_date.date().toString("yyyy-MM-dd"),
+                self.renewal_amount.text(),
+                self.payment_method.currentText()
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
             return
         
+        self.parent.publish_change('member', 'update', self.member_id)
+        self.parent.publish_change('payment', 'insert', payment_id, self.member_id)
+        
+        QMessageBox.information(self, "Success", "Membership renewed successfully!")
+        self.accept()
+
+
+class BackgroundTask(QThread):
+    """Run one long job off the GUI thread, reporting progress and its result"""
+    
+    progressed = pyqtSignal(int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, job, parent=None):
+        """job is called with a progress(int) callback and returns the result"""
+        super().__init__(parent)
+        self.job = job
+    
+    def run(self):
+        """Run the job and emit its result or error"""
         try:
-            amount = float(self.renewal_amount.text())
-        except ValueError:
-            QMessageBox.warning(self, "Error", "Please enter a valid amount!")
+            result = self.job(self.progressed.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+
+
+class QueryWorker(QThread):
+    """Runs read queries on a background thread with its own connection.
+    
+    Requests are grouped by key: submitting a new request for a key
+    supersedes the previous one, which is skipped if still queued or
+    interrupted if already running. Only the newest result for each key is
+    delivered, on the GUI thread, to its callback.
+    """
+    
+    query_finished = pyqtSignal(int, object)
+    query_failed = pyqtSignal(int, str)
+    
+    def __init__(self, db_path, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.conn = None
+        self.jobs = queue.Queue()
+        self.request_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.latest = {}  # key -> newest request id, shared with the worker thread
+        self.running = None  # (request id, key) of the query in progress
+        self.callbacks = {}  # request id -> (key, callback, error_callback), GUI thread only
+        
+        self.query_finished.connect(self.on_query_finished)
+        self.query_failed.connect(self.on_query_failed)
+    
+    def submit(self, key, query, params=(), callback=None, error_callback=None):
+        """Queue a query and return its request id.
+        
+        query is either SQL, whose rows are fetched with fetchall(), or a
+        callable that receives the worker's connection and returns a result.
+        """
+        request_id = next(self.request_ids)
+        with self.lock:
+            superseded = self.latest.get(key)
+            self.latest[key] = request_id
+            self.interrupt_running(key)
+        
+        if superseded is not None:
+            self.callbacks.pop(superseded, None)
+        self.callbacks[request_id] = (key, callback, error_callback)
+        self.jobs.put((request_id, key, query, params))
+        return request_id
+    
+    def interrupt_running(self, key):
+        """Abort the running query if it belongs to key; caller holds the lock"""
+        if self.running is not None and self.running[1] == key and self.conn is not None:
+            self.conn.interrupt()
+    
+    def cancel(self, key):
+        """Drop any pending or running request for key"""
+        with self.lock:
+            request_id = self.latest.pop(key, None)
+            self.interrupt_running(key)
+        self.callbacks.pop(request_id, None)
+    
+    def stop(self):
+        """Finish the current query, discard the rest and end the thread"""
+        with self.lock:
+            self.latest.clear()
+        self.jobs.put(None)
+        self.wait()
+    
+    def run(self):
+        self.conn = connect_database(self.db_path, readonly=True, timed=True,
+                                     check_same_thread=False)
+        
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            
+            request_id, key, query, params = job
+            with self.lock:
+                if self.latest.get(key) != request_id:
+                    continue  # Superseded before it started
+                self.running = (request_id, key)
+            
+            try:
+                with instrumentation.stage("query worker: {}".format(key)):
+                    if callable(query):
+                        result = query(self.conn)
+                    else:
+                        result = self.conn.execute(query, params).fetchall()
+            except Exception as e:
+                # Anything escaping run() would abort the process, not just this query
+                self.query_failed.emit(request_id, str(e))
+            else:
+                self.query_finished.emit(request_id, result)
+            finally:
+                with self.lock:
+                    self.running = None
+        
+        self.conn.close()
+    
+    def take_callbacks(self, request_id):
+        """Claim the callbacks of a request that is still the newest for its key"""
+        entry = self.callbacks.pop(request_id, None)
+        if entry is None:
+            return None
+        with self.lock:
+            if self.latest.get(entry[0]) != request_id:
+                return None
+            del self.latest[entry[0]]
+        return entry
+    
+    def on_query_finished(self, request_id, result):
+        entry = self.take_callbacks(request_id)
+        if entry and entry[1]:
+            entry[1](result)
+    
+    def on_query_failed(self, request_id, message):
+        entry = self.take_callbacks(request_id)
+        if entry and entry[2]:
+            entry[2](message)
+
+
+class ReportCache:
+    """A small LRU cache of rendered reports keyed by (member id, page offset).
+    
+    Each member has a generation, bumped when the member is invalidated and
+    for everyone on clear(); a report rendered from an older generation is
+    not stored, so a result that was in flight while its member changed
+    cannot repopulate the cache with stale data. Changes to other members
+    leave it alone.
+    """
+    
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.generations = {}  # member id -> invalidations since the last clear()
+        self.clears = 0
+    
+    def generation(self, member_id):
+        """Return the token to render member_id's report under and pass back to put()"""
+        return self.clears, self.generations.get(member_id, 0)
+    
+    def get(self, key):
+        """Return the cached report for key, marking it most recently used, or None"""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+    
+    def put(self, key, value, generation):
+        """Store a report rendered during the given generation of its member"""
+        if generation != self.generation(key[0]):
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+    
+    def invalidate(self, member_id):
+        """Drop every cached page of one member's report"""
+        self.generations[member_id] = self.generations.get(member_id, 0) + 1
+        for key in [key for key in self.entries if key[0] == member_id]:
+            del self.entries[key]
+    
+    def clear(self):
+        self.clears += 1
+        self.generations.clear()
+        self.entries.clear()
+
+
+class MemberListModel(QAbstractListModel):
+    """Active members ordered by name, shared by every MemberPicker.
+    
+    Nothing is read until a picker's popup opens or a member is selected;
+    the (name, id) list is then loaded in one query and handed to views a
+    page at a time as they scroll. Member changes patch the list in place instead of
+    reloading it.
+    """
+    
+    PAGE_SIZE = 200
+    
+    def __init__(self, conn, parent=None):
+        super().__init__(parent)
+        self.conn = conn
+        self.members = None  # sorted (name, id) pairs once loaded
+        self.names = {}  # member id -> name
+        self.exposed = 0  # rows handed to views so far
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.exposed
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        name, member_id = self.members[index.row()]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return name
+        if role == Qt.UserRole:
+            return member_id
+        return None
+    
+    def load(self):
+        """Read the active members the first time they are needed"""
+        if self.members is None:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT name, id FROM members WHERE status = 'Active' ORDER BY name, id")
+            self.members = cursor.fetchall()
+            self.names = {member_id: name for name, member_id in self.members}
+    
+    def reset(self):
+        """Forget every member; the next request reads them again"""
+        self.beginResetModel()
+        self.members = None
+        self.names = {}
+        self.exposed = 0
+        self.endResetModel()
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        # Views only page through a loaded list; MemberPicker.showPopup() starts it
+        return not parent.isValid() and self.members is not None and self.exposed < len(self.members)
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        self.load()
+        self.expose_through(self.exposed + self.PAGE_SIZE - 1)
+    
+    def expose_through(self, row):
+        """Hand views every row up to and including row"""
+        last = min(row, len(self.members) - 1)
+        if last >= self.exposed:
+            self.beginInsertRows(QModelIndex(), self.exposed, last)
+            self.exposed = last + 1
+            self.endInsertRows()
+    
+    def row_of(self, member_id):
+        """Return the row of an active member, exposing it if needed, or -1"""
+        self.load()
+        name = self.names.get(member_id)
+        if name is None:
+            return -1
+        row = bisect.bisect_left(self.members, (name, member_id))
+        self.expose_through(row)
+        return row
+    
+    def upsert(self, member_id, name):
+        """Add an active member or move a renamed one to its sorted position"""
+        if self.members is None or self.names.get(member_id) == name:
             return
         
-        # Update member record
-        cursor = self.parent.conn.cursor()
-        cursor.execute("""
-            UPDATE members SET 
-                end_date = ?,
-                membership_type = ?,
-                status = 'Active'
-            WHERE id = ?
-        """, (
-            self.new_end_date.date().toString("yyyy-MM-dd"),
-            self.membership_combo.currentText(),
-            self.member_id
-        ))
-        
-        # Record payment as a visit
+        old_name = self.names.get(member_id)
+        self.names[member_id] = name
+        if old_name is None:
+            self.insert_row(bisect.bisect_left(self.members, (name, member_id)), name, member_id)
+            return
+        
+        old_row = bisect.bisect_left(self.members, (old_name, member_id))
+        new_row = bisect.bisect_left(self.members, (name, member_id))
+        if new_row > old_row:
+            new_row -= 1  # Position once the old entry is gone
+        
+        if old_row >= self.exposed:
+            del self.members[old_row]
+            self.insert_row(new_row, name, member_id)
+        elif new_row == old_row:
+            self.members[old_row] = (name, member_id)
+            self.dataChanged.emit(self.index(old_row), self.index(old_row))
+        else:
+            # Expose the new position and move the row there: a move keeps
+            # persistent indexes, so a picker showing this member keeps it
+            destination = new_row + 1 if new_row > old_row else new_row
+            self.expose_through(destination)
+            self.beginMoveRows(QModelIndex(), old_row, old_row, QModelIndex(), destination)
+            del self.members[old_row]
+            self.members.insert(new_row, (name, member_id))
+            self.endMoveRows()
+    
+    def insert_row(self, row, name, member_id):
+        """Insert a member, telling views only if the row falls in the exposed range"""
+        if row > self.exposed:
+            self.members.insert(row, (name, member_id))
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.members.insert(row, (name, member_id))
+        self.exposed += 1
+        self.endInsertRows()
+    
+    def remove(self, member_id):
+        """Drop a deleted or deactivated member"""
+        if self.members is None or member_id not in self.names:
+            return
+        row = bisect.bisect_left(self.members, (self.names.pop(member_id), member_id))
+        if row >= self.exposed:
+            del self.members[row]
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.members[row]
+        self.exposed -= 1
+        self.endRemoveRows()
+
+
+class MemberSearchModel(QAbstractListModel):
+    """Type-ahead matches for one MemberPicker, from an indexed prefix query"""
+    
+    def __init__(self, conn, parent=None):
+        super().__init__(parent)
+        self.conn = conn
+        self.rows = []
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        member_id, name, phone = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return "{}  ·  {}".format(name, phone) if phone else name
+        if role == Qt.EditRole:
+            return name
+        if role == Qt.UserRole:
+            return member_id
+        return None
+    
+    def search(self, prefix):
+        """Replace the matches with active members whose name or phone starts with prefix"""
+        self.beginResetModel()
+        self.rows = search_members(self.conn, prefix)
+        self.endResetModel()
+
+
+class MemberPicker(QComboBox):
+    """Editable member combo over the shared MemberListModel.
+    
+    The drop-down pages through every active member; typing searches names
+    and phone numbers and offers the matches in a completer popup, and
+    picking one selects that member.
+    """
+    
+    def __init__(self, member_list, conn, parent=None):
+        super().__init__(parent)
+        self.setEditable(True)
+        self.setInsertPolicy(QComboBox.NoInsert)
+        
+        # Installed before setModel() so the combo's own completer, which would
+        # page through the whole member list, never sees the shared model
+        self.search_model = MemberSearchModel(conn, self)
+        completer = QCompleter(self.search_model, self)
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        completer.activated[QModelIndex].connect(
+            lambda index: self.set_member(index.data(Qt.UserRole)))
+        self.lineEdit().setCompleter(completer)
+        self.lineEdit().textEdited.connect(self.update_completions)
+        self.setModel(member_list)
+    
+    def showPopup(self):
+        if self.count() == 0:
+            self.model().fetchMore()
+        super().showPopup()
+    
+    def update_completions(self, text):
+        """Re-run the prefix search for the text typed so far"""
+        self.search_model.search(text)
+        if self.search_model.rowCount():
+            self.lineEdit().completer().complete()
+    
+    def member_id(self):
+        """The selected member's id, or None if the typed text does not name it"""
+        if self.currentIndex() < 0 or self.currentText() != self.itemText(self.currentIndex()):
+            return None
+        return self.currentData()
+    
+    def set_member(self, member_id):
+        """Select a member by id, clearing the selection if they are not active"""
+        self.setCurrentIndex(self.model().row_of(member_id))
+
+
+class MembersTableModel(QAbstractTableModel):
+    """Members table model that pages rows in from SQLite as the view scrolls"""
+    
+    HEADERS = ["ID", "Name", "Phone", "Email", "Membership",
+               "Start Date", "End Date", "Status", "Actions"]
+    PAGE_SIZE = 200
+    
+    def __init__(self, conn, parent=None):
+        super().__init__(parent)
+        self.conn = conn
+        self.rows = []
+        self.filters = {}
+        self.exhausted = False
+        self.today = date.today().toordinal()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        
+        member = self.rows[index.row()]
+        col = index.column()
+        
+        if role == Qt.DisplayRole:
+            if col >= 8:  # Actions column is painted by its delegate
+                return None
+            value = member[col]
+            return str(value) if value else ""
+        
+        if role == Qt.UserRole:
+            return member[0]
+        
+        if role == Qt.BackgroundRole and col == 6 and member[6]:
+            # Expiry coloring is only computed for rows that are actually painted
+            try:
+                days_left = date_ordinal(member[6]) - self.today - 1
+            except ValueError:
+                return None
+            if days_left < 0:
+                return QColor("#ffebee")  # Light red for expired
+            elif days_left <= 7:
+                return QColor("#fff3e0")  # Light orange for expiring soon
+        
+        return None
+    
+    def refresh_expiry_colors(self):
+        """Recolour the End Date column after the date has changed"""
+        self.today = date.today().toordinal()
+        if self.rows:
+            self.dataChanged.emit(self.index(0, 6), self.index(len(self.rows) - 1, 6),
+                                  [Qt.BackgroundRole])
+    
+    def where_clause(self):
+        """Return the combined WHERE clause and parameters of all active filters"""
+        clauses, params = [], []
+        for sql, filter_params in self.filters.values():
+            clauses.append("({})".format(sql))
+            params.extend(filter_params)
+        return " AND ".join(clauses) or "1", params
+    
+    def set_filter(self, name, sql=None, params=()):
+        """Set or clear (sql=None) a named filter and reload from the first page"""
+        if sql is None:
+            self.filters.pop(name, None)
+        else:
+            self.filters[name] = (sql, tuple(params))
+        self.reload()
+    
+    def reload(self):
+        """Drop every loaded row and fetch the first page again"""
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        
+        # Keyset pagination: continue strictly after the last loaded row
+        where, params = self.where_clause()
+        after = (self.rows[-1][8], self.rows[-1][0]) if self.rows else None
+        page = member_page(self.conn, where, params, after, self.PAGE_SIZE)
+        
+        if len(page) < self.PAGE_SIZE:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+    
+    def find_row(self, member_id):
+        """Return the loaded row index for member_id, or -1"""
+        for row, member in enumerate(self.rows):
+            if member[0] == member_id:
+                return row
+        return -1
+    
+    def patch_member(self, member_id):
+        """Reload a single member row, inserting or dropping it as filters dictate"""
+        where, params = self.where_clause()
+        cursor = self.conn.cursor()
         cursor.execute("""
-            INSERT INTO visits (member_id, payment_amount, payment_method, notes)
-            VALUES (?, ?, ?, ?)
-        """, (
-            self.member_id,
-            amount,
-            self.payment_method.currentText(),
-            f"Membership renewal - {self.membership_combo.currentText()}"
-        ))
+            SELECT id, name, phone, email, membership_type, 
+                   start_date, end_date, status, registration_date
+            FROM members WHERE id = ? AND {}
+        """.format(where), [member_id] + params)
+        member = cursor.fetchone()
+        row = self.find_row(member_id)
+        
+        if not member:
+            self.remove_member(member_id)
+        elif row >= 0:
+            self.rows[row] = member
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+        else:
+            # Only rows inside the loaded keyset range are added, at their sorted
+            # position; anything older is left for fetchMore to page in
+            key = self.sort_key(member)
+            if self.rows and not self.exhausted and key < self.sort_key(self.rows[-1]):
+                return
+            row = 0
+            while row < len(self.rows) and self.sort_key(self.rows[row]) > key:
+                row += 1
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.rows.insert(row, member)
+            self.endInsertRows()
+    
+    @staticmethod
+    def sort_key(member):
+        """(registration_date, id) of a row, the key the pages are ordered and fetched by"""
+        return (member[8] or "", member[0])
+    
+    def remove_member(self, member_id):
+        """Drop a member row if it is loaded"""
+        row = self.find_row(member_id)
+        if row >= 0:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.rows[row]
+            self.endRemoveRows()
+
+
+class PaymentHistoryModel(QAbstractTableModel):
+    """Payment history rows paged in on the QueryWorker as the view scrolls.
+    
+    Pages are keyset queries, so nothing holds a read transaction open
+    between scrolls. Rows are kept exactly as SQLite returns them; dates,
+    amounts and type labels are only formatted in data(), for the cells
+    that get painted.
+    """
+    
+    HEADERS = ["Date", "Member", "Amount", "Method", "Type", "Notes"]
+    PAGE_SIZE = 500
+    QUERY_KEY = 'payment_history'
+    
+    failed = pyqtSignal(str)
+    
+    def __init__(self, worker, parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.rows = []
+        self.range = None
+        self.exhausted = True
+        self.fetching = False
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
         
-        self.parent.conn.commit()
+        value = self.rows[index.row()][index.column()]
+        col = index.column()
         
-        QMessageBox.information(self, "Success", "Membership renewed successfully!")
-        self.accept()
+        if col == 0:  # date formatting
+            try:
+                return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %I:%M %p')
+            except (ValueError, TypeError):
+                return str(value)
+        elif col == 2:  # amount formatting
+            return "KSh {:,.0f}".format(DashboardMetrics.as_float(value))
+        elif col == 4:  # payment type
+            return PAYMENT_TYPE_LABELS.get(value, value or "")
+        return str(value) if value else ""
+    
+    def load(self, range_start, range_end):
+        """Show the payments in [range_start, range_end), starting with the newest page"""
+        self.beginResetModel()
+        self.rows = []
+        self.range = (range_start, range_end)
+        self.exhausted = False
+        self.fetching = False
+        self.endResetModel()
+        self.fetchMore()
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted or self.fetching:
+            return
+        self.fetching = True
+        
+        # Keyset pagination: continue strictly after the last loaded row.
+        # Reusing the key means a newer range supersedes a page still queued
+        range_start, range_end = self.range
+        after = (self.rows[-1][0], self.rows[-1][6]) if self.rows else None
+        self.worker.submit(self.QUERY_KEY, lambda conn: payment_history_page(
+            conn, range_start, range_end, after, self.PAGE_SIZE),
+            callback=self.append_batch, error_callback=self.on_failed)
+    
+    def append_batch(self, rows):
+        """Append a page delivered by the worker"""
+        self.fetching = False
+        if len(rows) < self.PAGE_SIZE:
+            self.exhausted = True
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+    
+    def on_failed(self, message):
+        self.fetching = False
+        self.exhausted = True
+        self.failed.emit(message)
+
+
+class ButtonColumnDelegate(QStyledItemDelegate):
+    """Paints a row of push buttons in a cell and reports clicks by row id"""
+    
+    clicked = pyqtSignal(str, object)
+    
+    def __init__(self, buttons, parent=None):
+        """buttons is a list of (key, text, tooltip) tuples"""
+        super().__init__(parent)
+        self.buttons = buttons
+    
+    def button_rects(self, option):
+        """Return (key, text, tooltip, rect) for every button in the cell"""
+        rects = []
+        x = option.rect.left() + 5
+        height = min(25, option.rect.height() - 4)
+        y = option.rect.top() + (option.rect.height() - height) // 2
+        for key, text, tooltip in self.buttons:
+            width = max(30, option.fontMetrics.horizontalAdvance(text) + 16)
+            rects.append((key, text, tooltip, QRect(x, y, width, height)))
+            x += width + 4
+        return rects
+    
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        style = option.widget.style() if option.widget else QApplication.style()
+        for key, text, tooltip, rect in self.button_rects(option):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = text
+            button.state = QStyle.State_Enabled | QStyle.State_Raised
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+    
+    def sizeHint(self, option, index):
+        rects = self.button_rects(option)
+        width = rects[-1][3].right() - option.rect.left() + 5 if rects else 0
+        return QSize(width, 29)
+    
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            for key, text, tooltip, rect in self.button_rects(option):
+                if rect.contains(event.pos()):
+                    self.clicked.emit(key, index.data(Qt.UserRole))
+                    return True
+        return super().editorEvent(event, model, option, index)
+    
+    def helpEvent(self, event, view, option, index):
+        if event.type() == QEvent.ToolTip:
+            for key, text, tooltip, rect in self.button_rects(option):
+                if rect.contains(event.pos()):
+                    QToolTip.showText(event.globalPos(), tooltip, view)
+                    return True
+        return super().helpEvent(event, view, option, index)
+
+
+class PerformanceDock(QDockWidget):
+    """Hidden debug panel (Ctrl+Shift+D) listing the slowest recent operations.
+    
+    Showing it starts instrumentation. It can also capture a cProfile run
+    of the GUI thread, saved next to the database and summarised here.
+    """
+    
+    HEADERS = ["Kind", "Operation", "Rows", "ms", "Thread", "When"]
+    KINDS = {"All": None, "SQL": 'sql', "Stages": 'stage'}
+    
+    def __init__(self, parent):
+        super().__init__("⏱️ Performance", parent)
+        self.setObjectName("performance_dock")
+        self.db_path = parent.db_path
+        self.profiler = None
+        
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        
+        controls = QHBoxLayout()
+        self.record_check = QCheckBox("Record timings")
+        self.record_check.toggled.connect(self.set_recording)
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItems(list(self.KINDS))
+        self.kind_combo.currentIndexChanged.connect(lambda index: self.refresh())
+        clear_btn = QPushButton("Clear")
+        clear_btn.clicked.connect(self.clear)
+        self.profile_btn = QPushButton("▶ Start cProfile")
+        self.profile_btn.clicked.connect(self.toggle_profiling)
+        self.log_label = QLabel("")
+        
+        controls.addWidget(self.record_check)
+        controls.addWidget(self.kind_combo)
+        controls.addWidget(clear_btn)
+        controls.addWidget(self.profile_btn)
+        controls.addWidget(self.log_label, 1)
+        layout.addLayout(controls)
+        
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+        
+        self.profile_text = QPlainTextEdit()
+        self.profile_text.setReadOnly(True)
+        self.profile_text.setStyleSheet("font-family: 'Courier New', monospace; font-size: 11px;")
+        self.profile_text.hide()
+        layout.addWidget(self.profile_text)
+        
+        self.setWidget(widget)
+        
+        # Refresh only while visible
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.on_visibility_changed)
+    
+    def on_visibility_changed(self, visible):
+        if visible:
+            self.record_check.setChecked(True)
+            self.log_label.setText("Log: {}".format(instrumentation.log_path) if instrumentation.log_path else "")
+            self.refresh()
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+    
+    def set_recording(self, checked):
+        if checked:
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+    
+    def clear(self):
+        instrumentation.clear()
+        self.refresh()
+    
+    def refresh(self):
+        """Show the slowest of the recent operations"""
+        operations = instrumentation.slowest(100, self.KINDS[self.kind_combo.currentText()])
+        self.table.setRowCount(len(operations))
+        for row, op in enumerate(operations):
+            values = ["SQL" if op.kind == 'sql' else "Stage", op.name,
+                      "" if op.rows is None else str(op.rows), "{:.1f}".format(op.seconds * 1000),
+                      op.thread, datetime.fromtimestamp(op.at).strftime('%H:%M:%S')]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col == 1:
+                    item.setToolTip(value)
+                elif col in (2, 3):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, col, item)
+    
+    def toggle_profiling(self):
+        """Start a cProfile capture of the GUI thread, or stop it and show the result"""
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            self.profile_btn.setText("■ Stop cProfile")
+            return
+        
+        self.profiler.disable()
+        path = os.path.join(os.path.dirname(os.path.abspath(self.db_path)),
+                            "gym_profile_{}.prof".format(datetime.now().strftime('%Y%m%d_%H%M%S')))
+        self.profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(self.profiler, stream=summary).sort_stats('cumulative').print_stats(30)
+        self.profiler = None
+        
+        self.profile_btn.setText("▶ Start cProfile")
+        self.profile_text.setPlainText("Saved {}\n{}".format(path, summary.getvalue()))
+        self.profile_text.show()
 
 
 def main():
-    app = QApplication(sys.argv)
+    # "gym.py import ..." and friends run the command line tool instead of the GUI
+    if len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
+        import gym_cli
+        sys.exit(gym_cli.main(sys.argv[1:]))
+    
+    # Timing options are handled here; everything else is left to Qt
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--instrument', action='store_true')
+    parser.add_argument('--perf-log')
+    parser.add_argument('--perf-log-threshold-ms', type=float, default=0.0)
+    options, qt_args = parser.parse_known_args(sys.argv[1:])
+    if options.instrument or options.perf_log:
+        instrumentation.enable(options.perf_log, options.perf_log_threshold_ms)
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # Set application style
     app.setStyle('Fusion')
@@ -0,0 +1,316 @@
+"""Attendance and churn analytics over the whole visits history.
+
+load_history() reads every visit and member into NumPy columns, one query
+each, and the analyses below run as array operations over those columns:
+
+    cohort_retention    share of each registration month's members still
+                        visiting one, two, ... months after joining
+    attendance_heatmap  visits by weekday and hour of day
+    renewal_outlook     how often members renewed given their attendance in
+                        the month before their membership ran out, applied
+                        to the memberships running out next
+
+NumPy is only needed here; load_history() raises RuntimeError without it,
+and gym.py imports this module when the Analytics tab is first filled.
+"""
+from datetime import date
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Seconds or whole days since 1970-01-01 of a stored date or timestamp, -1 when
+# it is missing or does not parse. julianday() works on every SQLite version
+EPOCH_SECONDS = "COALESCE(CAST(ROUND((julianday({}) - 2440587.5) * 86400) AS INTEGER), -1)"
+EPOCH_DAYS = "COALESCE(CAST(julianday({}) - 2440587.5 AS INTEGER), -1)"
+
+# 1970-01-01 was a Thursday; weekday() numbering has Monday as 0
+EPOCH_WEEKDAY = 3
+
+WEEKDAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Days after a membership ends without a renewal before it counts as lapsed
+LAPSE_DAYS = 14
+
+# Lower bounds of the attendance buckets renewal rates are learned for,
+# counted over the RENEWAL_WINDOW days before a membership ran out
+RENEWAL_WINDOW = 30
+ATTENDANCE_BUCKETS = [0, 1, 2, 4, 8, 12]
+
+# Pseudo-events pulling a sparsely observed bucket towards the overall renewal rate
+RENEWAL_PRIOR = 10
+
+# Every visit and member as arrays. Visit columns are sorted by member and time;
+# member columns are indexed by member id, with known False for unused ids and
+# -1 for missing dates. Days count from 1970-01-01
+VisitHistory = namedtuple('VisitHistory', [
+    'today', 'visit_member', 'visit_day', 'visit_hour', 'known', 'registered', 'started',
+    'ends', 'active', 'recurring', 'renewal_member', 'renewal_day'])
+
+# Retention of the registration months in `months` ('YYYY-MM'): rates[c, k] is
+# the share of cohort c's members who visited k months after joining, NaN
+# where that month has not happened yet
+CohortRetention = namedtuple('CohortRetention', ['months', 'sizes', 'rates'])
+
+# Visits by weekday (rows, Monday first) and hour (columns) over `weeks` weeks
+AttendanceHeatmap = namedtuple('AttendanceHeatmap', ['counts', 'weeks', 'first_day', 'last_day'])
+
+# Learned renewal rates per attendance bucket, and the current memberships
+# ending within `horizon` days, least likely to renew first
+RenewalOutlook = namedtuple('RenewalOutlook', [
+    'labels', 'renewed', 'lapsed', 'rates', 'horizon', 'ending', 'member_ids', 'end_days',
+    'recent_visits', 'likelihood'])
+
+
+def epoch_day(day):
+    """Days from 1970-01-01 to a date"""
+    return day.toordinal() - date(1970, 1, 1).toordinal()
+
+
+def epoch_date(day):
+    """The date a day number from epoch_day() stands for"""
+    return date.fromordinal(int(day) + date(1970, 1, 1).toordinal())
+
+
+def require_numpy():
+    """Fail with an install hint when NumPy is missing"""
+    if numpy is None:
+        raise RuntimeError("Analytics need numpy (pip install numpy)")
+
+
+def load_history(conn, today=None):
+    """Read visits, members and renewal payments into a VisitHistory.
+    
+    Each table is read with one query streamed straight into NumPy arrays;
+    the visits come off idx_visits_member_date already in member and time
+    order, and dates are turned into numbers by SQLite rather than Python.
+    """
+    require_numpy()
+    today = today or date.today()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT member_id, {} FROM visits
+        WHERE member_id IS NOT NULL
+        ORDER BY member_id, visit_date
+    """.format(EPOCH_SECONDS.format('visit_date')))
+    visits = numpy.fromiter(cursor, dtype=[('member', 'i4'), ('seconds', 'i8')])
+    visits = visits[visits['seconds'] >= 0]
+    
+    cursor.execute("""
+        SELECT id, {}, {}, {}, status = 'Active', COALESCE(membership_type, '') != 'Daily'
+        FROM members
+    """.format(EPOCH_DAYS.format('registration_date'), EPOCH_DAYS.format('start_date'),
+               EPOCH_DAYS.format('end_date')))
+    members = numpy.fromiter(cursor, dtype=[('id', 'i4'), ('registered', 'i4'), ('started', 'i4'),
+                                            ('ends', 'i4'), ('active', '?'), ('recurring', '?')])
+    
+    cursor.execute("""
+        SELECT member_id, {} FROM payments
+        WHERE payment_type = 'Renewal' AND member_id IS NOT NULL
+    """.format(EPOCH_DAYS.format('payment_date')))
+    renewals = numpy.fromiter(cursor, dtype=[('member', 'i4'), ('day', 'i4')])
+    
+    # Spread the member columns over an array per field indexed by member id
+    size = int(max(members['id'].max(initial=0), visits['member'].max(initial=0),
+                   renewals['member'].max(initial=0))) + 1
+    columns = {}
+    for field, fill in (('registered', -1), ('started', -1), ('ends', -1), ('active', False),
+                        ('recurring', False)):
+        columns[field] = numpy.full(size, fill, dtype=members.dtype[field])
+        columns[field][members['id']] = members[field]
+    known = numpy.zeros(size, dtype=bool)
+    known[members['id']] = True
+    
+    # Visits and renewals of deleted members have nobody to attribute them to
+    visits = visits[known[visits['member']]]
+    renewals = renewals[known[renewals['member']] & (renewals['day'] >= 0)]
+    
+    return VisitHistory(
+        today=epoch_day(today),
+        visit_member=visits['member'],
+        visit_day=(visits['seconds'] // 86400).astype(numpy.int32),
+        visit_hour=(visits['seconds'] % 86400 // 3600).astype(numpy.int8),
+        known=known,
+        renewal_member=renewals['member'],
+        renewal_day=renewals['day'],
+        **columns)
+
+
+def month_numbers(days):
+    """Months since January 1970 of an array of day numbers"""
+    if not days.size:
+        return days.astype(numpy.int64)
+    # Calendar conversion is slow per element; convert each distinct day once
+    first = int(days.min())
+    months = numpy.arange(first, int(days.max()) + 1).astype('datetime64[D]').astype('datetime64[M]')
+    return months.astype(numpy.int64)[days - first]
+
+
+def cohort_retention(history, cohorts=12, months=12):
+    """Retention of the last `cohorts` registration months over their first `months` months.
+    
+    A member is retained in month k if they visited at least once in the
+    k-th calendar month after the month they registered in; month 0 is the
+    registration month itself.
+    """
+    current = int(month_numbers(numpy.array([history.today]))[0])
+    first = current - cohorts + 1
+    
+    # Cohort of each member, -1 outside the months shown
+    joined = numpy.full(history.registered.size, -1, dtype=numpy.int64)
+    registered = history.known & (history.registered >= 0)
+    joined[registered] = month_numbers(history.registered[registered])
+    cohort = numpy.where((joined >= first) & (joined <= current), joined - first, -1)
+    
+    # Mark each (member, month after joining) with a visit once, however many visits it had
+    visit_cohort = cohort[history.visit_member]
+    offset = month_numbers(history.visit_day) - joined[history.visit_member]
+    counted = (visit_cohort >= 0) & (offset >= 0) & (offset < months)
+    visited = numpy.zeros((history.registered.size, months), dtype=bool)
+    visited[history.visit_member[counted], offset[counted]] = True
+    
+    in_window = cohort >= 0
+    sizes = numpy.bincount(cohort[in_window], minlength=cohorts)
+    retained = numpy.bincount(
+        (cohort[in_window][:, None] * months + numpy.arange(months)).ravel(),
+        weights=visited[in_window].ravel(), minlength=cohorts * months).reshape(cohorts, months)
+    
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        rates = retained / sizes[:, None]
+    # Months after joining that are still in the future
+    elapsed = current - (first + numpy.arange(cohorts))
+    rates[numpy.arange(months)[None, :] > elapsed[:, None]] = numpy.nan
+    
+    labels = numpy.arange(first, current + 1).astype('datetime64[M]').astype(str).tolist()
+    return CohortRetention(labels, sizes, rates)
+
+
+def weighted_retention(retention, month):
+    """Share of members retained `month` months after joining, over every cohort that got there"""
+    rates = retention.rates[:, month]
+    observed = ~numpy.isnan(rates) & (retention.sizes > 0)
+    members = retention.sizes[observed].sum()
+    if not members:
+        return None
+    return float((rates[observed] * retention.sizes[observed]).sum() / members)
+
+
+def attendance_heatmap(history, days=None):
+    """Count visits per weekday and hour over the last `days` days, or the whole history"""
+    last_day = history.today
+    if days:
+        first_day = last_day - days + 1
+    else:
+        first_day = int(history.visit_day.min(initial=last_day))
+    
+    chosen = (history.visit_day >= first_day) & (history.visit_day <= last_day)
+    weekday = (history.visit_day[chosen] + EPOCH_WEEKDAY) % 7
+    counts = numpy.bincount(weekday * 24 + history.visit_hour[chosen],
+                            minlength=7 * 24).reshape(7, 24)
+    return AttendanceHeatmap(counts, (last_day - first_day + 1) / 7, first_day, last_day)
+
+
+def visits_before(history, members, days, window):
+    """Visits each member made in the `window` days before the matching day.
+    
+    Visits are sorted by member and day, so each count is the distance
+    between two binary searches over one combined key.
+    """
+    span = numpy.int64(1) << 32
+    keys = history.visit_member.astype(numpy.int64) * span + history.visit_day
+    members = members.astype(numpy.int64) * span
+    return (numpy.searchsorted(keys, members + days, 'left')
+            - numpy.searchsorted(keys, members + days - window, 'left'))
+
+
+def attendance_bucket(visits):
+    """Index into ATTENDANCE_BUCKETS of each visit count"""
+    return numpy.searchsorted(ATTENDANCE_BUCKETS, visits, 'right') - 1
+
+
+def bucket_labels():
+    """Labels such as '2-3' and '12+' for ATTENDANCE_BUCKETS"""
+    labels = []
+    for low, high in zip(ATTENDANCE_BUCKETS, ATTENDANCE_BUCKETS[1:] + [None]):
+        if high is None:
+            labels.append("{}+".format(low))
+        elif high - low == 1:
+            labels.append(str(low))
+        else:
+            labels.append("{}-{}".format(low, high - 1))
+    return labels
+
+
+def renewal_outlook(history, horizon=30, window=RENEWAL_WINDOW):
+    """Learn renewal rates by attendance and score the memberships ending in the next `horizon` days.
+    
+    A renewal is a Renewal payment in the ledger, or a current term that
+    started after the member registered (imported or edited memberships
+    carry no renewal payment). A lapse is a recurring membership that ended
+    LAPSE_DAYS or more ago and was not renewed. Each is described by the
+    member's visits in the `window` days before it, and the renewal rate of
+    each attendance bucket is smoothed towards the overall rate.
+    """
+    today = history.today
+    
+    restarted = numpy.flatnonzero(history.known & history.recurring & (history.started >= 0)
+                                  & (history.started > history.registered))
+    renewal_member = numpy.concatenate([history.renewal_member, restarted])
+    renewal_day = numpy.concatenate([history.renewal_day, history.started[restarted]])
+    # A renewal payment on the day a term started is the same renewal
+    unique = numpy.unique(renewal_member.astype(numpy.int64) << 32 | renewal_day)
+    renewal_member, renewal_day = unique >> 32, unique & 0xFFFFFFFF
+    
+    lapsed_member = numpy.flatnonzero(history.known & history.recurring & (history.ends >= 0)
+                                      & (history.ends <= today - LAPSE_DAYS))
+    
+    buckets = len(ATTENDANCE_BUCKETS)
+    renewed = numpy.bincount(attendance_bucket(
+        visits_before(history, renewal_member, renewal_day, window)), minlength=buckets)
+    lapsed = numpy.bincount(attendance_bucket(
+        visits_before(history, lapsed_member, history.ends[lapsed_member], window)),
+        minlength=buckets)
+    
+    events = renewed + lapsed
+    if events.sum():
+        overall = renewed.sum() / events.sum()
+        rates = (renewed + RENEWAL_PRIOR * overall) / (events + RENEWAL_PRIOR)
+    else:
+        rates = numpy.full(buckets, numpy.nan)
+    
+    # Score the current memberships on their attendance up to and including today
+    member_ids = numpy.flatnonzero(history.known & history.active & history.recurring
+                                   & (history.ends >= today) & (history.ends < today + horizon))
+    end_days = history.ends[member_ids]
+    recent_visits = visits_before(history, member_ids, numpy.full(member_ids.size, today + 1), window)
+    bucket = attendance_bucket(recent_visits)
+    likelihood = rates[bucket]
+    ending = numpy.bincount(bucket, minlength=buckets)
+    
+    order = numpy.lexsort((end_days, likelihood))
+    return RenewalOutlook(bucket_labels(), renewed, lapsed, rates, horizon, ending,
+                          member_ids[order], end_days[order], recent_visits[order],
+                          likelihood[order])
+
+
+def least_likely_renewals(conn, outlook, limit=20):
+    """(member_id, name, phone, end_date, visits, likelihood) for the first `limit` members of an outlook"""
+    member_ids = outlook.member_ids[:limit].tolist()
+    if not member_ids:
+        return []
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, name, phone FROM members WHERE id IN ({})".format(
+        ",".join("?" * len(member_ids))), member_ids)
+    contacts = {member_id: (name, phone) for member_id, name, phone in cursor.fetchall()}
+    
+    rows = []
+    for member_id, end_day, visits, likelihood in zip(
+            member_ids, outlook.end_days[:limit], outlook.recent_visits[:limit],
+            outlook.likelihood[:limit]):
+        name, phone = contacts.get(member_id, ("", ""))
+        rows.append((member_id, name, phone, epoch_date(end_day).isoformat(), int(visits),
+                     float(likelihood)))
+    return rows
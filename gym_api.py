@@ -0,0 +1,307 @@
+"""HTTP/JSON API for check-in kiosks and turnstiles.
+
+A small asyncio server on top of gym_core, with no dependencies beyond the
+standard library:
+
+    POST /checkin       {"member": "0712345678", "amount": 200, "method": "Cash", "notes": ""}
+    POST /renew         {"member": 42, "amount": 3000, "method": "M-Pesa", "type": "Monthly",
+                         "until": "2026-12-31"}
+    GET  /members/<ref> member id, phone number or exact name
+    GET  /expiry        expired and soon-to-expire memberships
+    GET  /health
+
+Reads run on a pool of read-only connections in worker threads. Check-ins
+go through gym_core's VisitWriteQueue, which commits them in groups, so a
+burst of turnstile scans costs one commit instead of hundreds.
+
+    python gym_api.py --host 0.0.0.0 --port 8080
+"""
+import sys
+import json
+import time
+import queue
+import asyncio
+import argparse
+from datetime import date
+from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
+
+from gym_core import (
+    DB_PATH, VisitWriteQueue, connect_database, init_schema, renew_member,
+    renewal_end_date, resolve_member, expiry_alerts
+)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+MAX_BODY = 64 * 1024
+
+
+class HTTPError(Exception):
+    """Ends a request with the given status and message"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """A fixed set of read-only connections shared by the executor threads"""
+    
+    def __init__(self, path, size):
+        self.connections = queue.Queue()
+        for _ in range(size):
+            self.connections.put(connect_database(path, readonly=True, check_same_thread=False))
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='gym-read')
+    
+    def call(self, function, *args):
+        """Run function(conn, *args) with a pooled connection"""
+        conn = self.connections.get()
+        try:
+            return function(conn, *args)
+        finally:
+            self.connections.put(conn)
+    
+    async def run(self, function, *args):
+        """Run function(conn, *args) on an executor thread and await the result"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.call, function, *args)
+    
+    def close(self):
+        self.executor.shutdown()
+        while not self.connections.empty():
+            self.connections.get().close()
+
+
+def lookup_member(conn, reference):
+    """Member details for the kiosk screen"""
+    member_id, name, membership_type, end_date, status = resolve_member(conn, reference)
+    cursor = conn.cursor()
+    cursor.execute("SELECT phone, email FROM members WHERE id = ?", (member_id,))
+    phone, email = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*), MAX(visit_date) FROM visits WHERE member_id = ?", (member_id,))
+    visit_count, last_visit = cursor.fetchone()
+    
+    return {
+        'member_id': member_id,
+        'name': name,
+        'phone': phone,
+        'email': email,
+        'membership_type': membership_type,
+        'end_date': end_date,
+        'status': status,
+        'active': status == 'Active' and (end_date or '') >= date.today().isoformat(),
+        'visits': visit_count,
+        'last_visit': last_visit,
+    }
+
+
+class GymAPI:
+    """Routes requests to gym_core and serves them over HTTP/1.1 with keep-alive"""
+    
+    def __init__(self, path=DB_PATH, readers=4, max_batch=500, max_delay=0.0):
+        conn = connect_database(path)
+        init_schema(conn)
+        conn.close()
+        
+        self.path = path
+        self.readers = readers
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.started = time.monotonic()
+    
+    async def start(self, host='127.0.0.1', port=8080):
+        """Open the pool, the check-in writer and the listening socket"""
+        self.pool = ConnectionPool(self.path, self.readers)
+        self.visit_queue = VisitWriteQueue(self.path, self.max_batch, self.max_delay)
+        
+        # Renewals are rare; one thread and connection keeps them in order
+        self.writer_conn = connect_database(self.path, check_same_thread=False)
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gym-write')
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+    
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.visit_queue.close)
+        self.writer.shutdown()
+        self.writer_conn.close()
+        self.pool.close()
+    
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until the client closes it"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                length = self.content_length(headers.get('content-length'))
+                if length is None:
+                    # Without a usable length the body cannot be skipped, so the connection ends
+                    status, payload = 400, {'error': "Invalid Content-Length"}
+                    keep_alive = False
+                elif length > MAX_BODY:
+                    status, payload = 413, {'error': REASONS[413]}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self.dispatch(method, target, body)
+                    keep_alive = (headers.get('connection', '').lower() != 'close'
+                                  and version == 'HTTP/1.1')
+                
+                data = json.dumps(payload).encode()
+                writer.write("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\n"
+                             "Content-Length: {}\r\nConnection: {}\r\n\r\n".format(
+                                 status, REASONS[status], len(data),
+                                 'keep-alive' if keep_alive else 'close').encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def dispatch(self, method, target, body):
+        """Return (status, payload) for one request"""
+        path = target.split('?', 1)[0].rstrip('/')
+        try:
+            if path == '/checkin':
+                self.require(method, 'POST')
+                return 200, await self.check_in(self.parse(body))
+            if path == '/renew':
+                self.require(method, 'POST')
+                return 200, await self.renew(self.parse(body))
+            if path.startswith('/members/'):
+                self.require(method, 'GET')
+                return 200, await self.pool.run(lookup_member, unquote(path[len('/members/'):]))
+            if path == '/expiry':
+                self.require(method, 'GET')
+                alerts = await self.pool.run(expiry_alerts)
+                return 200, {'alerts': [alert._asdict() for alert in alerts]}
+            if path == '/health':
+                return 200, {'status': 'ok', 'uptime': round(time.monotonic() - self.started, 1),
+                             'check_ins': self.visit_queue.rows, 'batches': self.visit_queue.batches}
+            raise HTTPError(404, "No such endpoint: {}".format(path))
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        except LookupError as e:
+            return 404, {'error': str(e)}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': "{}: {}".format(type(e).__name__, e)}
+    
+    @staticmethod
+    def content_length(value):
+        """Parse a Content-Length header; None unless it is a plain non-negative integer"""
+        if not value:
+            return 0
+        if not (value.isascii() and value.isdigit()):
+            return None
+        return int(value)
+    
+    @staticmethod
+    def require(method, expected):
+        if method != expected:
+            raise HTTPError(405, "Use {}".format(expected))
+    
+    @staticmethod
+    def parse(body):
+        """Decode a JSON object request body"""
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        if data.get('member') in (None, ""):
+            raise HTTPError(400, "member is required")
+        return data
+    
+    async def check_in(self, data):
+        """Resolve the member on a reader, then queue the visit for the next group commit"""
+        member_id, name, _, end_date, status = await self.pool.run(resolve_member, data['member'])
+        future = self.visit_queue.submit(member_id, data.get('amount'),
+                                         data.get('method') or "None", data.get('notes') or "")
+        visit_id, payment_id = await asyncio.wrap_future(future)
+        
+        return {
+            'visit_id': visit_id,
+            'payment_id': payment_id,
+            'member_id': member_id,
+            'name': name,
+            'end_date': end_date,
+            'active': status == 'Active' and (end_date or '') >= date.today().isoformat(),
+        }
+    
+    async def renew(self, data):
+        """Renew on the writer thread"""
+        until = data.get('until')
+        if until:
+            # Checked before queueing so a bad date costs no writer time, and the
+            # response carries the date as stored rather than as sent
+            try:
+                until = date.fromisoformat(str(until)).isoformat()
+            except ValueError:
+                raise HTTPError(400, "until must be a date (YYYY-MM-DD)")
+        
+        def run(conn):
+            member_id, name, membership_type, end_date, _ = resolve_member(conn, data['member'])
+            membership_type = data.get('type') or membership_type or "Monthly"
+            new_end_date = until or renewal_end_date(end_date, membership_type).isoformat()
+            payment_id = renew_member(conn, member_id, membership_type, new_end_date,
+                                      data.get('amount'), data.get('method') or "Cash")
+            return {'member_id': member_id, 'name': name, 'membership_type': membership_type,
+                    'end_date': new_end_date, 'payment_id': payment_id}
+        
+        return await asyncio.get_running_loop().run_in_executor(self.writer, run, self.writer_conn)
+
+
+async def serve(args):
+    api = GymAPI(args.db, readers=args.readers, max_batch=args.max_batch,
+                 max_delay=args.max_delay_ms / 1000)
+    server = await api.start(args.host, args.port)
+    print("Serving {} on http://{}:{}".format(args.db, args.host, args.port), flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await api.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON API for check-in kiosks")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--readers', type=int, default=4, help='read connections in the pool')
+    parser.add_argument('--max-batch', type=int, default=500, help='most check-ins per commit')
+    parser.add_argument('--max-delay-ms', type=float, default=0.0,
+                        help='extra time a check-in may wait to share its commit with others')
+    args = parser.parse_args(argv)
+    
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
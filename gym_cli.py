@@ -0,0 +1,243 @@
+"""Command line interface to the gym database, for scripts and nightly jobs.
+
+Uses gym_core only, so it starts quickly and runs without a display:
+
+    python gym_cli.py checkin 0712345678 --amount 200 --method Cash
+    python gym_cli.py renew 42 --type Quarterly --amount 8000 --method M-Pesa
+    python gym_cli.py expiry --json
+    python gym_cli.py at-risk --level inactive --sort paid
+    python gym_cli.py report dashboard
+    python gym_cli.py report payments --from 2024-01-01 --to 2024-01-31
+    python gym_cli.py import members members.csv
+    python gym_cli.py export payments january.xlsx --from 2024-01-01 --to 2024-01-31
+
+MEMBER may be a member id, a phone number or an exact name.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date
+
+from gym_core import (
+    DB_PATH, MEMBERSHIP_TYPES, PAYMENT_METHODS, PAYMENT_TYPE_LABELS, EXPORTS,
+    connect_database, init_schema, import_records, export_records, check_in,
+    renew_member, renewal_end_date, expiry_alerts, payment_report, resolve_member,
+    DashboardMetrics, ENGAGEMENT_ORDERS, member_engagement
+)
+
+
+class CommandError(Exception):
+    """A command failed in a way worth a one-line message rather than a traceback"""
+
+
+def open_database(path, readonly=False):
+    """Open the database, creating and migrating it for commands that write"""
+    if readonly:
+        if not os.path.exists(path):
+            raise CommandError("No database at {}".format(path))
+        return connect_database(path, readonly=True)
+    
+    conn = connect_database(path)
+    init_schema(conn)
+    return conn
+
+
+def print_progress(count):
+    """Overwrite the current line with a running row count"""
+    print("\r{:,} rows".format(count), end="", flush=True, file=sys.stderr)
+
+
+def print_json(value):
+    print(json.dumps(value, indent=2, default=str))
+
+
+def cmd_checkin(args):
+    conn = open_database(args.db)
+    member_id, name, _, end_date, _ = resolve_member(conn, args.member)
+    visit_id, payment_id = check_in(conn, member_id, args.amount, args.method, args.notes)
+    
+    print("Checked in {} (visit {}{})".format(
+        name, visit_id, ", paid KSh {:,.0f}".format(float(args.amount)) if payment_id else ""))
+    if end_date and end_date < date.today().isoformat():
+        print("Warning: membership expired on {}".format(end_date), file=sys.stderr)
+
+
+def cmd_renew(args):
+    conn = open_database(args.db)
+    member_id, name, membership_type, end_date, _ = resolve_member(conn, args.member)
+    membership_type = args.type or membership_type or "Monthly"
+    new_end_date = args.until or renewal_end_date(end_date, membership_type).isoformat()
+    
+    renew_member(conn, member_id, membership_type, new_end_date, args.amount, args.method)
+    print("Renewed {} ({}) until {}".format(name, membership_type, new_end_date))
+
+
+def cmd_expiry(args):
+    conn = open_database(args.db, readonly=True)
+    alerts = expiry_alerts(conn)
+    
+    if args.json:
+        print_json([alert._asdict() for alert in alerts])
+        return
+    
+    for alert in alerts:
+        print("{:<8} {:>4}  {:<10}  {:<30} {}".format(
+            alert.level, alert.days_left, alert.end_date, alert.name, alert.phone or ""))
+    print("{} members expired or expiring".format(len(alerts)), file=sys.stderr)
+
+
+def cmd_at_risk(args):
+    conn = open_database(args.db, readonly=True)
+    level = args.level.upper().replace('-', ' ') if args.level else None
+    total, members = member_engagement(conn, level, args.sort, args.limit)
+    
+    if args.json:
+        print_json({'total': total, 'members': [member._asdict() for member in members]})
+        return
+    
+    for member in members:
+        print("{:<8} {:>5}  {:<10}  {:<30} {:>4} visits  KSh {:>10,.0f}  {}".format(
+            member.level, "-" if member.days_absent is None else member.days_absent,
+            (member.last_visit or "never")[:10], member.name, member.visit_count,
+            member.lifetime_paid, member.phone or ""))
+    print("{:,} of {:,} current members at risk or inactive".format(len(members), total),
+          file=sys.stderr)
+
+
+def cmd_report(args):
+    conn = open_database(args.db, readonly=True)
+    
+    if args.report == 'dashboard':
+        metrics = DashboardMetrics(conn).compute()
+        if args.json:
+            print_json(metrics)
+            return
+        for key, value in metrics.items():
+            label = key.replace('_', ' ').capitalize()
+            print("{:<20} {:,.2f}".format(label, value) if isinstance(value, float)
+                  else "{:<20} {:,}".format(label, value))
+        return
+    
+    today = date.today().isoformat()
+    report = payment_report(conn, args.date_from or today, args.date_to or args.date_from or today)
+    if args.json:
+        print_json(report)
+        return
+    
+    print("Payments {} to {}: {:,} totalling KSh {:,.0f}".format(
+        report['date_from'], report['date_to'], report['count'], report['total']))
+    for title, totals, labels in (("By method", report['by_method'], {}),
+                                  ("By type", report['by_type'], PAYMENT_TYPE_LABELS)):
+        print("\n" + title)
+        for key, (count, amount) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            print("  {:<16} {:>8,}  KSh {:>14,.0f}".format(labels.get(key, key) or "", count, amount))
+
+
+def cmd_import(args):
+    conn = open_database(args.db)
+    result = import_records(conn, args.kind, args.path, batch_size=args.batch_size,
+                            progress=print_progress, exclusive=args.exclusive)
+    
+    print("\rImported {:,} {} in {:.2f}s ({:,.0f} rows/s)".format(
+        result.imported, result.kind, result.seconds, result.imported / max(result.seconds, 1e-9)))
+    for line, message in result.errors:
+        print("  row {}: {}".format(line, message))
+    if result.rejected:
+        print("Skipped {:,} invalid rows".format(result.rejected))
+        return 1
+
+
+def cmd_export(args):
+    conn = open_database(args.db, readonly=True)
+    started = time.monotonic()
+    count = export_records(conn, args.kind, args.path, args.date_from, args.date_to,
+                           progress=print_progress)
+    
+    print("\rExported {:,} {} to {} in {:.2f}s".format(count, args.kind, args.path,
+                                                      time.monotonic() - started))
+
+
+def build_parser():
+    """Build the argument parser with one sub-command per operation"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    
+    parser = argparse.ArgumentParser(prog="gym", description="Gym management from the command line")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+    
+    checkin = commands.add_parser('checkin', parents=[common], help="record a visit")
+    checkin.add_argument('member', help='member id, phone number or exact name')
+    checkin.add_argument('--amount', help='amount paid for the visit')
+    checkin.add_argument('--method', default="None", choices=["None"] + PAYMENT_METHODS)
+    checkin.add_argument('--notes', default="")
+    checkin.set_defaults(handler=cmd_checkin)
+    
+    renew = commands.add_parser('renew', parents=[common], help="renew a membership")
+    renew.add_argument('member', help='member id, phone number or exact name')
+    renew.add_argument('--amount', required=True)
+    renew.add_argument('--method', default="Cash", choices=PAYMENT_METHODS)
+    renew.add_argument('--type', choices=MEMBERSHIP_TYPES,
+                       help='new membership type (default: the current one)')
+    renew.add_argument('--until', help='new end date, YYYY-MM-DD (default: from the type)')
+    renew.set_defaults(handler=cmd_renew)
+    
+    expiry = commands.add_parser('expiry', parents=[common],
+                                 help="list expired and soon-to-expire memberships")
+    expiry.add_argument('--json', action='store_true')
+    expiry.set_defaults(handler=cmd_expiry)
+    
+    at_risk = commands.add_parser('at-risk', parents=[common],
+                                  help="list current members who have stopped visiting")
+    at_risk.add_argument('--level', choices=['at-risk', 'inactive'],
+                         help='only one level (default: both)')
+    at_risk.add_argument('--sort', default='absent', choices=sorted(ENGAGEMENT_ORDERS))
+    at_risk.add_argument('--limit', type=int, default=100)
+    at_risk.add_argument('--json', action='store_true')
+    at_risk.set_defaults(handler=cmd_at_risk)
+    
+    report = commands.add_parser('report', parents=[common], help="dashboard or payment report")
+    report.add_argument('report', choices=['dashboard', 'payments'])
+    report.add_argument('--from', dest='date_from', help='first day, YYYY-MM-DD (default: today)')
+    report.add_argument('--to', dest='date_to', help='last day, YYYY-MM-DD (default: --from)')
+    report.add_argument('--json', action='store_true')
+    report.set_defaults(handler=cmd_report)
+    
+    bulk_import = commands.add_parser(
+        'import', parents=[common], help="bulk import members or visits from CSV/JSON",
+        description="Each batch commits on its own, so other terminals and the API keep "
+                    "working during the import. Into an empty database, or with --exclusive, "
+                    "the whole file is one transaction that locks out every other writer "
+                    "until it finishes.")
+    bulk_import.add_argument('kind', choices=['members', 'visits'])
+    bulk_import.add_argument('path')
+    bulk_import.add_argument('--batch-size', type=int, default=5000,
+                             help="rows per batch; each holds the write lock while it commits")
+    bulk_import.add_argument('--exclusive', action='store_true',
+                             help="one transaction with triggers and indexes dropped: faster "
+                                  "for large files, but nobody else can write until it ends")
+    bulk_import.set_defaults(handler=cmd_import)
+    
+    export = commands.add_parser('export', parents=[common],
+                                 help="export to CSV, JSON Lines, XLSX or Parquet")
+    export.add_argument('kind', choices=sorted(EXPORTS))
+    export.add_argument('path', help='output file; the extension picks the format')
+    export.add_argument('--from', dest='date_from', help='first day to include (YYYY-MM-DD)')
+    export.add_argument('--to', dest='date_to', help='last day to include (YYYY-MM-DD)')
+    export.set_defaults(handler=cmd_export)
+    
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args) or 0
+    except (CommandError, LookupError, ValueError, RuntimeError) as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
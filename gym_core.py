@@ -0,0 +1,2192 @@
+"""Gym management data layer and services, usable without Qt.
+
+Schema and migrations, connections, validation, the payments ledger,
+dashboard metrics, bulk import/export and the operations behind the GUI's
+forms (check-in, renewal, member edits, expiry alerts, reports). gym.py
+builds the desktop application on top of this module and gym_cli.py the
+command line.
+"""
+import os
+import csv
+import bisect
+import json
+import time
+import queue
+import socket
+import sqlite3
+import calendar
+import functools
+import threading
+from datetime import date, datetime, timedelta
+from array import array
+from contextlib import contextmanager
+from collections import namedtuple, OrderedDict, deque
+from concurrent.futures import Future
+
+DB_PATH = 'gym_management.db'
+
+MEMBERSHIP_TYPES = ["Monthly", "Quarterly", "Half-yearly", "Yearly", "Daily"]
+PAYMENT_METHODS = ["Cash", "M-Pesa", "Bank Transfer", "Card"]
+MEMBER_STATUSES = ["Active", "Inactive"]
+
+# Outcome of a bulk import: rows stored, rows rejected with (line, message) for
+# the first few rejections, and the wall time taken
+ImportResult = namedtuple('ImportResult', ['kind', 'imported', 'rejected', 'errors', 'seconds'])
+
+# Triggers that keep the daily_stats rollup in step with visits and payments.
+# Each visit counts against its day and payment method, each payment adds its
+# amount to the revenue of its day and method
+DAILY_STATS_TRIGGERS = {
+    'daily_stats_visit_insert': """
+        CREATE TRIGGER IF NOT EXISTS daily_stats_visit_insert AFTER INSERT ON visits BEGIN
+            INSERT INTO daily_stats (day, payment_method, visit_count, paying_visits)
+            VALUES (COALESCE(substr(new.visit_date, 1, 10), date('now')),
+                    COALESCE(new.payment_method, 'None'), 1, new.payment_amount > 0)
+            ON CONFLICT (day, payment_method) DO UPDATE SET
+                visit_count = visit_count + 1,
+                paying_visits = paying_visits + excluded.paying_visits;
+        END""",
+    'daily_stats_visit_delete': """
+        CREATE TRIGGER IF NOT EXISTS daily_stats_visit_delete AFTER DELETE ON visits BEGIN
+            UPDATE daily_stats SET
+                visit_count = visit_count - 1,
+                paying_visits = paying_visits - (old.payment_amount > 0)
+            WHERE day = COALESCE(substr(old.visit_date, 1, 10), date('now'))
+              AND payment_method = COALESCE(old.payment_method, 'None');
+        END""",
+    'daily_stats_visit_update': """
+        CREATE TRIGGER IF NOT EXISTS daily_stats_visit_update
+        AFTER UPDATE OF visit_date, payment_amount, payment_method ON visits BEGIN
+            UPDATE daily_stats SET
+                visit_count = visit_count - 1,
+                paying_visits = paying_visits - (old.payment_amount > 0)
+            WHERE day = COALESCE(substr(old.visit_date, 1, 10), date('now'))
+              AND payment_method = COALESCE(old.payment_method, 'None');
+            INSERT INTO daily_stats (day, payment_method, visit_count, paying_visits)
+            VALUES (COALESCE(substr(new.visit_date, 1, 10), date('now')),
+                    COALESCE(new.payment_method, 'None'), 1, new.payment_amount > 0)
+            ON CONFLICT (day, payment_method) DO UPDATE SET
+                visit_count = visit_count + 1,
+                paying_visits = paying_visits + excluded.paying_visits;
+        END""",
+    'daily_stats_payment_insert': """
+        CREATE TRIGGER IF NOT EXISTS daily_stats_payment_insert AFTER INSERT ON payments BEGIN
+            INSERT INTO daily_stats (day, payment_method, revenue)
+            VALUES (COALESCE(substr(new.payment_date, 1, 10), date('now')),
+                    new.payment_method, new.amount)
+            ON CONFLICT (day, payment_method) DO UPDATE SET revenue = revenue + excluded.revenue;
+        END""",
+    'daily_stats_payment_delete': """
+        CREATE TRIGGER IF NOT EXISTS daily_stats_payment_delete AFTER DELETE ON payments BEGIN
+            UPDATE daily_stats SET revenue = revenue - old.amount
+            WHERE day = COALESCE(substr(old.payment_date, 1, 10), date('now'))
+              AND payment_method = old.payment_method;
+        END""",
+    'daily_stats_payment_update': """
+        CREATE TRIGGER IF NOT EXISTS daily_stats_payment_update
+        AFTER UPDATE OF amount, payment_method, payment_date ON payments BEGIN
+            UPDATE daily_stats SET revenue = revenue - old.amount
+            WHERE day = COALESCE(substr(old.payment_date, 1, 10), date('now'))
+              AND payment_method = old.payment_method;
+            INSERT INTO daily_stats (day, payment_method, revenue)
+            VALUES (COALESCE(substr(new.payment_date, 1, 10), date('now')),
+                    new.payment_method, new.amount)
+            ON CONFLICT (day, payment_method) DO UPDATE SET revenue = revenue + excluded.revenue;
+        END""",
+}
+
+# Recomputes daily_stats from scratch; used by the migration and for repairs
+DAILY_STATS_REBUILD = [
+    "DELETE FROM daily_stats",
+    """INSERT INTO daily_stats (day, payment_method, visit_count, paying_visits, revenue)
+       SELECT day, payment_method, SUM(visit_count), SUM(paying_visits), SUM(revenue)
+       FROM (
+           SELECT COALESCE(substr(visit_date, 1, 10), date('now')) AS day,
+                  COALESCE(payment_method, 'None') AS payment_method,
+                  COUNT(*) AS visit_count, SUM(payment_amount > 0) AS paying_visits,
+                  0 AS revenue
+           FROM visits GROUP BY 1, 2
+           UNION ALL
+           SELECT COALESCE(substr(payment_date, 1, 10), date('now')), payment_method,
+                  0, 0, SUM(amount)
+           FROM payments GROUP BY 1, 2
+       )
+       GROUP BY day, payment_method""",
+]
+
+# Statements that count one visit ({row} is new or old) into or out of
+# member_stats. Taking away a member's first or last visit looks up the new
+# one on idx_visits_member_date, so no statement scans a member's visits.
+# Rows without a member are left out
+MEMBER_STATS_ADD_VISIT = """
+            INSERT INTO member_stats (member_id, visit_count, paid_visit_count, first_visit, last_visit)
+            SELECT {row}.member_id, 1, COALESCE({row}.payment_amount > 0, 0),
+                   {row}.visit_date, {row}.visit_date
+            WHERE {row}.member_id IS NOT NULL
+            ON CONFLICT (member_id) DO UPDATE SET
+                visit_count = visit_count + 1,
+                paid_visit_count = paid_visit_count + excluded.paid_visit_count,
+                first_visit = CASE WHEN first_visit IS NULL OR excluded.first_visit < first_visit
+                                   THEN excluded.first_visit ELSE first_visit END,
+                last_visit = CASE WHEN last_visit IS NULL OR excluded.last_visit > last_visit
+                                  THEN excluded.last_visit ELSE last_visit END;"""
+MEMBER_STATS_REMOVE_VISIT = """
+            UPDATE member_stats SET
+                visit_count = visit_count - 1,
+                paid_visit_count = paid_visit_count - COALESCE({row}.payment_amount > 0, 0),
+                first_visit = CASE WHEN {row}.visit_date > first_visit THEN first_visit
+                                   ELSE (SELECT MIN(visit_date) FROM visits
+                                         WHERE member_id = {row}.member_id) END,
+                last_visit = CASE WHEN {row}.visit_date < last_visit THEN last_visit
+                                  ELSE (SELECT MAX(visit_date) FROM visits
+                                        WHERE member_id = {row}.member_id) END
+            WHERE member_id = {row}.member_id;"""
+MEMBER_STATS_ADD_PAYMENT = """
+            INSERT INTO member_stats (member_id, lifetime_paid, additional_paid)
+            SELECT {row}.member_id, {row}.amount,
+                   CASE WHEN {row}.payment_type != 'Membership' THEN {row}.amount ELSE 0 END
+            WHERE {row}.member_id IS NOT NULL
+            ON CONFLICT (member_id) DO UPDATE SET
+                lifetime_paid = lifetime_paid + excluded.lifetime_paid,
+                additional_paid = additional_paid + excluded.additional_paid;"""
+MEMBER_STATS_REMOVE_PAYMENT = """
+            UPDATE member_stats SET
+                lifetime_paid = lifetime_paid - {row}.amount,
+                additional_paid = additional_paid -
+                    CASE WHEN {row}.payment_type != 'Membership' THEN {row}.amount ELSE 0 END
+            WHERE member_id = {row}.member_id;"""
+
+# Triggers that keep member_stats, one row of visit and payment totals per
+# member, in step with visits, payments and member deletes
+MEMBER_STATS_TRIGGERS = {
+    'member_stats_visit_insert': """
+        CREATE TRIGGER IF NOT EXISTS member_stats_visit_insert AFTER INSERT ON visits BEGIN{}
+        END""".format(MEMBER_STATS_ADD_VISIT.format(row='new')),
+    'member_stats_visit_delete': """
+        CREATE TRIGGER IF NOT EXISTS member_stats_visit_delete AFTER DELETE ON visits BEGIN{}
+        END""".format(MEMBER_STATS_REMOVE_VISIT.format(row='old')),
+    'member_stats_visit_update': """
+        CREATE TRIGGER IF NOT EXISTS member_stats_visit_update
+        AFTER UPDATE OF member_id, visit_date, payment_amount ON visits BEGIN{}{}
+        END""".format(MEMBER_STATS_REMOVE_VISIT.format(row='old'),
+                       MEMBER_STATS_ADD_VISIT.format(row='new')),
+    'member_stats_payment_insert': """
+        CREATE TRIGGER IF NOT EXISTS member_stats_payment_insert AFTER INSERT ON payments BEGIN{}
+        END""".format(MEMBER_STATS_ADD_PAYMENT.format(row='new')),
+    'member_stats_payment_delete': """
+        CREATE TRIGGER IF NOT EXISTS member_stats_payment_delete AFTER DELETE ON payments BEGIN{}
+        END""".format(MEMBER_STATS_REMOVE_PAYMENT.format(row='old')),
+    'member_stats_payment_update': """
+        CREATE TRIGGER IF NOT EXISTS member_stats_payment_update
+        AFTER UPDATE OF member_id, amount, payment_type ON payments BEGIN{}{}
+        END""".format(MEMBER_STATS_REMOVE_PAYMENT.format(row='old'),
+                       MEMBER_STATS_ADD_PAYMENT.format(row='new')),
+    'member_stats_member_delete': """
+        CREATE TRIGGER IF NOT EXISTS member_stats_member_delete AFTER DELETE ON members BEGIN
+            DELETE FROM member_stats WHERE member_id = old.id;
+        END""",
+}
+
+# Totals per member over the visits and payments with id >= ?, in
+# member_stats column order; the rebuild passes 0, the import catch-up the
+# first imported ids
+MEMBER_STATS_AGGREGATE = """
+       SELECT member_id, SUM(visit_count), SUM(paid_visit_count), MIN(first_visit),
+              MAX(last_visit), SUM(lifetime_paid), SUM(additional_paid)
+       FROM (
+           SELECT member_id, COUNT(*) AS visit_count,
+                  SUM(COALESCE(payment_amount > 0, 0)) AS paid_visit_count,
+                  MIN(visit_date) AS first_visit, MAX(visit_date) AS last_visit,
+                  0 AS lifetime_paid, 0 AS additional_paid
+           FROM visits WHERE id >= ? AND member_id IS NOT NULL GROUP BY member_id
+           UNION ALL
+           SELECT member_id, 0, 0, NULL, NULL, SUM(amount),
+                  SUM(CASE WHEN payment_type != 'Membership' THEN amount ELSE 0 END)
+           FROM payments WHERE id >= ? AND member_id IS NOT NULL GROUP BY member_id
+       )
+       WHERE member_id IN (SELECT id FROM members)
+       GROUP BY member_id"""
+
+# Recomputes member_stats from scratch; used by the migration and for repairs
+MEMBER_STATS_REBUILD = [
+    "DELETE FROM member_stats",
+    """INSERT INTO member_stats (member_id, visit_count, paid_visit_count, first_visit,
+                                 last_visit, lifetime_paid, additional_paid)"""
+    + MEMBER_STATS_AGGREGATE.replace('?', '0'),
+]
+
+# Versioned schema migrations, applied in order by init_database. Each entry
+# is (user_version, statements); never edit a released entry, append a new one
+SCHEMA_MIGRATIONS = [
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_visits_visit_date ON visits (visit_date)",
+        "CREATE INDEX IF NOT EXISTS idx_visits_member_date ON visits (member_id, visit_date)",
+        "CREATE INDEX IF NOT EXISTS idx_members_status_end_date ON members (status, end_date)",
+        "CREATE INDEX IF NOT EXISTS idx_members_registration_date ON members (registration_date)",
+    ]),
+    (2, [
+        # Link visit payments to their visit so deleting the visit can remove them
+        "ALTER TABLE payments ADD COLUMN visit_id INTEGER REFERENCES visits (id)",
+        "CREATE INDEX IF NOT EXISTS idx_payments_payment_date ON payments (payment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_payments_member_date ON payments (member_id, payment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_payments_visit_id ON payments (visit_id)",
+        # Backfill the ledger from the registration fees and visit payments recorded so far
+        """INSERT INTO payments (member_id, amount, payment_method, payment_date, payment_type, notes)
+           SELECT id, amount_paid, COALESCE(payment_method, 'Cash'),
+                  COALESCE(registration_date, CURRENT_TIMESTAMP), 'Membership', 'Registration'
+           FROM members WHERE amount_paid > 0""",
+        """INSERT INTO payments (member_id, visit_id, amount, payment_method, payment_date,
+                                 payment_type, notes)
+           SELECT member_id, id, payment_amount, COALESCE(payment_method, 'None'),
+                  COALESCE(visit_date, CURRENT_TIMESTAMP), 'Visit', notes
+           FROM visits
+           WHERE payment_amount > 0 AND COALESCE(notes, '') NOT LIKE 'Membership renewal%'""",
+        # Renewals used to be stored as fake visits; keep the fee, drop the visit, so they
+        # never count as attendance. daily_stats and member_stats are built after this
+        """INSERT INTO payments (member_id, amount, payment_method, payment_date, payment_type, notes)
+           SELECT member_id, payment_amount, COALESCE(payment_method, 'None'),
+                  COALESCE(visit_date, CURRENT_TIMESTAMP), 'Renewal', notes
+           FROM visits WHERE payment_amount > 0 AND notes LIKE 'Membership renewal%'""",
+        "DELETE FROM visits WHERE notes LIKE 'Membership renewal%'",
+    ]),
+    (3, [
+        """CREATE TABLE IF NOT EXISTS daily_stats (
+               day TEXT NOT NULL,
+               payment_method TEXT NOT NULL,
+               visit_count INTEGER NOT NULL DEFAULT 0,
+               paying_visits INTEGER NOT NULL DEFAULT 0,
+               revenue REAL NOT NULL DEFAULT 0,
+               PRIMARY KEY (day, payment_method)
+           ) WITHOUT ROWID""",
+    ] + list(DAILY_STATS_TRIGGERS.values()) + DAILY_STATS_REBUILD),
+    (4, [
+        # Prefix search for the member pickers' type-ahead
+        "CREATE INDEX IF NOT EXISTS idx_members_status_name ON members (status, name COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_members_status_phone ON members (status, phone)",
+    ]),
+    (5, [
+        """CREATE TABLE IF NOT EXISTS member_stats (
+               member_id INTEGER PRIMARY KEY,
+               visit_count INTEGER NOT NULL DEFAULT 0,
+               paid_visit_count INTEGER NOT NULL DEFAULT 0,
+               first_visit TIMESTAMP,
+               last_visit TIMESTAMP,
+               lifetime_paid REAL NOT NULL DEFAULT 0,
+               additional_paid REAL NOT NULL DEFAULT 0
+           )""",
+        # At-risk and inactive members are found by how long ago they last came
+        "CREATE INDEX IF NOT EXISTS idx_member_stats_last_visit ON member_stats (last_visit)",
+    ] + list(MEMBER_STATS_TRIGGERS.values()) + MEMBER_STATS_REBUILD),
+]
+
+# Labels shown in reports for each payments.payment_type
+PAYMENT_TYPE_LABELS = {
+    'Membership': 'Membership Fee',
+    'Visit': 'Visit Payment',
+    'Renewal': 'Renewal',
+}
+
+
+def day_range(first_day, last_day=None):
+    """Return half-open [start, end) timestamp bounds covering whole days.
+    
+    Comparing the raw timestamp column against these bounds lets SQLite use
+    an index, unlike wrapping the column in date() or strftime().
+    """
+    if isinstance(first_day, str):
+        first_day = datetime.strptime(first_day, '%Y-%m-%d')
+    if last_day is None:
+        last_day = first_day
+    elif isinstance(last_day, str):
+        last_day = datetime.strptime(last_day, '%Y-%m-%d')
+    
+    start = first_day.strftime('%Y-%m-%d 00:00:00')
+    end = (last_day + timedelta(days=1)).strftime('%Y-%m-%d 00:00:00')
+    return start, end
+
+
+# One timed operation: kind is 'sql' or 'stage', name the statement or stage,
+# rows the number fetched (None for stages and statements returning nothing)
+OperationTiming = namedtuple('OperationTiming', ['kind', 'name', 'rows', 'seconds', 'thread', 'at'])
+
+
+class Instrumentation:
+    """Records how long SQL statements and refresh stages take.
+    
+    Off by default. While enabled, statements run on timed connections (see
+    connect_database) and stage() blocks are recorded. The most recent
+    operations are kept in memory for the debug panel, and each one can
+    also be appended to a JSON Lines log, tagged with host and process id
+    so logs from several terminals can be merged.
+    """
+    
+    def __init__(self, history=2000):
+        self.enabled = False
+        self.recent = deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.log_file = None
+        self.log_path = None
+        self.log_threshold = 0.0
+        self.origin = {'host': socket.gethostname(), 'pid': os.getpid()}
+    
+    def enable(self, log_path=None, log_threshold_ms=0.0):
+        """Start recording; with log_path, also append operations slower than the threshold"""
+        with self.lock:
+            if log_path and log_path != self.log_path:
+                if self.log_file:
+                    self.log_file.close()
+                self.log_file = open(log_path, 'a', buffering=1, encoding='utf-8')
+                self.log_path = log_path
+            self.log_threshold = log_threshold_ms / 1000
+            self.enabled = True
+    
+    def disable(self):
+        """Stop recording; the log stays open for when recording resumes"""
+        self.enabled = False
+    
+    def record(self, kind, name, seconds, rows=None):
+        """Keep one timed operation and log it if it is slow enough"""
+        if not self.enabled:
+            return
+        operation = OperationTiming(kind, name, rows, seconds, threading.current_thread().name,
+                                    time.time())
+        with self.lock:
+            self.recent.append(operation)
+            if self.log_file and seconds >= self.log_threshold:
+                entry = dict(self.origin, at=datetime.fromtimestamp(operation.at).isoformat(),
+                             kind=kind, name=name, rows=rows, ms=round(seconds * 1000, 3),
+                             thread=operation.thread)
+                self.log_file.write(json.dumps(entry) + "\n")
+    
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as a stage"""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record('stage', name, time.perf_counter() - started)
+    
+    def timed(self, function):
+        """Decorator recording each call of function as a stage named after it"""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            with self.stage(function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    
+    def slowest(self, count=50, kind=None):
+        """The slowest recent operations, optionally of one kind"""
+        with self.lock:
+            operations = [op for op in self.recent if kind is None or op.kind == kind]
+        operations.sort(key=lambda op: op.seconds, reverse=True)
+        return operations[:count]
+    
+    def clear(self):
+        with self.lock:
+            self.recent.clear()
+
+
+instrumentation = Instrumentation()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement's wall time and row count to instrumentation.
+    
+    A query is reported once its rows are exhausted, the cursor is reused
+    or closed; time spent in fetches counts towards the statement.
+    """
+    
+    pending = None  # [sql, rows, seconds] of a query whose rows are still being read
+    
+    def execute(self, sql, parameters=()):
+        self.report()
+        if not instrumentation.enabled:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self.pending = [sql, 0, time.perf_counter() - started]
+        if self.description is None:
+            # Nothing to fetch: report the rows the statement changed
+            self.pending[1] = max(self.rowcount, 0)
+            self.report()
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        self.report()
+        if not instrumentation.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        instrumentation.record('sql', " ".join(sql.split()), time.perf_counter() - started,
+                               self.rowcount)
+        return self
+    
+    def fetchone(self):
+        return self.timed_fetch(super().fetchone, 1)
+    
+    def fetchmany(self, size=None):
+        return self.timed_fetch(lambda: super(TimedCursor, self).fetchmany(size or self.arraysize),
+                                size or self.arraysize)
+    
+    def fetchall(self):
+        return self.timed_fetch(super().fetchall, None)
+    
+    def timed_fetch(self, fetch, wanted):
+        if self.pending is None:
+            return fetch()
+        started = time.perf_counter()
+        result = fetch()
+        self.pending[2] += time.perf_counter() - started
+        if wanted == 1:
+            got = 0 if result is None else 1
+        else:
+            got = len(result)
+        self.pending[1] += got
+        # Fewer rows than asked for means the statement is done
+        if wanted is None or got < wanted:
+            self.report()
+        return result
+    
+    def report(self):
+        """Record the pending query, if any"""
+        if self.pending is not None:
+            sql, rows, seconds = self.pending
+            self.pending = None
+            instrumentation.record('sql', " ".join(sql.split()), seconds, rows)
+    
+    def close(self):
+        self.report()
+        super().close()
+    
+    def __del__(self):
+        self.report()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors, including those of execute(), are TimedCursors"""
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect_database(path=DB_PATH, readonly=False, timed=None, **kwargs):
+    """Open a tuned SQLite connection to the gym database.
+    
+    WAL lets readers on other connections, threads or terminals keep going
+    while one of them writes; busy_timeout makes a writer wait for the lock
+    instead of failing straight away. Readonly connections refuse writes.
+    Timed connections report to instrumentation whenever it is enabled;
+    by default a connection is timed if instrumentation is enabled now.
+    """
+    if timed or (timed is None and instrumentation.enabled):
+        kwargs.setdefault('factory', TimedConnection)
+    kwargs.setdefault('timeout', 5.0)
+    conn = sqlite3.connect(path, **kwargs)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA cache_size = -65536")  # 64 MiB
+    conn.execute("PRAGMA mmap_size = 268435456")  # 256 MiB
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def init_schema(conn):
+    """Create all required tables and apply pending migrations.
+    
+    Returns whether the full-text member search index is available.
+    """
+    cursor = conn.cursor()
+    
+    # Members table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT,
+            email TEXT,
+            address TEXT,
+            membership_type TEXT,
+            start_date DATE,
+            end_date DATE,
+            amount_paid REAL,
+            payment_method TEXT DEFAULT 'Cash',
+            status TEXT DEFAULT 'Active',
+            registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Visits table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS visits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            member_id INTEGER,
+            visit_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            payment_amount REAL DEFAULT 0,
+            payment_method TEXT DEFAULT 'None',
+            notes TEXT,
+            FOREIGN KEY (member_id) REFERENCES members (id)
+        )
+    ''')
+    
+    # Payments table for detailed tracking
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            member_id INTEGER,
+            amount REAL NOT NULL,
+            payment_method TEXT NOT NULL,
+            payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            payment_type TEXT DEFAULT 'Membership',
+            notes TEXT,
+            FOREIGN KEY (member_id) REFERENCES members (id)
+        )
+    ''')
+    
+    search_index_available = init_search_index(cursor)
+    
+    conn.commit()
+    
+    migrate_schema(conn)
+    return search_index_available
+
+
+def init_search_index(cursor):
+    """Create the trigram full-text index used by member search.
+    
+    Returns False when this SQLite build cannot provide it.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'members_fts'")
+    exists = cursor.fetchone() is not None
+    
+    try:
+        # External-content table: the text lives in members, only the index is stored
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5(
+                name, phone, email,
+                content='members', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5 or older than 3.34: search falls back to LIKE
+        return False
+    
+    # Keep the index in sync with every write to members
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS members_fts_insert AFTER INSERT ON members BEGIN
+            INSERT INTO members_fts (rowid, name, phone, email)
+            VALUES (new.id, new.name, new.phone, new.email);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS members_fts_delete AFTER DELETE ON members BEGIN
+            INSERT INTO members_fts (members_fts, rowid, name, phone, email)
+            VALUES ('delete', old.id, old.name, old.phone, old.email);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS members_fts_update AFTER UPDATE OF name, phone, email ON members BEGIN
+            INSERT INTO members_fts (members_fts, rowid, name, phone, email)
+            VALUES ('delete', old.id, old.name, old.phone, old.email);
+            INSERT INTO members_fts (rowid, name, phone, email)
+            VALUES (new.id, new.name, new.phone, new.email);
+        END
+    ''')
+    
+    if not exists:
+        # Index the members that were added before the index existed
+        cursor.execute("INSERT INTO members_fts (members_fts) VALUES ('rebuild')")
+    
+    return True
+
+
+def migrate_schema(conn):
+    """Apply every schema migration newer than the database's user_version"""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    current_version = cursor.fetchone()[0]
+    
+    for version, statements in SCHEMA_MIGRATIONS:
+        if version <= current_version:
+            continue
+        
+        # Each migration and its version bump commit atomically
+        try:
+            cursor.execute("BEGIN")
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("PRAGMA user_version = {:d}".format(version))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+
+def record_payment(cursor, member_id, amount, payment_method, payment_type,
+                   notes=None, visit_id=None):
+    """Append a money movement to the payments ledger and return its id"""
+    cursor.execute("""
+        INSERT INTO payments (member_id, visit_id, amount, payment_method, payment_type, notes)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (member_id, visit_id, amount, payment_method, payment_type, notes))
+    return cursor.lastrowid
+
+
+def rebuild_daily_stats(conn):
+    """Recompute the daily_stats rollup from visits and payments"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        for statement in DAILY_STATS_REBUILD:
+            cursor.execute(statement)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def rebuild_member_stats(conn):
+    """Recompute the per-member visit and payment totals from visits and payments"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        for statement in MEMBER_STATS_REBUILD:
+            cursor.execute(statement)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def validate_member(name, phone, email, address, membership_type, start_date, end_date,
+                    amount, payment_method, status):
+    """Apply MemberDialog's rules to member fields and return the row to store.
+    
+    Raises ValueError with the message the dialog would show.
+    """
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("Name is required!")
+    
+    if amount is None or not str(amount).strip():
+        raise ValueError("Amount paid is required!")
+    try:
+        amount = float(amount)
+    except ValueError:
+        raise ValueError("Please enter a valid amount!")
+    
+    for value in (start_date, end_date):
+        # fromisoformat is much cheaper than strptime for bulk imports
+        try:
+            if len(value) != 10:
+                raise ValueError
+            datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError("Please enter a valid date!")
+    
+    membership_type = membership_type or "Monthly"
+    payment_method = payment_method or "Cash"
+    status = status or "Active"
+    if membership_type not in MEMBERSHIP_TYPES:
+        raise ValueError("Unknown membership type: {}".format(membership_type))
+    if payment_method not in PAYMENT_METHODS:
+        raise ValueError("Unknown payment method: {}".format(payment_method))
+    if status not in MEMBER_STATUSES:
+        raise ValueError("Unknown status: {}".format(status))
+    
+    return (
+        name,
+        (phone or "").strip() or None,
+        (email or "").strip() or None,
+        (address or "").strip() or None,
+        membership_type,
+        start_date,
+        end_date,
+        amount,
+        payment_method,
+        status
+    )
+
+
+def validate_visit(member_id, payment_amount, payment_method, notes):
+    """Apply record_visit's rules to visit fields and return the row to store.
+    
+    Raises ValueError with the message the visits form would show.
+    """
+    if member_id in (None, ""):
+        raise ValueError("Please select a member!")
+    
+    amount = 0
+    if payment_amount not in (None, ""):
+        try:
+            amount = float(payment_amount)
+        except ValueError:
+            raise ValueError("Please enter a valid payment amount!")
+    
+    payment_method = payment_method or "None"
+    if payment_method != "None" and payment_method not in PAYMENT_METHODS:
+        raise ValueError("Unknown payment method: {}".format(payment_method))
+    
+    return int(member_id), amount, payment_method, notes or ""
+
+
+def iter_records(path):
+    """Yield (line number, dict) records from a CSV, JSON Lines or JSON array file"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == '.csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        elif extension in ('.jsonl', '.ndjson'):
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+        elif extension == '.json':
+            for index, record in enumerate(json.load(f), 1):
+                yield index, record
+        else:
+            raise ValueError("Unsupported import format: {}".format(extension))
+
+
+def parse_timestamp(value):
+    """Normalise an imported timestamp to the 'YYYY-MM-DD HH:MM:SS' form SQLite writes"""
+    if not value:
+        return None
+    if len(value) == 19 and value[10] == ' ':
+        datetime.fromisoformat(value)  # Validate without reformatting
+        return value
+    return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def catch_up_derived_tables(cursor, first_member_id, first_visit_id, first_payment_id):
+    """Bring trigger-maintained tables up to date with rows bulk-inserted without triggers"""
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'members_fts'").fetchone():
+        cursor.execute("""
+            INSERT INTO members_fts (rowid, name, phone, email)
+            SELECT id, name, phone, email FROM members WHERE id >= ?
+        """, (first_member_id,))
+    
+    cursor.execute("""
+        INSERT INTO daily_stats (day, payment_method, visit_count, paying_visits)
+        SELECT COALESCE(substr(visit_date, 1, 10), date('now')), COALESCE(payment_method, 'None'),
+               COUNT(*), SUM(payment_amount > 0)
+        FROM visits WHERE id >= ? GROUP BY 1, 2
+        ON CONFLICT (day, payment_method) DO UPDATE SET
+            visit_count = visit_count + excluded.visit_count,
+            paying_visits = paying_visits + excluded.paying_visits
+    """, (first_visit_id,))
+    cursor.execute("""
+        INSERT INTO daily_stats (day, payment_method, revenue)
+        SELECT COALESCE(substr(payment_date, 1, 10), date('now')), payment_method, SUM(amount)
+        FROM payments WHERE id >= ? GROUP BY 1, 2
+        ON CONFLICT (day, payment_method) DO UPDATE SET revenue = revenue + excluded.revenue
+    """, (first_payment_id,))
+    
+    cursor.execute("""
+        INSERT INTO member_stats (member_id, visit_count, paid_visit_count, first_visit,
+                                  last_visit, lifetime_paid, additional_paid)
+        {}
+        ON CONFLICT (member_id) DO UPDATE SET
+            visit_count = visit_count + excluded.visit_count,
+            paid_visit_count = paid_visit_count + excluded.paid_visit_count,
+            first_visit = CASE WHEN first_visit IS NULL OR excluded.first_visit < first_visit
+                               THEN excluded.first_visit ELSE first_visit END,
+            last_visit = CASE WHEN last_visit IS NULL OR excluded.last_visit > last_visit
+                              THEN excluded.last_visit ELSE last_visit END,
+            lifetime_paid = lifetime_paid + excluded.lifetime_paid,
+            additional_paid = additional_paid + excluded.additional_paid
+    """.format(MEMBER_STATS_AGGREGATE), (first_visit_id, first_payment_id))
+
+
+def next_row_ids(cursor):
+    """Return the first id the next row of members, visits and payments will get"""
+    first_ids = []
+    for table in ('members', 'visits', 'payments'):
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM {}".format(table))
+        first_ids.append(cursor.fetchone()[0])
+    return first_ids
+
+
+def record_imported_payments(cursor, first_member_id, first_visit_id):
+    """Add ledger entries for the money on members and visits inserted from the given ids on"""
+    cursor.execute("""
+        INSERT INTO payments (member_id, amount, payment_method, payment_date, payment_type, notes)
+        SELECT id, amount_paid, payment_method, registration_date, 'Membership', 'Registration'
+        FROM members WHERE id >= ? AND amount_paid > 0
+    """, (first_member_id,))
+    cursor.execute("""
+        INSERT INTO payments (member_id, visit_id, amount, payment_method, payment_date,
+                              payment_type, notes)
+        SELECT member_id, id, payment_amount, payment_method, visit_date, 'Visit', notes
+        FROM visits WHERE id >= ? AND payment_amount > 0
+    """, (first_visit_id,))
+
+
+def commit_batch(conn, kind, batch):
+    """Insert one batch and its ledger entries in a transaction of its own.
+    
+    Triggers keep the search index and rollups current as the rows go in,
+    and the write lock is held only for this batch.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        first_member_id, first_visit_id, _ = next_row_ids(cursor)
+        import_batch(cursor, kind, batch)
+        record_imported_payments(cursor, first_member_id, first_visit_id)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def import_records(conn, kind, path, batch_size=5000, progress=None, max_errors=20,
+                   exclusive=False):
+    """Bulk import members or visits from a CSV, JSON Lines or JSON file.
+    
+    path may also be an iterable of (line number, record dict) pairs, as
+    yielded by iter_records(), for records generated in memory.
+    
+    Rows are validated with the same rules as the dialogs and inserted with
+    executemany in batches. Normally each batch commits on its own with
+    triggers and indexes in place, so other terminals and the API can write
+    between batches; if the import fails, the batches committed before it
+    stay. Into an empty database, or with exclusive set, the whole file is
+    one transaction that holds the write lock until it ends: triggers and
+    secondary indexes are dropped for the duration and the derived tables
+    are caught up set-wise at the end, so the cost does not grow with every
+    row. Invalid rows are skipped and reported.
+    progress, if given, is called with the number of rows imported so far.
+    """
+    if kind not in ('members', 'visits'):
+        raise ValueError("Can only import members or visits, not {}".format(kind))
+    
+    started = time.monotonic()
+    cursor = conn.cursor()
+    imported = rejected = 0
+    errors = []
+    
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            SELECT EXISTS (SELECT 1 FROM members) OR EXISTS (SELECT 1 FROM visits)
+                   OR EXISTS (SELECT 1 FROM payments)
+        """)
+        bulk = exclusive or not cursor.fetchone()[0]
+        
+        if bulk:
+            first_ids = next_row_ids(cursor)
+            
+            # Defer trigger and index maintenance until every row is in
+            cursor.execute("""
+                SELECT type, name, sql FROM sqlite_master
+                WHERE type IN ('trigger', 'index') AND sql IS NOT NULL
+                  AND tbl_name IN ('members', 'visits', 'payments')
+            """)
+            deferred = cursor.fetchall()
+            for object_type, name, sql in deferred:
+                cursor.execute("DROP {} {}".format(object_type.upper(), name))
+        else:
+            conn.rollback()
+        
+        if kind == 'visits':
+            cursor.execute("SELECT id FROM members")
+            member_ids = {row[0] for row in cursor.fetchall()}
+        
+        def write(batch):
+            if bulk:
+                import_batch(cursor, kind, batch)
+            else:
+                commit_batch(conn, kind, batch)
+        
+        batch = []
+        records = iter_records(path) if isinstance(path, str) else path
+        for line_number, record in records:
+            try:
+                if kind == 'members':
+                    batch.append(validate_member(
+                        record.get('name'), record.get('phone'), record.get('email'),
+                        record.get('address'), record.get('membership_type'),
+                        record.get('start_date'), record.get('end_date'),
+                        record.get('amount_paid'), record.get('payment_method'),
+                        record.get('status')
+                    ) + (parse_timestamp(record.get('registration_date')),))
+                else:
+                    visit = validate_visit(record.get('member_id'), record.get('payment_amount'),
+                                           record.get('payment_method'), record.get('notes'))
+                    if visit[0] not in member_ids:
+                        raise ValueError("Unknown member id: {}".format(visit[0]))
+                    batch.append(visit + (parse_timestamp(record.get('visit_date')),))
+            except (ValueError, TypeError) as e:
+                rejected += 1
+                if len(errors) < max_errors:
+                    errors.append((line_number, str(e)))
+                continue
+            
+            if len(batch) >= batch_size:
+                write(batch)
+                imported += len(batch)
+                batch = []
+                if progress:
+                    progress(imported)
+        
+        if batch:
+            write(batch)
+            imported += len(batch)
+        
+        if bulk:
+            # Ledger entries for the imported money, then everything derived from them
+            record_imported_payments(cursor, first_ids[0], first_ids[1])
+            for object_type, name, sql in deferred:
+                cursor.execute(sql)
+            catch_up_derived_tables(cursor, *first_ids)
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    
+    if progress:
+        progress(imported)
+    return ImportResult(kind, imported, rejected, errors, time.monotonic() - started)
+
+
+# Exportable datasets: the query, whether it takes a date range, and its
+# columns as (name, type) with type one of 'int', 'real' or 'text'
+EXPORTS = {
+    'members': {
+        'sql': """
+            SELECT id, name, phone, email, address, membership_type, start_date, end_date,
+                   amount_paid, payment_method, status, registration_date
+            FROM members WHERE registration_date >= ? AND registration_date < ?
+            ORDER BY id
+        """,
+        'columns': [('id', 'int'), ('name', 'text'), ('phone', 'text'), ('email', 'text'),
+                    ('address', 'text'), ('membership_type', 'text'), ('start_date', 'text'),
+                    ('end_date', 'text'), ('amount_paid', 'real'), ('payment_method', 'text'),
+                    ('status', 'text'), ('registration_date', 'text')],
+    },
+    'visits': {
+        'sql': """
+            SELECT v.id, v.visit_date, v.member_id, m.name, v.payment_amount, v.payment_method, v.notes
+            FROM visits v
+            LEFT JOIN members m ON v.member_id = m.id
+            WHERE v.visit_date >= ? AND v.visit_date < ?
+            ORDER BY v.visit_date, v.id
+        """,
+        'columns': [('id', 'int'), ('visit_date', 'text'), ('member_id', 'int'),
+                    ('member_name', 'text'), ('payment_amount', 'real'),
+                    ('payment_method', 'text'), ('notes', 'text')],
+    },
+    'payments': {
+        'sql': """
+            SELECT p.id, p.payment_date, p.member_id, m.name, p.amount, p.payment_method,
+                   p.payment_type, p.notes, p.visit_id
+            FROM payments p
+            LEFT JOIN members m ON p.member_id = m.id
+            WHERE p.payment_date >= ? AND p.payment_date < ?
+            ORDER BY p.payment_date, p.id
+        """,
+        'columns': [('id', 'int'), ('payment_date', 'text'), ('member_id', 'int'),
+                    ('member_name', 'text'), ('amount', 'real'), ('payment_method', 'text'),
+                    ('payment_type', 'text'), ('notes', 'text'), ('visit_id', 'int')],
+    },
+}
+
+EXPORT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.xlsx': 'xlsx', '.parquet': 'parquet'}
+
+
+class CsvExportWriter:
+    """Writes rows to a CSV file with a header line"""
+    
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, _ in columns])
+    
+    def write(self, rows):
+        self.writer.writerows(rows)
+    
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesExportWriter:
+    """Writes one JSON object per row"""
+    
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.names = [name for name, _ in columns]
+    
+    def write(self, rows):
+        self.file.writelines(json.dumps(dict(zip(self.names, row)), ensure_ascii=False) + '\n'
+                             for row in rows)
+    
+    def close(self):
+        self.file.close()
+
+
+class XlsxExportWriter:
+    """Writes rows to a single worksheet using openpyxl's write-only mode"""
+    
+    def __init__(self, path, columns):
+        try:
+            import openpyxl
+        except ImportError:
+            raise RuntimeError("XLSX export needs openpyxl (pip install openpyxl)")
+        self.path = path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append([name for name, _ in columns])
+    
+    def write(self, rows):
+        for row in rows:
+            self.sheet.append(row)
+    
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class ParquetExportWriter:
+    """Writes each batch of rows as a Parquet row group"""
+    
+    TYPES = {'int': 'int64', 'real': 'float64', 'text': 'string'}
+    
+    def __init__(self, path, columns):
+        # Imported here, not at module level, so the CLI starts without loading it
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([(name, self.TYPES[kind]) for name, kind in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+    
+    def write(self, rows):
+        columns = [list(column) for column in zip(*rows)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema))
+    
+    def close(self):
+        self.writer.close()
+
+
+EXPORT_WRITERS = {
+    'csv': CsvExportWriter,
+    'jsonl': JsonLinesExportWriter,
+    'xlsx': XlsxExportWriter,
+    'parquet': ParquetExportWriter,
+}
+
+
+def export_records(conn, kind, path, date_from=None, date_to=None, batch_size=5000, progress=None):
+    """Stream a dataset from the database to a CSV, JSON Lines, XLSX or Parquet file.
+    
+    The format follows the file extension. Rows go from the cursor to the
+    writer batch_size at a time, so memory use does not depend on the size
+    of the export. date_from/date_to ('YYYY-MM-DD', inclusive) limit the
+    rows by registration, visit or payment date. progress, if given, is
+    called with the number of rows written so far. Returns that count.
+    """
+    if kind not in EXPORTS:
+        raise ValueError("Can only export {}, not {}".format(", ".join(EXPORTS), kind))
+    export_format = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if export_format is None:
+        raise ValueError("Unsupported export format: {}".format(os.path.splitext(path)[1]))
+    
+    range_start, range_end = day_range(date_from or '0001-01-01', date_to or '9998-12-31')
+    cursor = conn.cursor()
+    cursor.execute(EXPORTS[kind]['sql'], (range_start, range_end))
+    
+    writer = EXPORT_WRITERS[export_format](path, EXPORTS[kind]['columns'])
+    written = 0
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            writer.write(rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+    except BaseException:
+        # Don't leave a truncated file that looks like a complete export
+        writer.close()
+        os.remove(path)
+        raise
+    finally:
+        cursor.close()
+    writer.close()
+    return written
+
+
+def import_batch(cursor, kind, batch):
+    """Insert one batch of validated rows; NULL timestamps get the column default"""
+    if kind == 'members':
+        cursor.executemany("""
+            INSERT INTO members (name, phone, email, address, membership_type, start_date,
+                                 end_date, amount_paid, payment_method, status, registration_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        """, batch)
+    else:
+        cursor.executemany("""
+            INSERT INTO visits (member_id, payment_amount, payment_method, notes, visit_date)
+            VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        """, batch)
+
+
+class DashboardMetrics:
+    """Computes every dashboard KPI in two aggregate queries and caches the result.
+    
+    The metric cards and the report statistics read the same snapshot, which
+    is reused for ttl seconds or until invalidate() is called after a write.
+    """
+    
+    def __init__(self, conn, ttl=5.0):
+        self.conn = conn
+        self.ttl = ttl
+        self.cached = None
+        self.cached_at = 0.0
+    
+    def invalidate(self):
+        """Drop the cached snapshot so the next read recomputes it"""
+        self.cached = None
+    
+    def fresh(self):
+        """Return the cached snapshot if it is still valid, otherwise None"""
+        if self.cached is not None and time.monotonic() - self.cached_at <= self.ttl:
+            return self.cached
+        return None
+    
+    def store(self, metrics):
+        """Cache a snapshot computed elsewhere, e.g. on the query worker"""
+        self.cached = metrics
+        self.cached_at = time.monotonic()
+    
+    def snapshot(self):
+        """Return the current metrics, recomputing them if the cache is stale"""
+        metrics = self.fresh()
+        if metrics is None:
+            metrics = self.compute()
+            self.store(metrics)
+        return metrics
+    
+    def compute(self, conn=None):
+        """Run the aggregate queries and return a dict of metrics"""
+        cursor = (conn or self.conn).cursor()
+        next_week = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
+        
+        cursor.execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(status = 'Active'), 0),
+                   COALESCE(SUM(status = 'Active' AND end_date >= date('now')
+                                AND end_date <= ?), 0),
+                   COALESCE(SUM(status = 'Active' AND end_date < date('now')), 0)
+            FROM members
+        """, (next_week,))
+        total, active, expiring, expired = cursor.fetchone()
+        
+        # Revenue and visit counts are summed from the daily rollup, not raw rows
+        today = datetime.now().strftime('%Y-%m-%d')
+        cursor.execute("""
+            SELECT COALESCE(SUM(revenue), 0),
+                   COALESCE(SUM(CASE WHEN day = ? THEN revenue END), 0),
+                   COALESCE(SUM(CASE WHEN day >= date('now', 'start of month')
+                                      AND day < date('now', 'start of month', '+1 month')
+                                     THEN revenue END), 0),
+                   COALESCE(SUM(CASE WHEN day = ? THEN visit_count END), 0),
+                   COALESCE(SUM(CASE WHEN day >= date('now', '-30 days')
+                                     THEN visit_count END), 0)
+            FROM daily_stats
+        """, (today, today))
+        (total_revenue, today_revenue, month_revenue,
+         today_visits, recent_visits) = cursor.fetchone()
+        
+        return {
+            'total_members': total,
+            'active_members': active,
+            'expiring_members': expiring,
+            'expired_members': expired,
+            'total_revenue': self.as_float(total_revenue),
+            'today_revenue': self.as_float(today_revenue),
+            'month_revenue': self.as_float(month_revenue),
+            'today_visits': today_visits,
+            'avg_visits': recent_visits / 30,
+            'retention_rate': (active / total * 100) if total > 0 else 0,
+        }
+    
+    @staticmethod
+    def as_float(value):
+        """Coerce a SQL SUM that may hold text amounts to a float"""
+        try:
+            return float(value or 0)
+        except (ValueError, TypeError):
+            return 0.0
+
+
+# Months of membership bought by each type; a Daily membership lasts one day
+MEMBERSHIP_MONTHS = {"Monthly": 1, "Quarterly": 3, "Half-yearly": 6, "Yearly": 12}
+
+# Members flagged on the Expiry Alerts tab: expired ones and those with up to
+# this many days left
+EXPIRY_WARNING_DAYS = 7
+
+# One row of the expiry alerts; level is 'EXPIRED', 'URGENT' or 'WARNING'
+ExpiryAlert = namedtuple('ExpiryAlert', ['member_id', 'name', 'phone', 'email', 'end_date',
+                                         'days_left', 'level'])
+
+
+def add_months(day, months):
+    """Add calendar months to a date, clamping to the end of shorter months"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month,
+                       day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def membership_end_date(start, membership_type):
+    """Return the end date of a membership of the given type starting on start"""
+    if membership_type == "Daily":
+        return start + timedelta(days=1)
+    return add_months(start, MEMBERSHIP_MONTHS.get(membership_type, 1))
+
+
+def renewal_end_date(current_end, membership_type, today=None):
+    """Return the end date after renewing: from the current end date or today, whichever is later"""
+    start = today or date.today()
+    if current_end:
+        start = max(start, datetime.strptime(current_end, '%Y-%m-%d').date())
+    return membership_end_date(start, membership_type)
+
+
+def save_member_record(conn, data, member_id=None):
+    """Insert a new member or update an existing one and commit.
+    
+    data is the tuple returned by validate_member(). The registration fee is
+    kept in the payments ledger. Returns (member_id, action, payment_action,
+    payment_id): payment_action is 'insert' or 'update' when the ledger was
+    written and None when it was left alone, and payment_id is the id of an
+    inserted fee.
+    """
+    amount, payment_method = data[7], data[8]
+    cursor = conn.cursor()
+    
+    if member_id:
+        cursor.execute("""
+            UPDATE members SET name=?, phone=?, email=?, address=?, 
+            membership_type=?, start_date=?, end_date=?, amount_paid=?,
+            payment_method=?, status=?
+            WHERE id=?
+        """, data + (member_id,))
+        action = 'update'
+        
+        # Keep the ledger's registration fee in line with the corrected amount,
+        # touching it only if the amount or method actually changed
+        cursor.execute("""
+            UPDATE payments SET amount=?, payment_method=?
+            WHERE member_id=? AND payment_type='Membership'
+              AND (amount IS NOT ? OR payment_method IS NOT ?)
+        """, (amount, payment_method, member_id, amount, payment_method))
+        payment_action, payment_id = ('update' if cursor.rowcount else None), None
+        if payment_action is None and amount > 0:
+            cursor.execute("""
+                SELECT 1 FROM payments WHERE member_id=? AND payment_type='Membership'
+            """, (member_id,))
+            if cursor.fetchone() is None:
+                payment_action = 'insert'
+                payment_id = record_payment(cursor, member_id, amount, payment_method,
+                                            'Membership', 'Registration')
+    else:
+        cursor.execute("""
+            INSERT INTO members (name, phone, email, address, membership_type, 
+            start_date, end_date, amount_paid, payment_method, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, data)
+        member_id, action = cursor.lastrowid, 'insert'
+        
+        # Record the registration fee in the payments ledger
+        payment_action, payment_id = None, None
+        if amount > 0:
+            payment_action = 'insert'
+            payment_id = record_payment(cursor, member_id, amount, payment_method,
+                                        'Membership', 'Registration')
+    
+    conn.commit()
+    return member_id, action, payment_action, payment_id
+
+
+def delete_member_record(conn, member_id):
+    """Delete a member with their visits and payments and commit"""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM payments WHERE member_id = ?", (member_id,))
+    cursor.execute("DELETE FROM visits WHERE member_id = ?", (member_id,))
+    cursor.execute("DELETE FROM members WHERE id = ?", (member_id,))
+    conn.commit()
+
+
+def insert_visit(cursor, member_id, payment_amount=None, payment_method="None", notes=""):
+    """Validate and insert a visit and its ledger payment without committing.
+    
+    Raises ValueError, before writing anything, for invalid input or an
+    unknown member. Returns (visit_id, payment_id), with payment_id None for
+    an unpaid visit.
+    """
+    member_id, payment_amount, payment_method, notes = validate_visit(
+        member_id, payment_amount, payment_method, notes)
+    
+    cursor.execute("SELECT 1 FROM members WHERE id = ?", (member_id,))
+    if cursor.fetchone() is None:
+        raise ValueError("Unknown member id: {}".format(member_id))
+    
+    cursor.execute("""
+        INSERT INTO visits (member_id, payment_amount, payment_method, notes)
+        VALUES (?, ?, ?, ?)
+    """, (member_id, payment_amount, payment_method, notes))
+    visit_id = cursor.lastrowid
+    
+    payment_id = None
+    if payment_amount > 0:
+        payment_id = record_payment(cursor, member_id, payment_amount, payment_method,
+                                    'Visit', notes or None, visit_id)
+    return visit_id, payment_id
+
+
+def check_in(conn, member_id, payment_amount=None, payment_method="None", notes=""):
+    """Record a visit, and its payment in the ledger, and commit.
+    
+    See insert_visit() for the arguments and return value.
+    """
+    result = insert_visit(conn.cursor(), member_id, payment_amount, payment_method, notes)
+    conn.commit()
+    return result
+
+
+class VisitWriteQueue:
+    """Write-behind queue that commits check-ins in groups.
+    
+    submit() validates a visit and queues it; a writer thread with its own
+    connection inserts everything that queued up while it was busy and
+    commits it as one transaction of at most max_rows visits, so a burst of
+    check-ins costs one commit instead of one each. With max_delay set, the
+    writer also lingers up to that many seconds after the first visit of a
+    group for more to arrive, trading latency for fewer, larger commits on
+    disks where each commit is expensive. Each submit() returns a Future for
+    (visit_id, payment_id), or for the ValueError if the member does not
+    exist.
+    
+    flush() waits until everything submitted so far is committed; close()
+    flushes and stops the writer, and must be called before exiting so no
+    queued visit is lost.
+    """
+    
+    _FLUSH = object()
+    _STOP = object()
+    
+    def __init__(self, path=DB_PATH, max_rows=500, max_delay=0.0):
+        self.conn = connect_database(path, check_same_thread=False)
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.pending = queue.Queue()
+        self.batches = self.rows = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name='visit-writer', daemon=True)
+        self.thread.start()
+    
+    def submit(self, member_id, payment_amount=None, payment_method="None", notes=""):
+        """Validate and queue a visit; raises ValueError for invalid input"""
+        if self.closed:
+            raise RuntimeError("Visit queue is closed")
+        visit = validate_visit(member_id, payment_amount, payment_method, notes)
+        future = Future()
+        self.pending.put((visit, future))
+        return future
+    
+    def flush(self, timeout=None):
+        """Commit everything submitted so far and wait for it"""
+        done = threading.Event()
+        self.pending.put((self._FLUSH, done))
+        return done.wait(timeout)
+    
+    def close(self):
+        """Commit what is queued, then stop the writer and close its connection"""
+        if self.closed:
+            return
+        self.closed = True
+        self.pending.put((self._STOP, None))
+        self.thread.join()
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def run(self):
+        """Writer thread: gather a group, write it in one transaction, repeat"""
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            item = self.pending.get()
+            deadline = time.monotonic() + self.max_delay
+            
+            while True:
+                visit, future = item
+                if visit is self._STOP:
+                    stopping = True
+                    break
+                if visit is self._FLUSH:
+                    waiters.append(future)
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_rows:
+                    break
+                try:
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        item = self.pending.get(timeout=remaining)
+                    else:
+                        item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+            
+            if batch:
+                self.write(batch)
+            for done in waiters:
+                done.set()
+    
+    def write(self, batch):
+        """Insert a group of visits in one transaction and resolve their futures"""
+        cursor = self.conn.cursor()
+        results = []
+        try:
+            for visit, future in batch:
+                try:
+                    results.append((future, insert_visit(cursor, *visit), None))
+                except ValueError as e:
+                    # Rejected before anything was written, so the group carries on
+                    results.append((future, None, e))
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            results = [(future, None, e) for _, future in batch]
+        
+        self.batches += 1
+        for future, result, error in results:
+            if error is None:
+                self.rows += 1
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+def resolve_member(conn, reference):
+    """Return (id, name, membership_type, end_date, status) for a member id, phone number or exact name.
+    
+    Raises LookupError if no member, or more than one, matches.
+    """
+    cursor = conn.cursor()
+    columns = "SELECT id, name, membership_type, end_date, status FROM members"
+    reference = str(reference).strip()
+    
+    if reference.isdigit():
+        cursor.execute(columns + " WHERE id = ?", (int(reference),))
+        member = cursor.fetchone()
+        if member:
+            return member
+    
+    for condition in ("phone = ?", "name = ? COLLATE NOCASE"):
+        cursor.execute(columns + " WHERE " + condition + " LIMIT 2", (reference,))
+        matches = cursor.fetchall()
+        if len(matches) == 1:
+            return matches[0]
+        if len(matches) > 1:
+            raise LookupError("More than one member matches {!r}; use the member id".format(reference))
+    
+    raise LookupError("No member matches {!r}".format(reference))
+
+
+def search_members(conn, prefix, limit=20):
+    """Active members whose name (ignoring case) or phone starts with prefix.
+    
+    Each arm is a range scan of its (status, column) index, so the cost
+    depends on limit, not on the number of members. Returns (id, name,
+    phone) rows ordered by name.
+    """
+    prefix = prefix.strip()
+    if not prefix:
+        return []
+    # U+10FFFF sorts after every character, closing the range just past the prefix
+    upper = prefix + '\U0010ffff'
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, name, phone FROM (
+            SELECT id, name, phone FROM members
+            WHERE status = 'Active' AND name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ?
+            ORDER BY name COLLATE NOCASE LIMIT ?
+        )
+        UNION
+        SELECT id, name, phone FROM (
+            SELECT id, name, phone FROM members
+            WHERE status = 'Active' AND phone >= ? AND phone < ?
+            ORDER BY phone LIMIT ?
+        )
+        ORDER BY 2 COLLATE NOCASE, 1
+        LIMIT ?
+    """, (prefix, upper, limit, prefix, upper, limit, limit))
+    return cursor.fetchall()
+
+
+def member_page(conn, where="1", params=(), after=None, limit=200):
+    """Return a page of the members matching where, newest registration first.
+    
+    Rows are (id, name, phone, email, membership_type, start_date, end_date,
+    status, registration_date). after is the (registration_date, id) of the
+    last row already loaded; the page continues strictly after it, so every
+    page is one range of the registration_date index.
+    """
+    params = list(params)
+    if after is not None:
+        where = "({}) AND (registration_date, id) < (?, ?)".format(where)
+        params.extend(after)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, name, phone, email, membership_type,
+               start_date, end_date, status, registration_date
+        FROM members WHERE {}
+        ORDER BY registration_date DESC, id DESC
+        LIMIT ?
+    """.format(where), params + [limit])
+    return cursor.fetchall()
+
+
+def delete_visit_record(conn, visit_id):
+    """Delete a visit and the payment recorded with it and commit.
+    
+    Returns (member_id, payment_ids, visit_date), or None if there was no
+    such visit.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT member_id, visit_date FROM visits WHERE id = ?", (visit_id,))
+    visit = cursor.fetchone()
+    cursor.execute("SELECT id FROM payments WHERE visit_id = ?", (visit_id,))
+    payment_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("DELETE FROM payments WHERE visit_id = ?", (visit_id,))
+    cursor.execute("DELETE FROM visits WHERE id = ?", (visit_id,))
+    conn.commit()
+    
+    return (visit[0], payment_ids, visit[1]) if visit else None
+
+
+def renew_member(conn, member_id, membership_type, new_end_date, amount, payment_method):
+    """Extend a membership, record the renewal fee in the ledger and commit.
+    
+    Raises ValueError with the message the renewal dialog would show.
+    Returns the ledger id of the renewal payment.
+    """
+    if amount is None or not str(amount).strip():
+        raise ValueError("Renewal amount is required!")
+    try:
+        amount = float(amount)
+    except ValueError:
+        raise ValueError("Please enter a valid amount!")
+    if membership_type not in MEMBERSHIP_TYPES:
+        raise ValueError("Unknown membership type: {}".format(membership_type))
+    if payment_method not in PAYMENT_METHODS:
+        raise ValueError("Unknown payment method: {}".format(payment_method))
+    # Stored end dates are compared as text, so anything but YYYY-MM-DD would sort wrongly
+    try:
+        new_end_date = date.fromisoformat(str(new_end_date)).isoformat()
+    except ValueError:
+        raise ValueError("Please enter a valid end date (YYYY-MM-DD)!")
+    
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE members SET 
+            end_date = ?,
+            membership_type = ?,
+            status = 'Active'
+        WHERE id = ?
+    """, (new_end_date, membership_type, member_id))
+    if cursor.rowcount == 0:
+        conn.rollback()
+        raise ValueError("Unknown member id: {}".format(member_id))
+    
+    payment_id = record_payment(cursor, member_id, amount, payment_method, 'Renewal',
+                                f"Membership renewal - {membership_type}")
+    conn.commit()
+    return payment_id
+
+
+@functools.lru_cache(maxsize=8192)
+def date_ordinal(value):
+    """Return the day number of a 'YYYY-MM-DD' string; each distinct date is parsed once"""
+    return date.fromisoformat(value).toordinal()
+
+
+def expiry_level(days_left):
+    """Classify days left on a membership as 'EXPIRED', 'URGENT' or 'WARNING'"""
+    if days_left < 0:
+        return 'EXPIRED'
+    elif days_left <= 3:
+        return 'URGENT'
+    return 'WARNING'
+
+
+class ExpiryAlertIndex:
+    """Active members that have expired or expire within EXPIRY_WARNING_DAYS, bucketed by end date.
+    
+    Buckets are keyed by the end date's day number, so the days left and
+    alert level of a whole bucket follow from one subtraction against today
+    and nothing is parsed when alerts are listed or counted. Members enter
+    and leave through update()/discard() as they are edited, renewed or
+    deleted; rollover() moves today forward and pulls in the members whose
+    end date has come inside the warning window.
+    
+    days_left keeps the alerts tab's original meaning, whole days from now
+    to the start of the end date: a membership ending tomorrow has 0 days left.
+    """
+    
+    def __init__(self, today=None):
+        self.today = (today or date.today()).toordinal()
+        self.buckets = {}  # end day number -> {member_id: (name, phone, email, end_date)}
+        self.member_days = {}  # member_id -> end day number
+    
+    @property
+    def horizon(self):
+        """Last end date, as a day number, that raises an alert"""
+        return self.today + EXPIRY_WARNING_DAYS
+    
+    def load(self, conn):
+        """Rebuild the index from the members table"""
+        self.buckets.clear()
+        self.member_days.clear()
+        self.add_rows(conn, "end_date <= ?", (date.fromordinal(self.horizon).isoformat(),))
+    
+    def add_rows(self, conn, condition, params):
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, name, phone, email, end_date
+            FROM members
+            WHERE status = 'Active' AND {}
+            ORDER BY end_date
+        """.format(condition), params)
+        for member_id, name, phone, email, end_date in cursor.fetchall():
+            self.update(member_id, name, phone, email, end_date, 'Active')
+    
+    def update(self, member_id, name, phone, email, end_date, status):
+        """Index a member's current details, dropping them if they no longer raise an alert"""
+        self.discard(member_id)
+        if status != 'Active' or not end_date:
+            return
+        try:
+            day = date_ordinal(end_date)
+        except ValueError:
+            return
+        if day <= self.horizon:
+            self.buckets.setdefault(day, {})[member_id] = (name, phone, email, end_date)
+            self.member_days[member_id] = day
+    
+    def discard(self, member_id):
+        """Remove a member, e.g. after deletion"""
+        day = self.member_days.pop(member_id, None)
+        if day is not None:
+            bucket = self.buckets[day]
+            del bucket[member_id]
+            if not bucket:
+                del self.buckets[day]
+    
+    def refresh_member(self, conn, member_id):
+        """Re-read one member after it changed and re-index it"""
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, phone, email, end_date, status FROM members WHERE id = ?",
+                       (member_id,))
+        member = cursor.fetchone()
+        if member:
+            self.update(member_id, *member)
+        else:
+            self.discard(member_id)
+    
+    def rollover(self, conn, today=None):
+        """Advance to a new day, adding members whose end date entered the warning window"""
+        today = (today or date.today()).toordinal()
+        if today < self.today:
+            # The clock went backwards; buckets past the new horizon must go
+            self.today = today
+            self.load(conn)
+            return
+        
+        old_horizon, self.today = self.horizon, today
+        if self.horizon > old_horizon:
+            self.add_rows(conn, "end_date > ? AND end_date <= ?",
+                          (date.fromordinal(old_horizon).isoformat(),
+                           date.fromordinal(self.horizon).isoformat()))
+    
+    def counts(self):
+        """Return {level: member count}, touching each bucket once"""
+        counts = {'EXPIRED': 0, 'URGENT': 0, 'WARNING': 0}
+        for day, bucket in self.buckets.items():
+            counts[expiry_level(day - self.today - 1)] += len(bucket)
+        return counts
+    
+    def alerts(self):
+        """Return every alert as an ExpiryAlert, ordered by end date"""
+        alerts = []
+        for day in sorted(self.buckets):
+            days_left = day - self.today - 1
+            level = expiry_level(days_left)
+            for member_id, (name, phone, email, end_date) in self.buckets[day].items():
+                alerts.append(ExpiryAlert(member_id, name, phone, email, end_date, days_left, level))
+        return alerts
+
+
+def expiry_alerts(conn, today=None):
+    """Return active members that have expired or expire within EXPIRY_WARNING_DAYS.
+    
+    One-off form of ExpiryAlertIndex for the command line and API.
+    """
+    index = ExpiryAlertIndex(today)
+    index.load(conn)
+    return index.alerts()
+
+
+def payment_report(conn, date_from, date_to):
+    """Summarise the payments ledger for the days date_from to date_to inclusive.
+    
+    Returns a dict with the payment count, total revenue and per-method and
+    per-type (count, amount) breakdowns.
+    """
+    range_start, range_end = day_range(date_from, date_to)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT payment_method, payment_type, COUNT(*), COALESCE(SUM(amount), 0)
+        FROM payments
+        WHERE payment_date >= ? AND payment_date < ?
+        GROUP BY payment_method, payment_type
+    """, (range_start, range_end))
+    
+    by_method, by_type = {}, {}
+    for payment_method, payment_type, count, amount in cursor.fetchall():
+        amount = DashboardMetrics.as_float(amount)
+        for totals, key in ((by_method, payment_method), (by_type, payment_type)):
+            previous_count, previous_amount = totals.get(key, (0, 0.0))
+            totals[key] = (previous_count + count, previous_amount + amount)
+    
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'count': sum(count for count, _ in by_method.values()),
+        'total': sum(amount for _, amount in by_method.values()),
+        'by_method': by_method,
+        'by_type': by_type,
+    }
+
+
+def payment_history_page(conn, range_start, range_end, after=None, limit=500):
+    """Return up to limit ledger rows in [range_start, range_end), newest first.
+    
+    Rows are (payment_date, member name, amount, method, type, notes, id).
+    after is the (payment_date, id) of the last row already shown; each page
+    is its own short query, so no cursor is left holding a read snapshot.
+    """
+    sql = """
+        SELECT p.payment_date, m.name, p.amount, p.payment_method, p.payment_type, p.notes, p.id
+        FROM payments p
+        LEFT JOIN members m ON p.member_id = m.id
+    """
+    if after is None:
+        sql += " WHERE p.payment_date >= ? AND p.payment_date < ?"
+        params = [range_start, range_end]
+    else:
+        # The plain bound lets the index seek straight to the page; the row
+        # value only skips rows of the same second already shown
+        sql += """ WHERE p.payment_date >= ? AND p.payment_date <= ?
+                     AND (p.payment_date, p.id) < (?, ?)"""
+        params = [range_start, after[0], after[0], after[1]]
+    cursor = conn.cursor()
+    cursor.execute(sql + " ORDER BY p.payment_date DESC, p.id DESC LIMIT ?", params + [limit])
+    return cursor.fetchall()
+
+
+def payment_totals(conn, date_from, date_to):
+    """Return (payment count, revenue) for the days date_from to date_to inclusive.
+    
+    The count is read from the payment_date index and the revenue from
+    daily_stats, so neither touches the payment rows themselves.
+    """
+    range_start, range_end = day_range(date_from, date_to)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM payments WHERE payment_date >= ? AND payment_date < ?",
+                   (range_start, range_end))
+    count = cursor.fetchone()[0]
+    cursor.execute("SELECT COALESCE(SUM(revenue), 0) FROM daily_stats WHERE day >= ? AND day <= ?",
+                   (date_from, date_to))
+    return count, cursor.fetchone()[0]
+
+
+def revenue_by_method(conn, day=None):
+    """Return {payment method: revenue} for one day, today by default, from daily_stats"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT payment_method, COALESCE(SUM(revenue), 0) FROM daily_stats
+        WHERE day = ?
+        GROUP BY payment_method
+    """, ((day or date.today()).isoformat(),))
+    return dict(cursor.fetchall())
+
+
+def recent_activity(conn, limit=10):
+    """Return today's latest visits, registrations and renewals, newest first.
+    
+    Rows are (type, member name, timestamp, amount, payment method), with
+    type 'Visit', 'Registration' or 'Renewal'.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT 'Visit' as type, m.name, v.visit_date, v.payment_amount, v.payment_method
+        FROM visits v
+        JOIN members m ON v.member_id = m.id
+        WHERE v.visit_date >= date('now') AND v.visit_date < date('now', '+1 day')
+        UNION ALL
+        SELECT 'Registration' as type, name, registration_date, amount_paid, payment_method
+        FROM members
+        WHERE registration_date >= date('now') AND registration_date < date('now', '+1 day')
+        UNION ALL
+        SELECT 'Renewal' as type, m.name, p.payment_date, p.amount, p.payment_method
+        FROM payments p
+        JOIN members m ON p.member_id = m.id
+        WHERE p.payment_type = 'Renewal'
+          AND p.payment_date >= date('now') AND p.payment_date < date('now', '+1 day')
+        ORDER BY 3 DESC
+        LIMIT ?
+    """, (limit,))
+    return cursor.fetchall()
+
+
+def member_report(conn, member_id, limit=20, offset=0):
+    """Gather one member's profile, totals and a page of their visit timeline.
+    
+    Counts and totals come from member_stats and the recent visit counts from
+    an index range; only limit visits, newest first and skipping offset, are
+    read. Raises LookupError for an unknown id.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, name, phone, email, address, membership_type, start_date, end_date,
+               amount_paid, payment_method, status, registration_date
+        FROM members WHERE id = ?
+    """, (member_id,))
+    member = cursor.fetchone()
+    if not member:
+        raise LookupError("No member with id {}".format(member_id))
+    
+    report = dict(zip(('id', 'name', 'phone', 'email', 'address', 'membership_type', 'start_date',
+                       'end_date', 'amount_paid', 'payment_method', 'status', 'registration_date'),
+                      member))
+    report['amount_paid'] = DashboardMetrics.as_float(report['amount_paid'])
+    
+    # Totals come from member_stats; a member without visits or payments has no row
+    cursor.execute("""
+        SELECT visit_count, paid_visit_count, first_visit, last_visit, lifetime_paid, additional_paid
+        FROM member_stats WHERE member_id = ?
+    """, (member_id,))
+    (report['visit_count'], report['paid_visit_count'], report['first_visit'], report['last_visit'],
+     lifetime_paid, additional_paid) = cursor.fetchone() or (0, 0, None, None, 0, 0)
+    report['lifetime_paid'] = DashboardMetrics.as_float(lifetime_paid)
+    report['additional_payments'] = DashboardMetrics.as_float(additional_paid)
+    report['average_gap'] = average_visit_gap(report['first_visit'], report['last_visit'],
+                                              report['visit_count'])
+    report['visits_30d'], report['visits_90d'] = recent_visit_counts(cursor, [member_id])[member_id]
+    
+    cursor.execute("""
+        SELECT visit_date, payment_amount, payment_method, notes
+        FROM visits
+        WHERE member_id = ?
+        ORDER BY visit_date DESC, id DESC
+        LIMIT ? OFFSET ?
+    """, (member_id, limit, offset))
+    report['visits'] = cursor.fetchall()
+    report['offset'] = offset
+    report['limit'] = limit
+    return report
+
+
+# Days without a visit after which a member with a current membership is at
+# risk of dropping out, and after which they count as inactive
+AT_RISK_DAYS = 14
+INACTIVE_DAYS = 30
+
+ENGAGEMENT_LEVELS = ['AT RISK', 'INACTIVE']
+
+# Sort orders for member_engagement(); never-visited members sort as the most absent
+ENGAGEMENT_ORDERS = {
+    'absent': "s.last_visit, m.id",
+    'paid': "COALESCE(s.lifetime_paid, 0) DESC, m.id",
+    'visits': "COALESCE(s.visit_count, 0) DESC, m.id",
+}
+
+# One row of the at-risk and inactive members view; average_gap is in days,
+# days_absent None for a member who never visited
+MemberEngagement = namedtuple('MemberEngagement', [
+    'member_id', 'name', 'phone', 'end_date', 'level', 'days_absent', 'last_visit',
+    'visit_count', 'visits_30d', 'visits_90d', 'average_gap', 'lifetime_paid'])
+
+
+def average_visit_gap(first_visit, last_visit, visit_count):
+    """Mean days between consecutive visits: the first-to-last span over the gaps in it"""
+    if visit_count < 2 or not first_visit or not last_visit:
+        return None
+    try:
+        span = datetime.fromisoformat(last_visit) - datetime.fromisoformat(first_visit)
+    except ValueError:
+        return None
+    return span.total_seconds() / 86400 / (visit_count - 1)
+
+
+def recent_visit_counts(cursor, member_ids, today=None):
+    """Return {member_id: (visits in the last 30 days, in the last 90 days)} for the given members.
+    
+    Windows that slide with the date cannot be kept by triggers; each member
+    costs one range of idx_visits_member_date instead.
+    """
+    today = today or date.today()
+    member_ids = list(member_ids)
+    counts = {member_id: (0, 0) for member_id in member_ids}
+    if not member_ids:
+        return counts
+    cursor.execute("""
+        SELECT member_id, COUNT(CASE WHEN visit_date >= ? THEN 1 END), COUNT(*)
+        FROM visits WHERE member_id IN ({}) AND visit_date >= ?
+        GROUP BY member_id
+    """.format(",".join("?" * len(member_ids))),
+        [(today - timedelta(days=29)).isoformat()] + member_ids
+        + [(today - timedelta(days=89)).isoformat()])
+    for member_id, last_30, last_90 in cursor.fetchall():
+        counts[member_id] = (last_30, last_90)
+    return counts
+
+
+def visited_since(conn, member_id, since, other_than=None):
+    """Whether member_id has a visit at or after since, ignoring visit other_than"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT 1 FROM visits WHERE member_id = ? AND visit_date >= ? AND id IS NOT ? LIMIT 1
+    """, (member_id, since, other_than))
+    return cursor.fetchone() is not None
+
+
+def engagement_condition(level=None, today=None):
+    """Return a members WHERE clause and parameters selecting at-risk and/or inactive members.
+    
+    Only Active members with a current membership qualify; level is 'AT RISK',
+    'INACTIVE' or None for both. The test reads member_stats through its
+    last_visit index instead of scanning visits.
+    """
+    today = today or date.today()
+    at_risk_since = (today - timedelta(days=AT_RISK_DAYS - 1)).isoformat()
+    inactive_since = (today - timedelta(days=INACTIVE_DAYS - 1)).isoformat()
+    sql = "status = 'Active' AND end_date >= ? AND "
+    
+    if level == 'AT RISK':
+        sql += "id IN (SELECT member_id FROM member_stats WHERE last_visit >= ? AND last_visit < ?)"
+        return sql, [today.isoformat(), inactive_since, at_risk_since]
+    if level not in (None, 'INACTIVE'):
+        raise ValueError("Unknown engagement level: {}".format(level))
+    
+    # Members who never visited have no last_visit, so they count as absent too
+    sql += "id NOT IN (SELECT member_id FROM member_stats WHERE last_visit >= ?)"
+    return sql, [today.isoformat(), inactive_since if level == 'INACTIVE' else at_risk_since]
+
+
+def member_engagement(conn, level=None, order='absent', limit=500, today=None):
+    """List members who have stopped coming, most absent first by default.
+    
+    Returns (total, rows) where total counts every matching member and rows
+    holds up to limit MemberEngagement entries sorted by ENGAGEMENT_ORDERS[order].
+    """
+    today = today or date.today()
+    where, params = engagement_condition(level, today)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM members WHERE {}".format(where), params)
+    total = cursor.fetchone()[0]
+    
+    cursor.execute("""
+        SELECT m.id, m.name, m.phone, m.end_date, s.visit_count, s.first_visit, s.last_visit,
+               s.lifetime_paid
+        FROM members m LEFT JOIN member_stats s ON s.member_id = m.id
+        WHERE {}
+        ORDER BY {}
+        LIMIT ?
+    """.format(where, ENGAGEMENT_ORDERS[order]), params + [limit])
+    
+    members = cursor.fetchall()
+    recent = recent_visit_counts(cursor, [member[0] for member in members], today)
+    
+    rows = []
+    for member_id, name, phone, end_date, visit_count, first_visit, last_visit, paid in members:
+        days_absent = None
+        if last_visit:
+            days_absent = today.toordinal() - date_ordinal(last_visit[:10])
+        level_name = ('AT RISK' if days_absent is not None and days_absent < INACTIVE_DAYS
+                      else 'INACTIVE')
+        visits_30d, visits_90d = recent[member_id]
+        rows.append(MemberEngagement(
+            member_id, name, phone, end_date, level_name, days_absent, last_visit,
+            visit_count or 0, visits_30d, visits_90d,
+            average_visit_gap(first_visit, last_visit, visit_count or 0),
+            DashboardMetrics.as_float(paid)))
+    return total, rows
+
+
+# Weeks shown in a member's attendance calendar: a year, plus the current week
+CALENDAR_WEEKS = 53
+
+# A member's attendance in whole days. Streaks count consecutive weeks, Monday
+# to Sunday, with at least one visit; the current streak is still alive while
+# this week or last week has a visit. Gaps are days between visit days
+AttendanceSummary = namedtuple('AttendanceSummary', [
+    'visits', 'visit_days', 'days_since_last', 'current_streak', 'longest_streak',
+    'longest_gap', 'longest_gap_ended'])
+
+
+class AttendanceCache:
+    """Each member's visit days as a sorted array('I') of day numbers, read on first use.
+    
+    A member's days are read once from their range of idx_visits_member_date
+    and then cost 4 bytes a visit; record() and discard() keep a cached
+    member in step with check-ins and deletions, so calendars, streaks and
+    gaps never go back to the visits table. The least recently used members
+    are dropped beyond maxsize. The GUI and the query worker share one
+    cache, so every method takes the lock.
+    """
+    
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.members = OrderedDict()  # member_id -> array('I') of day numbers, oldest first
+        self.loading = {}  # member_id being read -> whether a visit changed meanwhile
+        self.lock = threading.Lock()
+    
+    def days(self, conn, member_id):
+        """Return a member's visit days, one entry per visit, reading them if not cached"""
+        with self.lock:
+            days = self.members.get(member_id)
+            if days is not None:
+                self.members.move_to_end(member_id)
+                return days
+            self.loading[member_id] = False
+        
+        cursor = conn.cursor()
+        cursor.execute("SELECT visit_date FROM visits WHERE member_id = ? ORDER BY visit_date",
+                       (member_id,))
+        days = array('I', (date_ordinal(visit_date[:10]) for visit_date, in cursor if visit_date))
+        
+        with self.lock:
+            # A visit recorded or deleted during the read may be missing; read again next time
+            if self.loading.pop(member_id, True):
+                return days
+            self.members[member_id] = days
+            while len(self.members) > self.maxsize:
+                self.members.popitem(last=False)
+        return days
+    
+    def record(self, member_id, visit_date):
+        """Add a visit to a cached member; uncached members are read fresh when needed"""
+        with self.lock:
+            if member_id in self.loading:
+                self.loading[member_id] = True
+            days = self.members.get(member_id)
+            if days is not None and visit_date:
+                bisect.insort(days, date_ordinal(visit_date[:10]))
+    
+    def discard(self, member_id, visit_date):
+        """Remove one visit on visit_date from a cached member"""
+        with self.lock:
+            if member_id in self.loading:
+                self.loading[member_id] = True
+            days = self.members.get(member_id)
+            if days is None or not visit_date:
+                return
+            day = date_ordinal(visit_date[:10])
+            index = bisect.bisect_left(days, day)
+            if index < len(days) and days[index] == day:
+                del days[index]
+    
+    def invalidate(self, member_id):
+        """Forget one member, e.g. after they are deleted"""
+        with self.lock:
+            if member_id in self.loading:
+                self.loading[member_id] = True
+            self.members.pop(member_id, None)
+    
+    def clear(self):
+        with self.lock:
+            for member_id in self.loading:
+                self.loading[member_id] = True
+            self.members.clear()
+
+
+def attendance_summary(days, today=None):
+    """Streaks and gaps of a sorted sequence of visit day numbers"""
+    today = (today or date.today()).toordinal()
+    if not days:
+        return AttendanceSummary(0, 0, None, 0, 0, None, None)
+    
+    visit_days = 0
+    longest_gap = longest_gap_ended = None
+    # Day numbers start on a Monday, so (day - 1) // 7 numbers Monday-to-Sunday weeks
+    streak = longest_streak = 0
+    previous_day = previous_week = None
+    for day in days:
+        if day == previous_day:
+            continue
+        visit_days += 1
+        if previous_day is not None and (longest_gap is None or day - previous_day > longest_gap):
+            longest_gap, longest_gap_ended = day - previous_day, day
+        
+        week = (day - 1) // 7
+        if week != previous_week:
+            streak = streak + 1 if previous_week == week - 1 else 1
+            longest_streak = max(longest_streak, streak)
+            previous_week = week
+        previous_day = day
+    
+    current_streak = streak if (today - 1) // 7 - previous_week <= 1 else 0
+    return AttendanceSummary(
+        len(days), visit_days, today - days[-1], current_streak, longest_streak, longest_gap,
+        date.fromordinal(longest_gap_ended).isoformat() if longest_gap_ended else None)
+
+
+def attendance_calendar(days, today=None, weeks=CALENDAR_WEEKS):
+    """Visits per day over the last `weeks` weeks as (first Monday, grid).
+    
+    grid[weekday][week] is the visit count of that day, Monday first, or
+    None for days after today. Only the visits inside the window are looked
+    at, found by bisecting the sorted days.
+    """
+    today = (today or date.today()).toordinal()
+    first_monday = today - (today - 1) % 7 - (weeks - 1) * 7
+    grid = [[0] * weeks for _ in range(7)]
+    for day in days[bisect.bisect_left(days, first_monday):bisect.bisect_right(days, today)]:
+        offset = day - first_monday
+        grid[offset % 7][offset // 7] += 1
+    for day in range(today + 1, first_monday + weeks * 7):
+        offset = day - first_monday
+        grid[offset % 7][offset // 7] = None
+    return date.fromordinal(first_monday), grid
@@ -0,0 +1,112 @@
+"""GymAPI routes and HTTP framing, served from a database in a temporary directory"""
+import os
+import sys
+import json
+import asyncio
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gym_core
+from gym_api import GymAPI
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = str(tmp_path / 'gym.db')
+    conn = gym_core.connect_database(db, timed=False)
+    gym_core.init_schema(conn)
+    gym_core.save_member_record(conn, gym_core.validate_member(
+        "Alice", "0712345678", None, None, "Monthly", "2026-01-01", "2099-12-31", 3000, "Cash",
+        "Active"))
+    conn.close()
+    return db
+
+
+def serve(db, scenario):
+    """Start the API on a free port, run scenario(api) against it and shut it down"""
+    async def run():
+        api = GymAPI(db, readers=2)
+        await api.start('127.0.0.1', 0)
+        try:
+            return await asyncio.wait_for(scenario(api), 10)
+        finally:
+            await api.close()
+    return asyncio.run(run())
+
+
+def dispatch(db, method, target, body=b''):
+    return serve(db, lambda api: api.dispatch(method, target, body))
+
+
+def test_checkin_records_a_paid_visit(db):
+    status, payload = dispatch(db, 'POST', '/checkin',
+                               b'{"member": "0712345678", "amount": 200, "method": "Cash"}')
+    assert status == 200
+    assert (payload['visit_id'], payload['name'], payload['active']) == (1, "Alice", True)
+    assert payload['payment_id'] is not None
+    
+    conn = gym_core.connect_database(db, readonly=True)
+    try:
+        assert conn.execute("SELECT member_id, payment_amount FROM visits").fetchall() == [(1, 200)]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('method, target, body, status', [
+    ('GET', '/nowhere', b'', 404),
+    ('GET', '/members/Nobody', b'', 404),
+    ('POST', '/checkin', b'{"member": "Nobody"}', 404),
+    ('GET', '/checkin', b'', 405),
+    ('POST', '/expiry', b'', 405),
+    ('POST', '/checkin', b'not json', 400),
+    ('POST', '/checkin', b'[1, 2]', 400),
+    ('POST', '/checkin', b'{"amount": 200}', 400),
+    ('POST', '/checkin', b'{"member": 1, "amount": "lots"}', 400),
+    ('POST', '/renew', b'{"member": 1, "amount": 3000, "until": "soon"}', 400),
+])
+def test_errors_map_to_statuses(db, method, target, body, status):
+    assert dispatch(db, method, target, body)[0] == status
+
+
+async def raw_request(api, request):
+    """Send request bytes to the running server and return (status line, body, closed)"""
+    port = api.server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(request)
+        await writer.drain()
+        status_line = (await reader.readline()).decode().strip()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = json.loads(await reader.readexactly(int(headers['content-length'])))
+        closed = await reader.read() == b''
+        return status_line, body, closed
+    finally:
+        writer.close()
+
+
+@pytest.mark.parametrize('length', ['abc', '-5', '+5', '1e3'])
+def test_unusable_content_length_is_rejected(db, length):
+    request = ("POST /checkin HTTP/1.1\r\nContent-Length: {}\r\n\r\n"
+               '{{"member": 1}}'.format(length)).encode()
+    status_line, body, closed = serve(db, lambda api: raw_request(api, request))
+    assert status_line == "HTTP/1.1 400 Bad Request"
+    assert body == {'error': "Invalid Content-Length"}
+    assert closed
+
+
+def test_request_with_a_body_is_served_over_http(db):
+    data = b'{"member": "Alice"}'
+    request = ("POST /checkin HTTP/1.1\r\nContent-Length: {}\r\nConnection: close\r\n\r\n"
+               .format(len(data))).encode() + data
+    status_line, body, _ = serve(db, lambda api: raw_request(api, request))
+    assert status_line == "HTTP/1.1 200 OK"
+    assert body['visit_id'] == 1
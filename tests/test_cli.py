@@ -0,0 +1,108 @@
+"""gym_cli commands run through main() against a database in a temporary directory"""
+import os
+import sys
+import csv
+import json
+from datetime import date, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gym_cli
+import gym_core
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Path of a database holding the members imported from a CSV file"""
+    today = date.today()
+    path = tmp_path / 'members.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'phone', 'membership_type', 'start_date', 'end_date',
+                         'amount_paid', 'payment_method'])
+        writer.writerow(['Alice', '0712345678', 'Monthly', (today - timedelta(days=28)).isoformat(),
+                         (today + timedelta(days=2)).isoformat(), '3000', 'Cash'])
+        writer.writerow(['Bob', '0723456789', 'Quarterly', today.isoformat(),
+                         (today + timedelta(days=90)).isoformat(), '8000', 'M-Pesa'])
+    
+    db = str(tmp_path / 'gym.db')
+    assert gym_cli.main(['import', 'members', str(path), '--db', db]) == 0
+    return db
+
+
+def run(capsys, *argv):
+    """Run the command line and return (exit code, stdout, stderr)"""
+    code = gym_cli.main(list(argv))
+    out, err = capsys.readouterr()
+    return code, out, err
+
+
+def test_import_reports_rows_and_skips_invalid_ones(tmp_path, capsys):
+    path = tmp_path / 'members.jsonl'
+    path.write_text('{"name": "Carol", "start_date": "2026-01-01", "end_date": "2026-02-01", '
+                    '"amount_paid": "0"}\n{"name": "", "amount_paid": "0"}\n')
+    code, out, _ = run(capsys, 'import', 'members', str(path), '--db', str(tmp_path / 'gym.db'))
+    assert code == 1
+    assert "Imported 1 members" in out
+    assert "row 2: Name is required!" in out
+
+
+def test_checkin_by_phone_records_the_visit_payment(db, capsys):
+    code, out, _ = run(capsys, 'checkin', '0712345678', '--amount', '200', '--method', 'Cash',
+                       '--db', db)
+    assert code == 0
+    assert out.startswith("Checked in Alice (visit 1, paid KSh 200)")
+    
+    code, out, _ = run(capsys, 'report', 'payments', '--json', '--db', db)
+    report = json.loads(out)
+    assert (report['count'], report['total']) == (3, 11200)
+    assert report['by_type']['Visit'] == [1, 200]
+
+
+def test_renew_extends_from_the_current_end_date(db, capsys):
+    code, out, _ = run(capsys, 'renew', 'Alice', '--amount', '3000', '--db', db)
+    end_date = gym_core.renewal_end_date((date.today() + timedelta(days=2)).isoformat(), "Monthly")
+    assert code == 0
+    assert out.strip() == "Renewed Alice (Monthly) until {}".format(end_date.isoformat())
+    
+    code, out, _ = run(capsys, 'expiry', '--json', '--db', db)
+    assert json.loads(out) == []
+
+
+def test_expiry_lists_members_inside_the_warning_window(db, capsys):
+    code, out, _ = run(capsys, 'expiry', '--json', '--db', db)
+    alerts = json.loads(out)
+    assert code == 0
+    assert [(alert['name'], alert['days_left'], alert['level']) for alert in alerts] == [
+        ("Alice", 1, 'URGENT')]
+
+
+def test_export_writes_the_imported_members(db, tmp_path, capsys):
+    path = str(tmp_path / 'export.csv')
+    code, out, _ = run(capsys, 'export', 'members', path, '--db', db)
+    assert code == 0
+    assert "Exported 2 members" in out
+    with open(path, newline='', encoding='utf-8') as f:
+        assert [row['name'] for row in csv.DictReader(f)] == ["Alice", "Bob"]
+
+
+@pytest.mark.parametrize('argv, message', [
+    (['checkin', 'Nobody'], "Error: No member matches 'Nobody'"),
+    (['renew', 'Alice', '--amount', 'lots'], "Error: Please enter a valid amount!"),
+    (['checkin', 'Alice', '--amount', 'x'], "Error: Please enter a valid payment amount!"),
+])
+def test_failures_print_one_line_and_exit_1(db, capsys, argv, message):
+    code, _, err = run(capsys, *argv, '--db', db)
+    assert code == 1
+    assert err.strip() == message
+
+
+def test_read_only_commands_do_not_create_a_database(tmp_path, capsys):
+    db = str(tmp_path / 'missing.db')
+    code, _, err = run(capsys, 'expiry', '--db', db)
+    assert code == 1
+    assert err.strip() == "Error: No database at {}".format(db)
+    assert not os.path.exists(db)
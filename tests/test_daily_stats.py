@@ -0,0 +1,106 @@
+"""The trigger-maintained daily_stats rollup against a rebuild from visits and payments"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gym_core
+
+
+@pytest.fixture
+def conn():
+    conn = gym_core.connect_database(':memory:', timed=False)
+    gym_core.init_schema(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def members(conn):
+    return [gym_core.save_member_record(conn, gym_core.validate_member(
+        name, None, None, None, "Monthly", "2026-01-01", "2026-02-01", amount, "Cash", "Active"))[0]
+        for name, amount in [("Alice", 3000), ("Bob", 0), ("Carol", 2500)]]
+
+
+def rollup(conn):
+    """Return the daily_stats rows that count anything, in key order"""
+    return conn.execute("""
+        SELECT day, payment_method, visit_count, paying_visits, ROUND(revenue, 2) FROM daily_stats
+        WHERE visit_count != 0 OR paying_visits != 0 OR revenue != 0
+        ORDER BY day, payment_method
+    """).fetchall()
+
+
+def assert_matches_rebuild(conn):
+    maintained = rollup(conn)
+    gym_core.rebuild_daily_stats(conn)
+    assert maintained == rollup(conn)
+
+
+def test_check_ins_and_renewals(conn, members):
+    gym_core.check_in(conn, members[0])
+    gym_core.check_in(conn, members[1], 200, "Cash")
+    gym_core.check_in(conn, members[2], 150, "M-Pesa", "Day pass")
+    gym_core.renew_member(conn, members[0], "Monthly", "2026-03-01", 3000, "Card")
+    assert_matches_rebuild(conn)
+
+
+def test_visits_and_payments_moved_to_another_day_or_method(conn, members):
+    visit_id, payment_id = gym_core.check_in(conn, members[0], 200, "Cash")
+    gym_core.check_in(conn, members[1])
+    conn.execute("""
+        UPDATE visits SET visit_date = '2026-01-05 07:30:00', payment_method = 'Card' WHERE id = ?
+    """, (visit_id,))
+    conn.execute("""
+        UPDATE payments SET payment_date = '2026-01-05 07:30:00', payment_method = 'Card',
+                            amount = 250
+        WHERE id = ?
+    """, (payment_id,))
+    conn.commit()
+    gym_core.save_member_record(conn, gym_core.validate_member(
+        "Carol", None, None, None, "Monthly", "2026-01-01", "2026-02-01", 2800, "M-Pesa",
+        "Active"), members[2])
+    assert_matches_rebuild(conn)
+
+
+def test_deleted_visits(conn, members):
+    paid = gym_core.check_in(conn, members[0], 200, "Cash")[0]
+    free = gym_core.check_in(conn, members[0])[0]
+    gym_core.check_in(conn, members[1], 200, "Cash")
+    gym_core.delete_visit_record(conn, paid)
+    gym_core.delete_visit_record(conn, free)
+    assert_matches_rebuild(conn)
+
+
+def test_member_deletion_takes_their_visits_and_payments_out(conn, members):
+    for member_id in members:
+        gym_core.check_in(conn, member_id, 200, "Cash")
+    gym_core.renew_member(conn, members[0], "Monthly", "2026-03-01", 3000, "Cash")
+    gym_core.delete_member_record(conn, members[0])
+    assert_matches_rebuild(conn)
+
+
+@pytest.mark.parametrize('exclusive', [False, True])
+def test_imports_per_batch_and_with_catch_up(conn, members, exclusive):
+    gym_core.check_in(conn, members[0], 200, "Cash")
+    gym_core.import_records(conn, 'members', [
+        (1, {'name': "Dave", 'membership_type': "Monthly", 'start_date': "2026-01-03",
+             'end_date': "2026-02-03", 'amount_paid': "3000", 'payment_method': "M-Pesa",
+             'registration_date': "2026-01-03 10:00:00"}),
+        (2, {'name': "Erin", 'start_date': "2026-01-04", 'end_date': "2026-02-04",
+             'amount_paid': "0"}),
+    ], batch_size=1, exclusive=exclusive)
+    gym_core.import_records(conn, 'visits', [
+        (line_number, {'member_id': member_id, 'payment_amount': amount,
+                       'payment_method': method, 'visit_date': visit_date})
+        for line_number, (member_id, amount, method, visit_date) in enumerate([
+            (members[0], "", "None", "2026-01-03 07:00:00"),
+            (members[1], "200", "Cash", "2026-01-03 08:00:00"),
+            (members[2], "150", "M-Pesa", "2026-01-04 09:00:00"),
+            (members[2], "200", "Cash", None),
+        ], 1)
+    ], batch_size=2, exclusive=exclusive)
+    assert_matches_rebuild(conn)
@@ -0,0 +1,95 @@
+"""ExpiryAlertIndex buckets across day boundaries, renewals and deletions"""
+import os
+import sys
+from datetime import date
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gym_core
+
+TODAY = date(2026, 3, 10)
+
+
+@pytest.fixture
+def conn():
+    conn = gym_core.connect_database(':memory:', timed=False)
+    gym_core.init_schema(conn)
+    conn.executemany("""
+        INSERT INTO members (id, name, membership_type, end_date, status)
+        VALUES (?, ?, 'Monthly', ?, ?)
+    """, [
+        (1, "Lapsed", '2026-03-08', 'Active'),
+        (2, "Tomorrow", '2026-03-11', 'Active'),
+        (3, "Next week", '2026-03-16', 'Active'),
+        (4, "Past the window", '2026-03-18', 'Active'),
+        (5, "Left the gym", '2026-03-09', 'Inactive'),
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def index(conn):
+    index = gym_core.ExpiryAlertIndex(TODAY)
+    index.load(conn)
+    return index
+
+
+def levels(index):
+    """Return {member_id: (days_left, level)} for every alert"""
+    return {alert.member_id: (alert.days_left, alert.level) for alert in index.alerts()}
+
+
+def test_load_buckets_active_members_inside_the_window(index):
+    assert levels(index) == {1: (-3, 'EXPIRED'), 2: (0, 'URGENT'), 3: (5, 'WARNING')}
+    assert index.counts() == {'EXPIRED': 1, 'URGENT': 1, 'WARNING': 1}
+
+
+def test_rollover_ages_buckets_and_pulls_in_the_next_day(conn, index):
+    index.rollover(conn, date(2026, 3, 11))
+    assert levels(index) == {1: (-4, 'EXPIRED'), 2: (-1, 'EXPIRED'), 3: (4, 'WARNING'),
+                             4: (6, 'WARNING')}
+    
+    index.rollover(conn, date(2026, 3, 13))
+    assert levels(index) == {1: (-6, 'EXPIRED'), 2: (-3, 'EXPIRED'), 3: (2, 'URGENT'),
+                             4: (4, 'WARNING')}
+    assert index.counts() == {'EXPIRED': 2, 'URGENT': 1, 'WARNING': 1}
+
+
+def test_rollover_on_the_same_day_changes_nothing(conn, index):
+    before = levels(index)
+    index.rollover(conn, TODAY)
+    assert levels(index) == before
+
+
+def test_clock_going_back_drops_members_past_the_new_window(conn, index):
+    index.rollover(conn, date(2026, 3, 11))
+    index.rollover(conn, TODAY)
+    assert levels(index) == {1: (-3, 'EXPIRED'), 2: (0, 'URGENT'), 3: (5, 'WARNING')}
+
+
+@pytest.mark.parametrize('end_date, expected', [
+    ('2026-04-10', None),
+    ('2026-03-12', (1, 'URGENT')),
+    ('2026-03-15', (4, 'WARNING')),
+])
+def test_renewal_moves_the_member_to_its_new_bucket(conn, index, end_date, expected):
+    gym_core.renew_member(conn, 1, "Monthly", end_date, 3000, "Cash")
+    index.refresh_member(conn, 1)
+    assert levels(index).get(1) == expected
+    assert sum(index.counts().values()) == (3 if expected else 2)
+
+
+def test_deleted_member_leaves_its_bucket(conn, index):
+    gym_core.delete_member_record(conn, 2)
+    index.refresh_member(conn, 2)
+    assert levels(index) == {1: (-3, 'EXPIRED'), 3: (5, 'WARNING')}
+    assert index.counts() == {'EXPIRED': 1, 'URGENT': 0, 'WARNING': 1}
+    
+    index.discard(3)
+    index.discard(3)
+    assert list(levels(index)) == [1]
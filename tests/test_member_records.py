@@ -0,0 +1,63 @@
+"""save_member_record and the registration fee it keeps in the payments ledger"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gym_core
+
+
+@pytest.fixture
+def conn():
+    conn = gym_core.connect_database(':memory:', timed=False)
+    gym_core.init_schema(conn)
+    yield conn
+    conn.close()
+
+
+def member_data(amount, payment_method="Cash", name="Alice"):
+    return gym_core.validate_member(name, "0712345678", "", "", "Monthly", "2026-01-01",
+                                    "2026-02-01", str(amount), payment_method, "Active")
+
+
+def fees(conn):
+    return conn.execute("""
+        SELECT member_id, amount, payment_method FROM payments WHERE payment_type = 'Membership'
+    """).fetchall()
+
+
+def test_new_member_fee_is_inserted(conn):
+    member_id, action, payment_action, payment_id = gym_core.save_member_record(
+        conn, member_data(3000))
+    assert (action, payment_action) == ('insert', 'insert')
+    assert payment_id is not None
+    assert fees(conn) == [(member_id, 3000, 'Cash')]
+
+
+def test_free_registration_leaves_the_ledger_alone(conn):
+    _, _, payment_action, payment_id = gym_core.save_member_record(conn, member_data(0))
+    assert (payment_action, payment_id) == (None, None)
+    assert fees(conn) == []
+
+
+def test_edit_without_fee_change_reports_no_ledger_write(conn):
+    member_id = gym_core.save_member_record(conn, member_data(3000))[0]
+    result = gym_core.save_member_record(conn, member_data(3000, name="Alice W."), member_id)
+    assert result == (member_id, 'update', None, None)
+
+
+def test_corrected_fee_updates_the_ledger_row(conn):
+    member_id = gym_core.save_member_record(conn, member_data(3000))[0]
+    result = gym_core.save_member_record(conn, member_data(3500, "M-Pesa"), member_id)
+    assert result == (member_id, 'update', 'update', None)
+    assert fees(conn) == [(member_id, 3500, 'M-Pesa')]
+
+
+def test_fee_added_later_is_inserted_once(conn):
+    member_id = gym_core.save_member_record(conn, member_data(0))[0]
+    assert gym_core.save_member_record(conn, member_data(3000), member_id)[2] == 'insert'
+    assert gym_core.save_member_record(conn, member_data(3000), member_id)[2] is None
+    assert fees(conn) == [(member_id, 3000, 'Cash')]
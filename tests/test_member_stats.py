@@ -0,0 +1,112 @@
+"""The trigger-maintained member_stats totals against a rebuild from visits and payments"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gym_core
+
+
+@pytest.fixture
+def conn():
+    conn = gym_core.connect_database(':memory:', timed=False)
+    gym_core.init_schema(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def members(conn):
+    return [gym_core.save_member_record(conn, gym_core.validate_member(
+        name, None, None, None, "Monthly", "2026-01-01", "2026-02-01", amount, "Cash", "Active"))[0]
+        for name, amount in [("Alice", 3000), ("Bob", 0), ("Carol", 2500)]]
+
+
+def totals(conn):
+    """Return the member_stats rows that count anything, by member"""
+    return conn.execute("""
+        SELECT member_id, visit_count, paid_visit_count, first_visit, last_visit,
+               ROUND(lifetime_paid, 2), ROUND(additional_paid, 2)
+        FROM member_stats
+        WHERE visit_count != 0 OR paid_visit_count != 0 OR first_visit IS NOT NULL
+              OR last_visit IS NOT NULL OR lifetime_paid != 0 OR additional_paid != 0
+        ORDER BY member_id
+    """).fetchall()
+
+
+def assert_matches_rebuild(conn):
+    maintained = totals(conn)
+    gym_core.rebuild_member_stats(conn)
+    assert maintained == totals(conn)
+
+
+def test_check_ins_and_renewals(conn, members):
+    gym_core.check_in(conn, members[0])
+    gym_core.check_in(conn, members[1], 200, "Cash")
+    gym_core.check_in(conn, members[2], 150, "M-Pesa", "Day pass")
+    gym_core.renew_member(conn, members[0], "Monthly", "2026-03-01", 3000, "Card")
+    assert_matches_rebuild(conn)
+
+
+def test_visits_and_payments_moved_to_another_member(conn, members):
+    visit_id, payment_id = gym_core.check_in(conn, members[0], 200, "Cash")
+    gym_core.check_in(conn, members[0])
+    gym_core.check_in(conn, members[1])
+    conn.execute("""
+        UPDATE visits SET member_id = ?, visit_date = '2025-12-30 07:30:00', payment_amount = 0
+        WHERE id = ?
+    """, (members[1], visit_id))
+    conn.execute("""
+        UPDATE payments SET member_id = ?, amount = 250, payment_type = 'Membership' WHERE id = ?
+    """, (members[2], payment_id))
+    conn.commit()
+    gym_core.save_member_record(conn, gym_core.validate_member(
+        "Carol", None, None, None, "Monthly", "2026-01-01", "2026-02-01", 2800, "M-Pesa",
+        "Active"), members[2])
+    assert_matches_rebuild(conn)
+
+
+def test_deleted_first_last_and_only_visits(conn, members):
+    first = gym_core.check_in(conn, members[0], 200, "Cash")[0]
+    gym_core.check_in(conn, members[0])
+    last = gym_core.check_in(conn, members[0])[0]
+    only = gym_core.check_in(conn, members[1], 200, "Cash")[0]
+    conn.execute("UPDATE visits SET visit_date = '2026-01-02 07:00:00' WHERE id = ?", (first,))
+    conn.commit()
+    for visit_id in (first, last, only):
+        gym_core.delete_visit_record(conn, visit_id)
+    assert_matches_rebuild(conn)
+
+
+def test_member_deletion_takes_their_visits_and_payments_out(conn, members):
+    for member_id in members:
+        gym_core.check_in(conn, member_id, 200, "Cash")
+    gym_core.renew_member(conn, members[0], "Monthly", "2026-03-01", 3000, "Cash")
+    gym_core.delete_member_record(conn, members[0])
+    assert_matches_rebuild(conn)
+
+
+@pytest.mark.parametrize('exclusive', [False, True])
+def test_imports_per_batch_and_with_catch_up(conn, members, exclusive):
+    gym_core.check_in(conn, members[0], 200, "Cash")
+    gym_core.import_records(conn, 'members', [
+        (1, {'name': "Dave", 'membership_type': "Monthly", 'start_date': "2026-01-03",
+             'end_date': "2026-02-03", 'amount_paid': "3000", 'payment_method': "M-Pesa",
+             'registration_date': "2026-01-03 10:00:00"}),
+        (2, {'name': "Erin", 'start_date': "2026-01-04", 'end_date': "2026-02-04",
+             'amount_paid': "0"}),
+    ], batch_size=1, exclusive=exclusive)
+    gym_core.import_records(conn, 'visits', [
+        (line_number, {'member_id': member_id, 'payment_amount': amount,
+                       'payment_method': method, 'visit_date': visit_date})
+        for line_number, (member_id, amount, method, visit_date) in enumerate([
+            (members[0], "", "None", "2026-01-03 07:00:00"),
+            (members[1], "200", "Cash", "2026-01-03 08:00:00"),
+            (members[2], "150", "M-Pesa", "2026-01-04 09:00:00"),
+            (members[2], "200", "Cash", None),
+        ], 1)
+    ], batch_size=2, exclusive=exclusive)
+    assert_matches_rebuild(conn)
@@ -0,0 +1,92 @@
+"""Schema migrations applied to a database created by the original release"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gym_core
+
+# The tables as the first release created them, before any migration
+LEGACY_SCHEMA = """
+    CREATE TABLE members (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT,
+        email TEXT,
+        address TEXT,
+        membership_type TEXT,
+        start_date DATE,
+        end_date DATE,
+        amount_paid REAL,
+        payment_method TEXT DEFAULT 'Cash',
+        status TEXT DEFAULT 'Active',
+        registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE visits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        member_id INTEGER,
+        visit_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        payment_amount REAL DEFAULT 0,
+        payment_method TEXT DEFAULT 'None',
+        notes TEXT,
+        FOREIGN KEY (member_id) REFERENCES members (id)
+    );
+    CREATE TABLE payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        member_id INTEGER,
+        amount REAL NOT NULL,
+        payment_method TEXT NOT NULL,
+        payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        payment_type TEXT DEFAULT 'Membership',
+        notes TEXT,
+        FOREIGN KEY (member_id) REFERENCES members (id)
+    );
+"""
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = gym_core.connect_database(str(tmp_path / 'legacy.db'), timed=False)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("""
+        INSERT INTO members (name, membership_type, end_date, amount_paid, payment_method,
+                             registration_date)
+        VALUES ('Alice', 'Monthly', '2026-12-31', 3000, 'Cash', '2026-01-01 09:00:00')
+    """)
+    conn.executemany("""
+        INSERT INTO visits (member_id, visit_date, payment_amount, payment_method, notes)
+        VALUES (1, ?, ?, ?, ?)
+    """, [
+        ('2026-01-02 07:00:00', 0, 'None', None),
+        ('2026-01-03 07:00:00', 200, 'Cash', ''),
+        ('2026-02-01 10:00:00', 3000, 'M-Pesa', 'Membership renewal - Monthly'),
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_renewal_placeholder_visits_move_to_the_ledger(conn):
+    gym_core.init_schema(conn)
+    
+    visits = conn.execute("SELECT visit_date FROM visits ORDER BY visit_date").fetchall()
+    assert visits == [('2026-01-02 07:00:00',), ('2026-01-03 07:00:00',)]
+    
+    payments = conn.execute("""
+        SELECT payment_type, amount, payment_method, visit_id IS NOT NULL FROM payments ORDER BY id
+    """).fetchall()
+    assert payments == [('Membership', 3000, 'Cash', 0), ('Visit', 200, 'Cash', 1),
+                        ('Renewal', 3000, 'M-Pesa', 0)]
+
+
+def test_renewals_do_not_count_as_attendance(conn):
+    gym_core.init_schema(conn)
+    
+    assert conn.execute("""
+        SELECT visit_count, paid_visit_count, last_visit FROM member_stats WHERE member_id = 1
+    """).fetchone() == (2, 1, '2026-01-03 07:00:00')
+    assert conn.execute("SELECT COALESCE(SUM(visit_count), 0) FROM daily_stats").fetchone() == (2,)
+    assert conn.execute("SELECT COALESCE(SUM(revenue), 0) FROM daily_stats").fetchone() == (6200,)
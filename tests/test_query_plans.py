@@ -0,0 +1,156 @@
+"""EXPLAIN QUERY PLAN checks for the indexed queries.
+
+Each test runs the real gym_core function against an empty in-memory
+database built by init_schema, traces the SQL it sends and asserts that
+SQLite searches the expected index instead of scanning the table. The
+GUI's own queries live in gym_core too, so they are covered the same way.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gym_core
+
+
+@pytest.fixture
+def conn():
+    conn = gym_core.connect_database(':memory:', timed=False)
+    gym_core.init_schema(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def member_id(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO members (name, phone, membership_type, end_date, status, registration_date)
+        VALUES ('Alice', '0712345678', 'Monthly', '2026-12-31', 'Active', '2026-01-01 09:00:00')
+    """)
+    conn.commit()
+    return cursor.lastrowid
+
+
+def traced_plan(conn, fragment, function, *args):
+    """Run function(*args) and return the query plan of the one SELECT it sent containing fragment"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        function(*args)
+    finally:
+        conn.set_trace_callback(None)
+    
+    matches = [statement for statement in statements
+               if statement.lstrip().upper().startswith('SELECT') and fragment in statement]
+    assert len(matches) == 1, "Expected one SELECT containing {!r}, got {}".format(fragment, matches)
+    return query_plan(conn, matches[0])
+
+
+def query_plan(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines of sql joined into one string"""
+    return " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def test_payment_report_searches_payment_date(conn):
+    plan = traced_plan(conn, "FROM payments", gym_core.payment_report, conn, '2026-01-01', '2026-01-31')
+    assert "SEARCH payments USING INDEX idx_payments_payment_date" in plan
+
+
+def test_recent_visit_counts_use_member_date_index(conn):
+    plan = traced_plan(conn, "FROM visits", gym_core.recent_visit_counts, conn.cursor(), [1, 2, 3])
+    assert "SEARCH visits USING COVERING INDEX idx_visits_member_date" in plan
+
+
+def test_member_report_history_uses_member_date_index(conn, member_id):
+    plan = traced_plan(conn, "ORDER BY visit_date DESC", gym_core.member_report, conn, member_id)
+    assert "SEARCH visits USING INDEX idx_visits_member_date" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_attendance_days_use_member_date_index(conn, member_id):
+    plan = traced_plan(conn, "FROM visits", gym_core.AttendanceCache().days, conn, member_id)
+    assert "SEARCH visits USING COVERING INDEX idx_visits_member_date" in plan
+
+
+def test_visit_payments_use_visit_id_index(conn):
+    plan = traced_plan(conn, "FROM payments", gym_core.delete_visit_record, conn, 1)
+    assert "SEARCH payments USING COVERING INDEX idx_payments_visit_id" in plan
+
+
+def test_expiry_alerts_search_status_end_date(conn):
+    plan = traced_plan(conn, "FROM members", gym_core.expiry_alerts, conn)
+    assert "SEARCH members USING INDEX idx_members_status_end_date" in plan
+
+
+@pytest.mark.parametrize('level', ['AT RISK', 'INACTIVE'])
+def test_engagement_reads_member_stats_by_last_visit(conn, level):
+    plan = traced_plan(conn, "SELECT COUNT(*)", gym_core.member_engagement, conn, level)
+    assert "SEARCH members USING COVERING INDEX idx_members_status_end_date" in plan
+    assert "SEARCH member_stats USING COVERING INDEX idx_member_stats_last_visit" in plan
+    assert "SCAN visits" not in plan
+
+
+def test_member_search_uses_prefix_indexes(conn):
+    plan = traced_plan(conn, "FROM members", gym_core.search_members, conn, '07')
+    assert "SEARCH members USING INDEX idx_members_status_name" in plan
+    assert "SEARCH members USING INDEX idx_members_status_phone" in plan
+
+
+@pytest.mark.parametrize('kind, expected', [
+    ('members', "SEARCH members USING INDEX idx_members_registration_date"),
+    ('visits', "SEARCH v USING INDEX idx_visits_visit_date"),
+    ('payments', "SEARCH p USING INDEX idx_payments_payment_date"),
+])
+def test_exports_search_their_date_column(conn, kind, expected):
+    plan = query_plan(conn, gym_core.EXPORTS[kind]['sql'], gym_core.day_range('2026-01-01', '2026-01-31'))
+    assert expected in plan
+
+
+def test_dashboard_counts_members_from_the_covering_index(conn):
+    plan = traced_plan(conn, "FROM members", gym_core.DashboardMetrics(conn).compute)
+    assert "USING COVERING INDEX idx_members_status_end_date" in plan
+
+
+def test_payment_totals_count_from_the_index_and_sum_the_rollup(conn):
+    plans = [traced_plan(conn, fragment, gym_core.payment_totals, conn, '2026-01-01', '2026-01-31')
+             for fragment in ("FROM payments", "FROM daily_stats")]
+    assert "SEARCH payments USING COVERING INDEX idx_payments_payment_date" in plans[0]
+    assert "SEARCH daily_stats USING PRIMARY KEY" in plans[1]
+
+
+def test_payment_summary_reads_one_day_of_the_rollup(conn):
+    plan = traced_plan(conn, "FROM daily_stats", gym_core.revenue_by_method, conn)
+    assert "SEARCH daily_stats USING PRIMARY KEY (day=?)" in plan
+
+
+def test_recent_activity_searches_todays_rows_of_each_table(conn):
+    plan = traced_plan(conn, "FROM visits", gym_core.recent_activity, conn)
+    assert "SEARCH v USING INDEX idx_visits_visit_date" in plan
+    assert "SEARCH members USING INDEX idx_members_registration_date" in plan
+    assert "SEARCH p USING INDEX idx_payments_payment_date" in plan
+
+
+@pytest.mark.parametrize('after', [None, ('2026-01-01 09:00:00', 42)])
+def test_member_pages_walk_the_registration_index(conn, after):
+    plan = traced_plan(conn, "FROM members", gym_core.member_page, conn, "1", (), after)
+    assert "USING INDEX idx_members_registration_date" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.parametrize('after', [None, ('2026-01-15 09:00:00', 42)])
+def test_payment_history_pages_seek_the_payment_date_index(conn, after):
+    plan = traced_plan(conn, "FROM payments", gym_core.payment_history_page,
+                       conn, '2026-01-01 00:00:00', '2026-02-01 00:00:00', after)
+    assert "SEARCH p USING INDEX idx_payments_payment_date" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_recent_visit_check_uses_member_date_index(conn):
+    plan = traced_plan(conn, "FROM visits", gym_core.visited_since, conn, 1, '2026-01-01', 5)
+    assert "SEARCH visits USING COVERING INDEX idx_visits_member_date" in plan
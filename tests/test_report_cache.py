@@ -0,0 +1,58 @@
+"""ReportCache generations: stale renders are dropped, other members' are kept"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+pytest.importorskip('PyQt5')
+
+from gym import ReportCache
+
+
+def test_report_rendered_before_its_member_changed_is_not_stored():
+    cache = ReportCache()
+    generation = cache.generation(1)
+    cache.invalidate(1)
+    cache.put((1, 0), "stale", generation)
+    assert cache.get((1, 0)) is None
+
+
+def test_changes_to_other_members_keep_in_flight_reports():
+    cache = ReportCache()
+    generation = cache.generation(1)
+    cache.invalidate(2)
+    cache.invalidate(3)
+    cache.put((1, 0), "report", generation)
+    assert cache.get((1, 0)) == "report"
+
+
+def test_invalidate_drops_only_that_members_pages():
+    cache = ReportCache()
+    for key in [(1, 0), (1, 20), (2, 0)]:
+        cache.put(key, key, cache.generation(key[0]))
+    cache.invalidate(1)
+    assert cache.get((1, 0)) is None and cache.get((1, 20)) is None
+    assert cache.get((2, 0)) == (2, 0)
+
+
+def test_clear_discards_reports_rendered_before_it():
+    cache = ReportCache()
+    generation = cache.generation(1)
+    cache.clear()
+    cache.put((1, 0), "stale", generation)
+    assert cache.get((1, 0)) is None
+    cache.put((1, 0), "fresh", cache.generation(1))
+    assert cache.get((1, 0)) == "fresh"
+
+
+def test_least_recently_used_report_is_evicted():
+    cache = ReportCache(maxsize=2)
+    cache.put((1, 0), "a", cache.generation(1))
+    cache.put((2, 0), "b", cache.generation(2))
+    cache.get((1, 0))
+    cache.put((3, 0), "c", cache.generation(3))
+    assert cache.get((2, 0)) is None
+    assert cache.get((1, 0)) == "a"
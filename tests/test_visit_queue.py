@@ -0,0 +1,79 @@
+"""VisitWriteQueue: grouped commits, per-visit failures and draining on flush/close"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gym_core
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'gym.db')
+    conn = gym_core.connect_database(path, timed=False)
+    gym_core.init_schema(conn)
+    conn.executemany("""
+        INSERT INTO members (name, membership_type, end_date, status)
+        VALUES (?, 'Monthly', '2026-12-31', 'Active')
+    """, [("Alice",), ("Bob",), ("Carol",)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def committed_visits(path):
+    conn = gym_core.connect_database(path, timed=False)
+    try:
+        return conn.execute("SELECT member_id FROM visits ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_visits_queued_together_commit_as_one_batch(path):
+    with gym_core.VisitWriteQueue(path, max_delay=0.5) as writer:
+        futures = [writer.submit(member_id) for member_id in (1, 2, 3)]
+        assert writer.flush(timeout=10)
+        assert [future.result(timeout=0)[1] for future in futures] == [None, None, None]
+        assert (writer.batches, writer.rows) == (1, 3)
+    assert committed_visits(path) == [(1,), (2,), (3,)]
+
+
+def test_unknown_member_fails_only_its_own_visit(path):
+    with gym_core.VisitWriteQueue(path, max_delay=0.5) as writer:
+        good = writer.submit(1, 200, "Cash")
+        bad = writer.submit(99)
+        other = writer.submit(2)
+        writer.flush(timeout=10)
+        
+        with pytest.raises(ValueError, match="Unknown member id: 99"):
+            bad.result(timeout=0)
+        visit_id, payment_id = good.result(timeout=0)
+        assert payment_id is not None
+        assert other.result(timeout=0)[0] > visit_id
+        assert writer.batches == 1
+    assert committed_visits(path) == [(1,), (2,)]
+
+
+def test_flush_waits_for_everything_submitted_before_it(path):
+    writer = gym_core.VisitWriteQueue(path, max_rows=2)
+    try:
+        futures = [writer.submit(member_id) for member_id in (1, 2, 3, 1, 2)]
+        assert writer.flush(timeout=10)
+        assert all(future.done() for future in futures)
+        assert len(committed_visits(path)) == 5
+    finally:
+        writer.close()
+
+
+def test_close_commits_what_is_queued_then_refuses_more(path):
+    writer = gym_core.VisitWriteQueue(path, max_delay=5)
+    futures = [writer.submit(member_id) for member_id in (1, 2, 3)]
+    writer.close()
+    
+    assert all(future.done() for future in futures)
+    assert committed_visits(path) == [(1,), (2,), (3,)]
+    with pytest.raises(RuntimeError):
+        writer.submit(1)